@@ -17,6 +17,7 @@ __all__ = [
 
 import uuid
 import os
+import hashlib
 import ast
 import re
 import sys
@@ -37,7 +38,6 @@ class BaseConf(object):
     """ Contain class Base's configurations.
 
     Arguments:
-        - pkt_path: A path to save the packet(default = test.<pid>.pkt).
         - timeout: An integer means the maximum number of seconds to wait 
             before the socket times out(default = 1).
         - functions: A dict maps commands and functions.
@@ -48,20 +48,8 @@ class BaseConf(object):
         The same with Arguments.
     """
     def __init__(self,
-                 pkt_path="test." + str(os.getpid()) + ".pkt",
                  timeout=30,
                  functions={}):
-
-        abspath = os.path.abspath(os.sep)
-        abstmp = os.path.join(abspath, "tmp")
-        if os.path.exists(abstmp):
-            self.pkt_path = os.path.join(abstmp,  pkt_path)
-        else:
-            curtmp = os.path.join(os.getcwd(), "tmp")
-            if not os.path.exists(curtmp):
-                os.makedirs(curtmp)
-            self.pkt_path = os.path.join(curtmp,  pkt_path)
-
         self.timeout = timeout
         self.functions = functions
 
@@ -76,6 +64,8 @@ class Base(object):
     Attributes:
         - _ctx: A Context object.
         - _conf: A BaseConf Object.
+        - _packets_fd: The anonymous memory file of the generated packets,
+            None if they aren't generated.
     """
     def __init__(self, ctx, conf=BaseConf()):
         """ Create a Base object.
@@ -83,6 +73,7 @@ class Base(object):
         """
         self._ctx = ctx
         self._conf = conf
+        self._packets_fd = None
 
         functions = {
             "load": self._load_yaml_tests,
@@ -99,9 +90,7 @@ class Base(object):
                                    self._notification_processor)
 
     def __del__(self):
-        if os.path.exists(self._conf.pkt_path) and os.path.isfile(
-                self._conf.pkt_path):
-            os.remove(self._conf.pkt_path)
+        self._close_packets()
         self._ctx.broker.unsubscribe(broker.TOPICS.COMMAND, self._command)
         self._ctx.broker.unsubscribe(broker.TOPICS.FATAL,
                                      self._notification_processor)
@@ -129,15 +118,26 @@ class Base(object):
         self.__del__()
         sys.exit(0)
 
-    def _load_yaml_tests(self, yaml_paths):
+    def _load_yaml_tests(self, yaml_paths, processes=None):
         yaml_paths = os.path.abspath(os.path.expanduser(yaml_paths))
         if not os.path.exists(yaml_paths):
             self._ctx.broker.publish(broker.TOPICS.ERROR,
                                      " %s is not existed " % (yaml_paths, ))
             return
+
+        def report(file_count, elapsed_time):
+            self._ctx.broker.publish(
+                broker.TOPICS.INFO,
+                "loaded %d files in %.3f seconds (%.1f files/sec)" % (
+                    file_count, elapsed_time,
+                    file_count / elapsed_time if elapsed_time else 0.0))
+
         try:
             for test in pywb.ftwhelper.get(yaml_paths,
-                                           pywb.ftwhelper.FTW_TYPE.TEST):
+                                           pywb.ftwhelper.FTW_TYPE.TEST,
+                                           int(processes) if processes
+                                           else None,
+                                           report):
                 for stage in pywb.ftwhelper.get(test,
                                                 pywb.ftwhelper.FTW_TYPE.STAGE):
                     for packet in pywb.ftwhelper.get(
@@ -156,19 +156,46 @@ class Base(object):
         except ValueError as e:
             self._ctx.broker.publish(broker.TOPICS.ERROR, str(e))
 
+    def _packets_path(self):
+        """ The path that wb opens the generated packets by,
+            None if they aren't generated
+        """
+        if self._packets_fd is None:
+            return None
+        return "/proc/self/fd/%d" % (self._packets_fd, )
+
+    def _close_packets(self):
+        if self._packets_fd is not None:
+            os.close(self._packets_fd)
+            self._packets_fd = None
+
     def _gen_requests(self, request_sql_script=None, *args):
         def gen_requests(result=database.QueryResult()):
+            if "traffic_id" not in result.title(
+            ) or "request" not in result.title():
+                self._ctx.broker.publish(
+                    broker.TOPICS.ERROR,
+                    "sql \"%s\" is not correct for generate testcase" %
+                    (request_sql_script, ))
+                return
+            # the packets are dumped into an anonymous memory file
+            # instead of a temporary file on disk
+            self._close_packets()
+            self._packets_fd = pywb.pywbutil.create_memory_file(
+                "ftw-packets")
             with pywb.packetsdumper.PacketsDumper(
-                    self._conf.pkt_path) as dumper:
-                if "traffic_id" not in result.title(
-                ) or "request" not in result.title():
-                    self._ctx.broker.publish(
-                        broker.TOPICS.ERROR,
-                        "sql \"%s\" is not correct for generate testcase" %
-                        (request_sql_script, ))
-                    return
+                    self._packets_path()) as dumper:
+                # each unique request is sent once, its response and log
+                # are shared by the traffics of the same request_hash
+                request_hashes = set()
+                row_count = 0
                 for row in result:
                     row = dict(zip(result.title(), row))
+                    row_count += 1
+                    request_hash = hashlib.sha1(row["request"]).digest()
+                    if request_hash in request_hashes:
+                        continue
+                    request_hashes.add(request_hash)
                     if self._ctx.delimiter:
                         delimiter_packet = self._ctx.delimiter.get_delimiter_packet(
                             row["traffic_id"])
@@ -182,6 +209,10 @@ class Base(object):
                         delimiter_packet = pywb.ftwhelper.get(
                             delimiter_packet, pywb.ftwhelper.FTW_TYPE.PACKETS)
                         dumper.dump(delimiter_packet)
+            self._ctx.broker.publish(
+                broker.TOPICS.INFO,
+                "generated %d unique requests of %d" % (
+                    len(request_hashes), row_count))
         self._ctx.broker.publish(
             broker.TOPICS.SQL_COMMAND,
             request_sql_script
@@ -190,12 +221,12 @@ class Base(object):
             callback=gen_requests)
 
     def _start_experiment(self, destination):
-        if not os.path.exists(self._conf.pkt_path):
+        if self._packets_fd is None:
             self._gen_requests()
-            if not os.path.exists(self._conf.pkt_path):
+            if self._packets_fd is None:
                 self._ctx.broker.publish(
                     broker.TOPICS.WARNING,
-                    " %s is not existed " % (self._conf.pkt_path, ))
+                    " packets are not generated ")
                 return
         self._ctx.broker.publish(broker.TOPICS.SQL_COMMAND,
                                  sql.SQL_CLEAN_RAW_DATA)
@@ -204,8 +235,10 @@ class Base(object):
         def collect_pywb_ouput(line):
             self._ctx.broker.publish(broker.TOPICS.PYWB_OUTPUT, line)
 
+        # in memory, so that concurrent tools don't share .default.pkt
         ret = pywb.execute([
-            "-F", self._conf.pkt_path, "-v", "4", destination, "-n", "1", "-c",
+            "--in-memory",
+            "-F", self._packets_path(), "-v", "4", destination, "-n", "1", "-c",
             "1", "-r", "-s",
             str(self._conf.timeout), "-o", "/dev/null"],
             customized_filters=[collect_pywb_ouput])
@@ -20,6 +20,7 @@ __all__ = [
 ]
 
 import sqlite3
+import hashlib
 import abc
 
 import sql
@@ -54,6 +55,18 @@ class QueryResult(object):
         return self._title
 
 
+def _sha1(value):
+    """ The sha1 hex digest of value, used as the SQL function sha1.
+        Text arguments are decoded by sqlite3, so cast them to BLOB
+        to hash their exact bytes.
+    """
+    if value is None:
+        return None
+    if isinstance(value, unicode):
+        value = value.encode("utf-8")
+    return hashlib.sha1(value).hexdigest()
+
+
 class Database(object):
     """ Database's ABC.
 
@@ -68,7 +81,8 @@ class Database(object):
     def __init__(self, context):
         """ Create a Database,
             subscribe itself to SQL_COMMAND,
-            query for initializing database.
+            query for initializing database,
+            migrate the database created by an older version.
         """
         self.context = context
         self.context.broker.subscribe(broker.TOPICS.SQL_COMMAND, self._query)
@@ -77,6 +91,10 @@ class Database(object):
         except sqlite3.OperationalError:
             # ignore repeatedly initialize error
             pass
+        columns = [row[1] for row in self.query(sql.SQL_QUERY_TRAFFIC_COLUMNS)]
+        if "request_hash" not in columns:
+            # the requests of an older database aren't hashed yet
+            self.query(sql.SQL_MIGRATE_REQUEST_HASH)
 
     def __del__(self):
         self.context.broker.unsubscribe(broker.TOPICS.SQL_COMMAND, self._query)
@@ -112,10 +130,12 @@ class Sqlite3DB(Database):
     def __init__(self, context, path=":memory:"):
         """ Create a Sqlite3DB object,
             connect to the database in path,
+            register the function sha1 for the queries,
             call Database's initializing.
         """
         self._connector = sqlite3.connect(path)
         self._connector.text_factory = str
+        self._connector.create_function("sha1", 1, _sha1)
         super(Sqlite3DB, self).__init__(context)
 
     def query(self, script, *args):
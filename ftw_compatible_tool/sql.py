@@ -7,17 +7,21 @@
 
 This exports:
     - SQL_INITIALIZE_DATABASE is the query for initializing database.
-    - SQL_INSERT_REQUEST is the query for inserting a request.
+    - SQL_QUERY_TRAFFIC_COLUMNS is the query for the columns of the traffic table.
+    - SQL_MIGRATE_REQUEST_HASH is the query for adding and filling the request_hash of a database created before it.
+    - SQL_INSERT_REQUEST is the query for inserting a request with its sha1.
     - SQL_QUERY_REQUEST is the query for a traffic's request.
     - SQL_CLEAN_RAW_DATA is the query for clearing raw request, raw response and raw log.
-    - SQL_INSERT_RAW_TRAFFIC is the query for updating one traffic with raw request and raw response.
-    - SQL_INSERT_LOG is the query for updating one traffic with raw log.
+    - SQL_INSERT_RAW_TRAFFIC is the query for updating one traffic, and the traffics sharing its request, with raw request and raw response.
+    - SQL_INSERT_LOG is the query for updating one traffic, and the traffics sharing its request, with raw log.
     - SQL_QUERY_RESULT is the query for all traffic's output, request, response and log. 
     - SQL_QUERY_TEST_TITLE is the query for the test title of a traffic.
 """
 
 __all__ = [
     "SQL_INITIALIZE_DATABASE",
+    "SQL_QUERY_TRAFFIC_COLUMNS",
+    "SQL_MIGRATE_REQUEST_HASH",
     "SQL_INSERT_REQUEST",
     "SQL_QUERY_REQUEST",
     "SQL_CLEAN_RAW_DATA",
@@ -40,9 +44,21 @@ CREATE TABLE Traffic (
     raw_response BLOB,
     raw_log TEXT,
     testing_result TEXT,
-    duration_time REAL
+    duration_time REAL,
+    request_hash TEXT
 );
 CREATE INDEX idx_title on Traffic(test_title);
+CREATE INDEX idx_request_hash on Traffic(request_hash);
+'''
+
+SQL_QUERY_TRAFFIC_COLUMNS = '''
+PRAGMA table_info(Traffic);
+'''
+
+SQL_MIGRATE_REQUEST_HASH = '''
+ALTER TABLE Traffic ADD COLUMN request_hash TEXT;
+UPDATE Traffic SET request_hash = sha1(CAST(request AS BLOB));
+CREATE INDEX IF NOT EXISTS idx_request_hash on Traffic(request_hash);
 '''
 
 SQL_INSERT_REQUEST = '''
@@ -53,10 +69,11 @@ INSERT INTO Traffic (
     file,
     input,
     output,
-    request
+    request,
+    request_hash
     )
     VALUES (
-        ?,?,?,?,?,?,?
+        ?1,?2,?3,?4,?5,?6,?7,sha1(CAST(?7 AS BLOB))
     );
 '''
 
@@ -71,14 +88,18 @@ SET raw_request = NULL, raw_response = NULL, raw_log = NULL, testing_result = NU
 
 SQL_INSERT_RAW_TRAFFIC = '''
 UPDATE Traffic
-SET raw_request = ?, raw_response = ?, duration_time = ?
-WHERE traffic_id = ?;
+SET raw_request = ?1, raw_response = ?2, duration_time = ?3
+WHERE traffic_id = ?4 OR request_hash = (
+    SELECT request_hash FROM Traffic WHERE traffic_id = ?4
+    );
 '''
 
 SQL_INSERT_LOG = '''
 UPDATE Traffic
-SET raw_log = ?
-WHERE traffic_id = ?;
+SET raw_log = ?1
+WHERE traffic_id = ?2 OR request_hash = (
+    SELECT request_hash FROM Traffic WHERE traffic_id = ?2
+    );
 '''
 
 SQL_QUERY_RESULT = '''
@@ -291,8 +291,9 @@ ________________________      __          _________
             (
                 "Import testcases, "
                 "if database has imported some testcases, "
-                "the old testcases would not be overwritten",
-                "load <PATH of testcases>",
+                "the old testcases would not be overwritten, "
+                "testcases can be parsed by multiple processes",
+                "load <PATH of testcases> [processes]",
                 "load ./OWASP-CRS-regressions",
             ),
             (
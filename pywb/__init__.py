@@ -4,5 +4,6 @@
 # Licensed under the MIT License.
 
 from main import execute
+from runner import run, start, wait_all
 from optionparser import OptionParser
 from outputfilter import OutputFilter
@@ -0,0 +1,517 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+""" Multi-node load generation by a coordinator and agents
+
+This exports:
+    - Coordinator is a class that splits a run of wb among agents
+        and merges their results.
+    - Agent is a class that registers to a coordinator and runs
+        its share of the run.
+
+The protocol is a sequence of messages over TCP, each one is a line of
+JSON optionally followed by "size" bytes of payload:
+    agent -> coordinator: register {"workers", "nonce"}
+    coordinator -> agent: challenge {"nonce", "proof"}
+    agent -> coordinator: auth {"proof"}
+    coordinator -> agent: run {"arguments"} + the shard of packets
+    agent -> coordinator: ready
+    coordinator -> agent: start, sent to all agents at once
+    agent -> coordinator: stats {"second", "completed", "rate"},
+        a progress report of wb each second
+    agent -> coordinator: result {"return_code", "result",
+        "connection_times"}, the histograms of the connection times
+The coordinator splits -c, -R(the global rate target) and the packets
+of -F among agents like fanout splits them among workers, -n is only
+split without -F since wb takes it as the passes over the packets,
+merges the progress reports of each second into one line and merges
+the results into one summary. The latencies are merged by adding the
+buckets of the histograms, so a result doesn't grow with the requests.
+Any host that reaches the coordinator could register and receive the
+packets, and any host that an agent reaches could run wb on it, so both
+sides prove that they know the shared token by the HMAC of the nonces of
+the other side and their own, and the token itself is never sent. The
+coordinator drops the connections that fail the proof or don't register
+in time, and an agent only runs the options of wb that neither read nor
+write local files.
+"""
+
+__all__ = [
+    "Coordinator",
+    "Agent",
+]
+
+import os
+import re
+import hmac
+import json
+import hashlib
+import Queue
+import socket
+import threading
+import collections
+
+import optionparser
+import fanout
+import histogram
+import packetsloader
+import packetsdumper
+import pywbutil
+import resultparser
+
+
+# the seconds to wait for the register of a connection
+_REGISTER_TIMEOUT = 10
+# the options of wb that an agent runs, the ones with a path aren't here
+_AGENT_FLAGS = "klrdSqwiIK0134"
+_AGENT_OPTIONS_WITH_ARGUMENT = "ncstbBTvxyzCHAPXmZfjJRDUWQG2"
+_PROGRESS_PATTERN = re.compile(
+    r"^\s*(\d+): Completed\s+(\d+) requests, rate is (\d+) #/sec")
+
+
+def _send_message(sock, message, payload=""):
+    """ Send a message and its payload """
+    message = dict(message, size=len(payload))
+    sock.sendall(json.dumps(message) + "\n" + payload)
+
+
+def _receive_message(reader):
+    """ Receive a message from the file of a socket
+
+    Return (message, payload). Raise IOError if the connection is closed
+    """
+    line = reader.readline()
+    if not line:
+        raise IOError("the connection is closed")
+    message = json.loads(line)
+    payload = reader.read(message["size"]) if message["size"] else ""
+    if len(payload) != message["size"]:
+        raise IOError("the connection is closed")
+    return message, payload
+
+
+def _receive_expected(reader, type_):
+    message, payload = _receive_message(reader)
+    if message["type"] != type_:
+        raise IOError("expect message %s but got %s"
+                      % (type_, message["type"]))
+    return message, payload
+
+
+def _filter(filters, line):
+    for filter_ in filters:
+        line = filter_(line)
+        if line is None:
+            break
+
+
+def _remove_option(arguments, option):
+    """ Return the arguments of wb without option and its argument,
+        the first one is the path of wb
+    """
+    remaining = list(arguments[:1])
+    i = 1
+    while i < len(arguments):
+        removed = arguments[i] == option
+        if not removed:
+            remaining.append(arguments[i])
+        if optionparser.has_argument(arguments[i]) \
+                and i + 1 < len(arguments):
+            if not removed:
+                remaining.append(arguments[i + 1])
+            i += 1
+        i += 1
+    return remaining
+
+
+def _check_agent_arguments(arguments):
+    """ Check the arguments of wb that an agent runs, without the path
+        of wb, they're the options that neither read nor write local
+        files followed by the target
+
+    Raise ValueError if they aren't
+    """
+    i = 0
+    while i < len(arguments) - 1:
+        option = arguments[i]
+        if len(option) != 2 or option[0] != "-" \
+                or option[1] not in _AGENT_FLAGS \
+                + _AGENT_OPTIONS_WITH_ARGUMENT:
+            raise ValueError("%s isn't allowed for agents" % (option, ))
+        i += 2 if option[1] in _AGENT_OPTIONS_WITH_ARGUMENT else 1
+    if i != len(arguments) - 1 or arguments[i].startswith("-"):
+        raise ValueError("the arguments of agents must end with a target")
+
+
+def _nonce():
+    return os.urandom(16).encode("hex")
+
+
+def _proof(token, role, nonce, other_nonce):
+    """ The HMAC of the nonces by the token, role tells the sides apart
+        so that a proof of one side can't be replayed by the other one
+    """
+    return hmac.new(_to_str(token or ""),
+                    "%s:%s:%s" % (role, nonce, other_nonce),
+                    hashlib.sha256).hexdigest()
+
+
+def _verify(token, role, nonce, other_nonce, proof):
+    return isinstance(proof, basestring) and hmac.compare_digest(
+        _to_str(proof), _proof(token, role, nonce, other_nonce))
+
+
+def _to_str(value):
+    return value.encode("utf-8") if isinstance(value, unicode) else value
+
+
+class _AgentConnection(object):
+    """ The connection of a registered agent, its messages are read by
+        a thread into the shared queue as (agent, message, payload)
+
+    Arguments:
+        - token: the shared token that the agent must prove to know
+
+    Attributes:
+        - index: the index of the agent
+        - workers: the number of wb processes of the agent
+
+    Raise IOError if the agent doesn't register or isn't authenticated
+    """
+    def __init__(self, index, sock, queue, token=None):
+        self.index = index
+        self.socket = sock
+        self._reader = sock.makefile("rb")
+        self._queue = queue
+        self._thread = None
+        try:
+            message, _ = _receive_expected(self._reader, "register")
+            self.workers = message["workers"]
+            agent_nonce = _to_str(message["nonce"])
+            nonce = _nonce()
+            _send_message(sock, {
+                "type": "challenge", "nonce": nonce,
+                "proof": _proof(token, "coordinator", agent_nonce, nonce)})
+            message, _ = _receive_expected(self._reader, "auth")
+            if not _verify(token, "agent", nonce, agent_nonce,
+                           message["proof"]):
+                raise IOError("agent %d isn't authenticated" % (index, ))
+        except (ValueError, KeyError, TypeError) as error:
+            self.close()
+            raise IOError("agent %d failed to register: %s"
+                          % (index, error))
+        except IOError:
+            self.close()
+            raise
+
+    def start_reading(self):
+        self._thread = threading.Thread(target=self._read)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _read(self):
+        try:
+            while True:
+                message, payload = _receive_message(self._reader)
+                self._queue.put((self, message, payload))
+                if message["type"] == "result":
+                    break
+        except (IOError, ValueError) as error:
+            self._queue.put((self, {"type": "error",
+                                    "error": str(error)}, ""))
+
+    def receive(self, type_):
+        return _receive_expected(self._reader, type_)
+
+    def close(self):
+        self._reader.close()
+        self.socket.close()
+
+
+class Coordinator(object):
+    """ Split a run of wb among agents and merge their results
+
+    Arguments:
+        - address: a (host, port) to listen for agents
+        - agent_count: the number of agents to wait for
+        - arguments: a string list of the arguments of wb, the first one
+            (the path of wb) is replaced by each agent, -5 is removed
+        - timeout: the seconds to wait for each agent to register,
+            None means forever
+        - token: the shared token that agents must prove to know,
+            None means no token, which any agent knows
+
+    Attributes:
+        - address: the (host, port) that the coordinator listens to
+        - result: the merged resultparser.WbResult after run
+        - histogram: the merged histogram.Histogram of the agents
+            after run
+        - timeline: an OrderedDict after run,
+            second => the (completed requests, rate) of all agents
+    """
+    def __init__(self, address, agent_count, arguments, timeout=None,
+                 token=None):
+        if agent_count < 1:
+            raise ValueError("invalid number of agents %s" % (agent_count, ))
+        self._agent_count = agent_count
+        # the extended progress(-5) has no completed requests to merge
+        self._arguments = _remove_option(arguments, "-5")
+        _check_agent_arguments(_remove_option(self._arguments, "-F")[1:])
+        self._timeout = timeout
+        self._token = token
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(address)
+        self._server.listen(agent_count)
+        self.address = self._server.getsockname()
+        self.result = None
+        self.histogram = None
+        self.timeline = collections.OrderedDict()
+
+    def _accept_agents(self, queue):
+        self._server.settimeout(self._timeout)
+        agents = []
+        try:
+            while len(agents) < self._agent_count:
+                sock, _ = self._server.accept()
+                # a connection that doesn't register doesn't block others
+                sock.settimeout(_REGISTER_TIMEOUT)
+                try:
+                    agent = _AgentConnection(
+                        len(agents), sock, queue, self._token)
+                except IOError:
+                    continue
+                sock.settimeout(None)
+                agents.append(agent)
+        except:
+            for agent in agents:
+                agent.close()
+            raise
+        finally:
+            self._server.close()
+        return agents
+
+    def _split_arguments(self, agents):
+        """ Return the list of (arguments, shard of packets) of agents """
+        arguments = self._arguments
+        count = len(agents)
+        sharded = optionparser.find_argument(arguments, "-F") != -1
+        splits = {}
+        # -n of wb is the passes over the packets of -F, so every agent
+        # sends all of the passes over its shard
+        for option in ("-c", "-R") if sharded else ("-c", "-n", "-R"):
+            index = optionparser.find_argument(arguments, option)
+            if index == -1:
+                continue
+            splits[option] = fanout.split_count(
+                fanout.parse_rate(arguments[index]), count)
+        for option in ("-c", "-n"):
+            for agent, value in zip(agents, splits.get(option, [])):
+                if value < agent.workers:
+                    raise ValueError(
+                        "%s %d of agent %d is less than its %d workers"
+                        % (option, value, agent.index, agent.workers))
+        shards = [("", 0)] * count
+        index = optionparser.find_argument(arguments, "-F")
+        if index != -1:
+            packet_count = packetsloader.count_packets(arguments[index])
+            for i in xrange(count):
+                # a shard is sent as the content of a .pkt file
+                fd = pywbutil.create_memory_file("pywb-shard")
+                try:
+                    path_ = "/proc/self/fd/%d" % (fd, )
+                    start = packet_count * i // count
+                    stop = packet_count * (i + 1) // count
+                    if stop == start:
+                        # every agent sends at least a packet
+                        start, stop = 0, packet_count
+                    with packetsdumper.PacketsDumper(path_) as dumper:
+                        dumper.dump(packetsloader.load_packets_from_range(
+                            arguments[index], start, stop))
+                    with open(path_, "rb") as shard_fd:
+                        shards[i] = (shard_fd.read(), dumper.packet_count)
+                finally:
+                    os.close(fd)
+        agent_arguments = []
+        for i in xrange(count):
+            split_arguments = list(arguments)
+            for option, values in splits.items():
+                optionparser.set_argument(
+                    split_arguments, option, str(values[i]))
+            shard, packet_count = shards[i]
+            if shard:
+                # the agent saves its shard to a file of its own
+                split_arguments = _remove_option(split_arguments, "-F")
+                optionparser.set_argument(
+                    split_arguments, "-Q", str(packet_count))
+            agent_arguments.append((split_arguments[1:], shard))
+        return agent_arguments
+
+    def _report_second(self, second, reports, filters):
+        completed, rate = 0, 0
+        for report in reports:
+            completed += report[0]
+            rate += report[1]
+        self.timeline[second] = (completed, rate)
+        _filter(filters, "%2d: Completed %6d requests, rate is %d #/sec.\n"
+                % (second, completed, rate))
+
+    def run(self, filters):
+        """ Wait for the agents, start them at once and pass the merged
+            progress of each second and the merged summary to filters
+
+        Return the return code, the first non-zero one of the agents
+        """
+        queue = Queue.Queue()
+        agents = self._accept_agents(queue)
+        try:
+            worker_count = sum(agent.workers for agent in agents)
+            for agent, (arguments, shard) in zip(
+                    agents, self._split_arguments(agents)):
+                _send_message(
+                    agent.socket,
+                    {"type": "run", "arguments": arguments}, shard)
+            for agent in agents:
+                agent.receive("ready")
+                agent.start_reading()
+            # the barrier
+            for agent in agents:
+                _send_message(agent.socket, {"type": "start"})
+            # second => a dict of (agent, worker report) => report
+            seconds = {}
+            reported_second = 0
+            return_codes = [None] * len(agents)
+            results = [None] * len(agents)
+            connection_times = None
+            remaining = len(agents)
+            while remaining:
+                agent, message, _ = queue.get()
+                if message["type"] == "stats":
+                    reports = seconds.setdefault(message["second"], [])
+                    reports.append((message["completed"], message["rate"]))
+                    # a second is reported once all workers report it
+                    while len(seconds.get(reported_second + 1, [])) \
+                            == worker_count:
+                        reported_second += 1
+                        self._report_second(
+                            reported_second, seconds.pop(reported_second),
+                            filters)
+                elif message["type"] == "result":
+                    return_codes[agent.index] = message["return_code"]
+                    results[agent.index] = resultparser.WbResult.from_dict(
+                        message["result"])
+                    agent_times = histogram.ConnectionTimes.from_dict(
+                        message["connection_times"])
+                    if connection_times is None:
+                        connection_times = agent_times
+                    else:
+                        connection_times.merge(agent_times)
+                    remaining -= 1
+                elif message["type"] == "error":
+                    raise IOError("agent %d failed: %s"
+                                  % (agent.index, message["error"]))
+            # the seconds that aren't reported by all workers
+            for second in sorted(seconds):
+                self._report_second(second, seconds[second], filters)
+            self.result = fanout.merge_results(results, connection_times)
+            if connection_times is not None:
+                self.histogram = connection_times.total
+            if self.result.complete_requests is not None:
+                for line in resultparser.format_summary(self.result):
+                    _filter(filters, line)
+            return next((code for code in return_codes if code), 0)
+        finally:
+            for agent in agents:
+                agent.close()
+
+
+class Agent(object):
+    """ Register to a coordinator and run the share of a run of wb
+
+    Arguments:
+        - address: the (host, port) of the coordinator
+        - wb_path: the path of wb, default is pywbutil.get_wb_path()
+        - workers: the number of wb processes, see fanout.FanOut
+        - token: the shared token of the coordinator, None means no token,
+            see Coordinator
+
+    Attributes:
+        - result: the resultparser.WbResult of the agent after run
+        - histogram: the histogram.Histogram of the agent after run
+    """
+    def __init__(self, address, wb_path=None, workers=1, token=None):
+        self._address = address
+        self._wb_path = wb_path or pywbutil.get_wb_path()
+        self._workers = workers
+        self._token = token
+        self._socket = None
+        self.result = None
+        self.histogram = None
+
+    def _report_progress(self, line):
+        """ An output filter that sends the progress reports of wb """
+        match = _PROGRESS_PATTERN.match(line)
+        if match:
+            _send_message(self._socket, {
+                "type": "stats",
+                "second": int(match.group(1)),
+                "completed": int(match.group(2)),
+                "rate": int(match.group(3)),
+            })
+        return line
+
+    def run(self, filters=[]):
+        """ Run the share of the coordinator, the output of wb is passed
+            to filters too
+
+        Return the return code of wb. Raise IOError if the coordinator
+            isn't authenticated, ValueError if its arguments aren't allowed
+        """
+        self._socket = socket.create_connection(self._address)
+        reader = self._socket.makefile("rb")
+        memory_fd = None
+        try:
+            nonce = _nonce()
+            _send_message(self._socket, {
+                "type": "register", "workers": self._workers,
+                "nonce": nonce})
+            message, _ = _receive_expected(reader, "challenge")
+            coordinator_nonce = _to_str(message["nonce"])
+            if not _verify(self._token, "coordinator", nonce,
+                           coordinator_nonce, message["proof"]):
+                raise IOError("the coordinator isn't authenticated")
+            _send_message(self._socket, {
+                "type": "auth",
+                "proof": _proof(self._token, "agent", coordinator_nonce,
+                                nonce)})
+            message, shard = _receive_expected(reader, "run")
+            arguments = [_to_str(argument)
+                         for argument in message["arguments"]]
+            _check_agent_arguments(arguments)
+            arguments = [self._wb_path] + arguments
+            if shard:
+                memory_fd = pywbutil.create_memory_file("pywb-agent")
+                packets_file = "/proc/self/fd/%d" % (memory_fd, )
+                with open(packets_file, "wb") as fd:
+                    fd.write(shard)
+                optionparser.set_argument(arguments, "-F", packets_file)
+            fan_out = fanout.FanOut(arguments, self._workers)
+            _send_message(self._socket, {"type": "ready"})
+            _receive_expected(reader, "start")
+            return_code = fan_out.run([self._report_progress] + filters)
+            self.result = fan_out.result
+            self.histogram = fan_out.histogram
+            _send_message(self._socket, {
+                "type": "result",
+                "return_code": return_code,
+                "result": self.result.to_dict(),
+                "connection_times": fan_out.connection_times.to_dict(),
+            })
+            return return_code
+        finally:
+            if memory_fd is not None:
+                os.close(memory_fd)
+            reader.close()
+            self._socket.close()
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+""" Confidence bounds of small samples
+
+This exports:
+    - t_quantile is a function that returns a quantile of
+        Student's t distribution.
+    - mean_margin is a function that returns the mean of values and
+        the half width of its confidence interval.
+    - prediction_margin is a function that returns the half width of
+        the prediction interval of a new value.
+
+The samples of benchmarks are a few runs, so the bounds use Student's t
+distribution instead of the normal distribution.
+"""
+
+__all__ = [
+    "t_quantile",
+    "mean_margin",
+    "prediction_margin",
+]
+
+import math
+
+
+# the quantiles of Student's t by degrees of freedom,
+# a larger degree uses the value of the largest key below it
+_T_QUANTILES = {
+    0.95: {
+        1: 6.314, 2: 2.920, 3: 2.353, 4: 2.132, 5: 2.015,
+        6: 1.943, 7: 1.895, 8: 1.860, 9: 1.833, 10: 1.812,
+        15: 1.753, 20: 1.725, 30: 1.697, 60: 1.671, 120: 1.658,
+    },
+    0.975: {
+        1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571,
+        6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262, 10: 2.228,
+        15: 2.131, 20: 2.086, 30: 2.042, 60: 2.000, 120: 1.980,
+    },
+}
+
+
+def t_quantile(degree, quantile=0.975):
+    """ The quantile(0.95 or 0.975) of Student's t distribution
+        of degree degrees of freedom
+    """
+    table = _T_QUANTILES[quantile]
+    return table[max(key for key in table if key <= degree)]
+
+
+def _mean_sd(values):
+    mean = float(sum(values)) / len(values)
+    variance = sum((value - mean) ** 2 for value in values) \
+        / (len(values) - 1)
+    return mean, math.sqrt(variance)
+
+
+def mean_margin(values, quantile=0.975):
+    """ Return the mean of values and the half width of its confidence
+        interval(95% two-sided by default), 0 for a single value
+    """
+    if len(values) < 2:
+        return float(sum(values)) / len(values), 0.0
+    mean, sd = _mean_sd(values)
+    return mean, t_quantile(len(values) - 1, quantile) \
+        * sd / math.sqrt(len(values))
+
+
+def prediction_margin(values, quantile=0.95):
+    """ Return the mean of values and the half width of the prediction
+        interval of a new value(95% one-sided by default),
+        values needs two values at least
+    """
+    mean, sd = _mean_sd(values)
+    return mean, t_quantile(len(values) - 1, quantile) \
+        * sd * math.sqrt(1 + 1.0 / len(values))
@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+""" Multi-process fan-out of wb
+
+This exports:
+    - split_count is a function that splits a number into nearly
+        equal parts.
+    - parse_rate is a function that parses the rate of -R.
+    - load_samples is a function that loads the samples of requests
+        from the gnuplot file of wb.
+    - merge_results is a function that merges the results of workers.
+    - FanOut is a class that runs wb by multiple worker processes.
+
+wb is single-threaded, so a single wb saturates one core long before
+the target does. FanOut splits the concurrency, the requests and the
+packets of a run among wb workers pinned to distinct CPUs, releases
+them together at a barrier and merges their results. The throughput
+is summed, and the latencies are computed from the histograms of the
+samples of all workers(the gnuplot files of -g, which are read line by
+line) instead of averaging percentiles, so the memory doesn't grow with
+the requests. The histograms can be merged with the ones of other runs.
+"""
+
+__all__ = [
+    "split_count",
+    "parse_rate",
+    "load_samples",
+    "merge_results",
+    "FanOut",
+]
+
+import os
+import fcntl
+import Queue
+import time
+import signal
+import tempfile
+import threading
+import subprocess
+import collections
+import multiprocessing
+
+import optionparser
+import histogram
+import outputpump
+import packetsloader
+import packetsdumper
+import pywbutil
+import resultparser
+
+
+# wb reports these percentiles
+_PERCENTAGES = (50, 66, 75, 80, 90, 95, 98, 99, 100)
+
+# the fields of WbResult that are summed over workers
+_SUMMED_FIELDS = (
+    "concurrency",
+    "complete_requests",
+    "failed_requests",
+    "write_errors",
+    "non_2xx_responses",
+    "keepalive_requests",
+    "total_transferred",
+    "total_body_sent",
+    "html_transferred",
+    "requests_per_second",
+    "transfer_rate_received",
+    "transfer_rate_sent",
+    "transfer_rate_total",
+)
+
+# the scales of the suffixes of -R
+_RATE_SCALES = {"k": 1000, "m": 1000000, "g": 1000000000}
+
+# a worker waits for the barrier(the end of stdin) before it executes wb
+_BARRIER_COMMAND = ["sh", "-c", 'read _; exec "$@"', "sh"]
+
+# the marker of the end of the output of a worker
+_END = object()
+
+
+def split_count(total, parts):
+    """ Split total into parts integers whose sizes differ at most by one
+    """
+    return [total * (i + 1) // parts - total * i // parts
+            for i in xrange(parts)]
+
+
+def parse_rate(rate):
+    """ Parse the requests per second of -R as wb does, e.g. 10k """
+    scale = _RATE_SCALES.get(rate[-1:].lower())
+    if scale is None:
+        return int(rate)
+    return int(float(rate[:-1]) * scale)
+
+
+def load_samples(file_):
+    """ Load the samples of requests from the gnuplot file(-g) of wb
+
+    Return a list of (connect, processing, total, waiting) times
+        and the second that the request started,
+        it's empty if the file doesn't exist
+    """
+    samples = []
+    try:
+        fd = open(file_)
+    except IOError:
+        return samples
+    with fd:
+        next(fd, None)  # the titles
+        for line in fd:
+            # starttime, seconds, ctime, dtime, ttime, wait
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) == 6:
+                samples.append((int(fields[2]), int(fields[3]),
+                                int(fields[4]), int(fields[5]),
+                                int(fields[1])))
+    return samples
+
+
+def merge_results(results, connection_times):
+    """ Merge the results of workers
+
+    Arguments:
+        - results: a list of resultparser.WbResult of the workers,
+            the ones without a summary are ignored
+        - connection_times: the histogram.ConnectionTimes of
+            the requests of all workers, None if there isn't one
+
+    Return a resultparser.WbResult. The counters, the throughput and
+        the transfer rates are summed, time_taken is the longest one,
+        and the connection times and the percentiles are computed
+        from connection_times.
+    """
+    merged = resultparser.WbResult()
+    results = [result for result in results
+               if result.complete_requests is not None]
+    if not results:
+        return merged
+    for name in ("server_software", "server_hostname", "server_port",
+                 "document_path", "time_unit"):
+        setattr(merged, name, getattr(results[0], name))
+    lengths = set(result.document_length for result in results)
+    merged.document_length = lengths.pop() if len(lengths) == 1 else None
+    for name in _SUMMED_FIELDS:
+        values = [getattr(result, name) for result in results
+                  if getattr(result, name) is not None]
+        if values:
+            setattr(merged, name, sum(values))
+    for name in ("requests_per_second", "transfer_rate_received",
+                 "transfer_rate_sent", "transfer_rate_total"):
+        if getattr(merged, name) is not None:
+            setattr(merged, name, round(getattr(merged, name), 2))
+    failures = collections.OrderedDict()
+    status_codes = collections.Counter()
+    for result in results:
+        for reason, count in result.failures.items():
+            failures[reason] = failures.get(reason, 0) + count
+        status_codes.update(result.status_codes)
+    merged.failures = failures
+    merged.status_codes = dict(status_codes)
+    merged.time_taken = max(result.time_taken for result in results)
+    if merged.complete_requests:
+        time_per_request = merged.time_taken * 1000.0 \
+            / merged.complete_requests
+        merged.time_per_request_all = round(time_per_request, 3)
+        merged.time_per_request = round(
+            time_per_request * merged.concurrency, 3)
+    if connection_times is not None and connection_times.total.total_count:
+        merged.samples = connection_times.total.total_count
+        merged.connection_times = connection_times.describe()
+        merged.percentiles = connection_times.total.percentiles(_PERCENTAGES)
+    return merged
+
+
+def _filter(filters, line):
+    for filter_ in filters:
+        line = filter_(line)
+        if line is None:
+            break
+
+
+class FanOut(object):
+    """ Run wb by multiple worker processes and merge their results
+
+    Arguments:
+        - arguments: a string list of the arguments of wb,
+            the first one is the path of wb
+        - workers: the number of worker processes
+        - cpus: a list of CPUs, the i-th worker is pinned to
+            cpus[i % len(cpus)], default is all of the CPUs
+        - warmup: the requests that started in the first warmup seconds
+            of the run aren't recorded into the histograms
+
+    Attributes:
+        - result: the merged resultparser.WbResult after run
+        - connection_times: the histogram.ConnectionTimes of
+            the requests of all workers after run
+        - histogram: the histogram.Histogram of the total times of
+            the requests of all workers after run
+        - _memory_fds: the memory files of the shards of packets
+        - _sample_files: the gnuplot files of the workers
+    """
+    def __init__(self, arguments, workers, cpus=None, warmup=0):
+        if workers < 1:
+            raise ValueError("invalid number of workers %s" % (workers, ))
+        for option in ("-g", "-e"):
+            if optionparser.find_argument(arguments, option) != -1:
+                raise ValueError(
+                    "%s isn't supported by multiple workers" % (option, ))
+        self._arguments = list(arguments)
+        self._workers = workers
+        self._cpus = cpus or range(multiprocessing.cpu_count())
+        self._warmup = warmup
+        self._memory_fds = []
+        self._sample_files = []
+        self.result = None
+        self.connection_times = None
+        self.histogram = None
+
+    def _split_number(self, option, default):
+        """ Split the argument of option among workers,
+            None if option isn't set and default is None
+        """
+        index = optionparser.find_argument(self._arguments, option)
+        if index == -1:
+            if default is None:
+                return None
+            total = default
+        else:
+            total = parse_rate(self._arguments[index])
+        if total < self._workers:
+            raise ValueError("%s %d is less than %d workers"
+                             % (option, total, self._workers))
+        return split_count(total, self._workers)
+
+    def _dump_shards(self):
+        """ Split the packets of -F into a memory file per worker,
+            return the paths and the counts of packets of them,
+            None if the packets aren't split
+        """
+        index = optionparser.find_argument(self._arguments, "-F")
+        if index == -1 or self._workers == 1:
+            return None
+        packets_file = self._arguments[index]
+        count_index = optionparser.find_argument(self._arguments, "-Q")
+        if count_index != -1 and int(self._arguments[count_index]) > 0:
+            count = int(self._arguments[count_index])
+        else:
+            count = packetsloader.count_packets(packets_file)
+        if count < self._workers:
+            # every worker sends all of the packets
+            return None
+        shards = []
+        for shard in xrange(self._workers):
+            fd = pywbutil.create_memory_file("pywb-shard")
+            self._memory_fds.append(fd)
+            path_ = "/proc/self/fd/%d" % (fd, )
+            with packetsdumper.PacketsDumper(path_) as dumper:
+                dumper.dump(packetsloader.load_packets_from_range(
+                    packets_file,
+                    count * shard // self._workers,
+                    count * (shard + 1) // self._workers))
+            shards.append((path_, dumper.packet_count))
+        return shards
+
+    def _split_arguments(self):
+        """ Return the list of the arguments of each worker """
+        concurrency = self._split_number("-c", 1)
+        rates = self._split_number("-R", None)
+        shards = self._dump_shards()
+        # -n of wb is the passes over the packets of -F, so every worker
+        # sends all of the passes over its shard
+        requests = None if shards else self._split_number("-n", None)
+        worker_arguments = []
+        set_argument = optionparser.set_argument
+        for worker in xrange(self._workers):
+            arguments = list(self._arguments)
+            set_argument(arguments, "-c", str(concurrency[worker]))
+            if requests:
+                set_argument(arguments, "-n", str(requests[worker]))
+            if rates:
+                set_argument(arguments, "-R", str(rates[worker]))
+            if shards:
+                path_, count = shards[worker]
+                set_argument(arguments, "-F", path_)
+                set_argument(arguments, "-Q", str(count))
+            fd, sample_file = tempfile.mkstemp(prefix="pywb-samples.")
+            os.close(fd)
+            self._sample_files.append(sample_file)
+            set_argument(arguments, "-g", sample_file)
+            worker_arguments.append(arguments)
+        return worker_arguments
+
+    @staticmethod
+    def _pump(stream, parser, lines):
+        """ Parse the output of a worker, and forward the lines before
+            its summary to the queue of lines
+        """
+        def forward(line):
+            parser(line)
+            if not parser.in_summary:
+                lines.put(line)
+        outputpump.OutputPump(stream, [forward]).run()
+        lines.put(_END)
+
+    def run(self, filters):
+        """ Run the workers, the filters process their output
+            and then the merged summary
+
+        Return the return code, the first non-zero one of the workers
+        """
+        try:
+            worker_arguments = self._split_arguments()
+            # the workers block on reading the barrier until it's closed
+            barrier_read, barrier_write = os.pipe()
+            flags = fcntl.fcntl(barrier_write, fcntl.F_GETFD)
+            fcntl.fcntl(barrier_write, fcntl.F_SETFD,
+                        flags | fcntl.FD_CLOEXEC)
+            lines = Queue.Queue(outputpump.DEFAULT_QUEUE_SIZE)
+            workers = []
+            try:
+                for worker, arguments in enumerate(worker_arguments):
+                    wb = subprocess.Popen(
+                        _BARRIER_COMMAND + arguments, shell=False,
+                        stdin=barrier_read,
+                        stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+                    pywbutil.set_cpu_affinity(
+                        wb.pid, self._cpus[worker % len(self._cpus)])
+                    parser = resultparser.ResultParser()
+                    thread = threading.Thread(
+                        target=self._pump, args=(wb.stdout, parser, lines))
+                    thread.daemon = True
+                    thread.start()
+                    workers.append((wb, parser, thread))
+            finally:
+                os.close(barrier_read)
+                # all of the workers start at once
+                start = time.time()
+                os.close(barrier_write)
+            # ignore SIGINT, only the main thread can set signal handlers
+            in_main_thread = isinstance(
+                threading.current_thread(), threading._MainThread)
+            if in_main_thread:
+                original_handler = signal.getsignal(signal.SIGINT)
+                signal.signal(signal.SIGINT, signal.SIG_IGN)
+            remaining = len(workers)
+            while remaining:
+                line = lines.get()
+                if line is _END:
+                    remaining -= 1
+                else:
+                    _filter(filters, line)
+            return_codes = []
+            for wb, _, thread in workers:
+                return_codes.append(wb.wait())
+                thread.join()
+            # recover SIGINT
+            if in_main_thread:
+                signal.signal(signal.SIGINT, original_handler)
+            results = [parser.result for _, parser, _ in workers]
+            time_unit = next((result.time_unit for result in results
+                              if result.time_unit), "us")
+            self.connection_times = histogram.ConnectionTimes(
+                time_unit=time_unit)
+            for sample_file in self._sample_files:
+                self.connection_times.merge(
+                    histogram.connection_times_from_gnuplot(
+                        sample_file, time_unit=time_unit,
+                        warmup=self._warmup, start=start))
+            self.histogram = self.connection_times.total
+            self.result = merge_results(results, self.connection_times)
+            if self.result.complete_requests is not None:
+                for line in resultparser.format_summary(self.result):
+                    _filter(filters, line)
+            return next((code for code in return_codes if code), 0)
+        finally:
+            self.close()
+
+    def close(self):
+        """ Release the shards of packets and the gnuplot files """
+        for fd in self._memory_fds:
+            os.close(fd)
+        self._memory_fds = []
+        for sample_file in self._sample_files:
+            if os.path.exists(sample_file):
+                os.remove(sample_file)
+        self._sample_files = []
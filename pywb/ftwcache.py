@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+""" Persistent parse cache of FTW YAML files
+
+This exports:
+    - DEFAULT_CACHE_DIR is the default directory of the cache.
+    - DEFAULT_MAX_SIZE is the default upper bound of the cache size in bytes.
+    - ParseCache is a class that saves the parsed YAML data and
+        the built packets of YAML files on disk.
+
+Each YAML file has an entry file in the cache directory named by the
+hash of its absolute path. An entry is valid if the size and mtime of
+the YAML file are unchanged, or if its content hash is unchanged.
+In the latter case the new mtime is written back to the entry, so the
+file isn't hashed again by later lookups.
+The least recently used entries are evicted when the total size of
+the cache exceeds its bound.
+"""
+
+__all__ = [
+    "DEFAULT_CACHE_DIR",
+    "DEFAULT_MAX_SIZE",
+    "ParseCache",
+]
+
+import os
+import errno
+import hashlib
+import tempfile
+import cPickle
+
+import pywbutil
+
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")),
+    "pywb",
+    "ftw")
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024
+
+# change it if the format of entries or the way of building packets changes
+_CACHE_VERSION = 1
+
+_ENTRY_SUFFIX = ".entry"
+
+
+class _CacheEntry(object):
+    """ An entry of ParseCache
+
+    Attributes:
+        - packets: a list of raw packets built from the YAML file,
+            None if they haven't been built.
+        - _content: the pickled YAML data, it's unpickled on demand.
+    """
+    def __init__(self, packets, content):
+        self.packets = packets
+        self._content = content
+
+    def yaml_data(self):
+        """ Return the YAML data saved by ParseCache.store """
+        return cPickle.loads(self._content)
+
+
+class ParseCache(object):
+    """ Save the parsed YAML data and the built packets of YAML files
+
+    Arguments:
+        - cache_dir: a string, the directory of the cache.
+            It'll be created on the first store.
+        - max_size: an integer, the upper bound of the cache size in bytes.
+
+    Attributes:
+        - cache_dir: the same as Arguments.
+        - max_size: the same as Arguments.
+        - _total_size: the size of all entries,
+            None if the cache directory hasn't been scanned.
+    """
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_size=DEFAULT_MAX_SIZE):
+        self.cache_dir = os.path.abspath(os.path.expanduser(cache_dir))
+        self.max_size = max_size
+        self._total_size = None
+
+    def _entry_path(self, file_):
+        return os.path.join(
+            self.cache_dir,
+            hashlib.sha1(file_).hexdigest() + _ENTRY_SUFFIX)
+
+    def lookup(self, file_):
+        """ Look up the entry of a YAML file
+
+        Arguments:
+            - file_: an absolute path of YAML file
+
+        Return a _CacheEntry or None if there isn't a valid entry
+        """
+        entry_path = self._entry_path(file_)
+        try:
+            with open(entry_path, "rb") as fd:
+                unpickler = cPickle.Unpickler(fd)
+                meta = unpickler.load()
+                if meta["version"] != _CACHE_VERSION \
+                        or meta["path"] != file_:
+                    return None
+                stat = os.stat(file_)
+                touched = (meta["size"], meta["mtime"]) \
+                    != (stat.st_size, stat.st_mtime)
+                if touched:
+                    # the file was touched or modified
+                    if pywbutil.file_digest(file_) != meta["digest"]:
+                        return None
+                packets = unpickler.load()
+                content = unpickler.load()
+        except (IOError, OSError, EOFError, KeyError, cPickle.PickleError):
+            return None
+        try:
+            if touched:
+                # the content is unchanged, save the new mtime
+                # so that the file needn't be hashed again
+                meta["size"], meta["mtime"] = stat.st_size, stat.st_mtime
+                self._write_entry(entry_path, meta, packets, content)
+            else:
+                # the modified time of entry is used for LRU eviction
+                os.utime(entry_path, None)
+        except (IOError, OSError):
+            pass
+        return _CacheEntry(packets, content)
+
+    def store(self, file_, yaml_data, packets=None):
+        """ Save the entry of a YAML file
+
+        Arguments:
+            - file_: an absolute path of YAML file
+            - yaml_data: a picklable object that is parsed from the file
+            - packets: a list of raw packets built from the file
+        """
+        try:
+            os.makedirs(self.cache_dir)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        stat = os.stat(file_)
+        meta = {
+            "version": _CACHE_VERSION,
+            "path": file_,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "digest": pywbutil.file_digest(file_),
+        }
+        if packets is not None:
+            packets = [str(packet) for packet in packets]
+        # pickled separately, so that a lookup of packets
+        # needn't unpickle the YAML data
+        content = cPickle.dumps(yaml_data, cPickle.HIGHEST_PROTOCOL)
+        self._write_entry(self._entry_path(file_), meta, packets, content)
+        self._evict()
+
+    def _write_entry(self, entry_path, meta, packets, content):
+        """ Write an entry file by replacing it atomically """
+        fd, temp_path = tempfile.mkstemp(dir=self.cache_dir)
+        try:
+            with os.fdopen(fd, "wb") as temp_fd:
+                pickler = cPickle.Pickler(temp_fd, cPickle.HIGHEST_PROTOCOL)
+                pickler.dump(meta)
+                pickler.dump(packets)
+                pickler.dump(content)
+            old_size = os.path.getsize(entry_path) \
+                if os.path.exists(entry_path) else 0
+            # rename is atomic, concurrent readers see either entry
+            os.rename(temp_path, entry_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        if self._total_size is not None:
+            self._total_size += os.path.getsize(entry_path) - old_size
+
+    def _list_entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(_ENTRY_SUFFIX):
+                continue
+            path_ = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path_)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path_))
+        return entries
+
+    def _evict(self):
+        if self._total_size is None:
+            self._total_size = sum(
+                size for _, size, _ in self._list_entries())
+        if self._total_size <= self.max_size:
+            return
+        # rescan, other processes may share this cache
+        entries = sorted(self._list_entries())
+        self._total_size = sum(size for _, size, _ in entries)
+        for _, size, path_ in entries:
+            if self._total_size <= self.max_size:
+                break
+            try:
+                os.remove(path_)
+            except OSError:
+                continue
+            self._total_size -= size
+
+    def clear(self):
+        """ Remove all entries """
+        if not os.path.isdir(self.cache_dir):
+            return
+        for _, _, path_ in self._list_entries():
+            try:
+                os.remove(path_)
+            except OSError:
+                pass
+        self._total_size = 0
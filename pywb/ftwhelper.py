@@ -15,16 +15,24 @@ This is a wrapper to provied the access to FTW(https://github.com/fastly/ftw).
 """
 
 import os
+import time
 import yaml
 import types
+import itertools
+import multiprocessing
 
 import ftw
 
 import pywbutil
+import httpbuilder
 
 
 yaml.warnings({'YAMLLoadWarning': False})
 
+# libyaml's loader is much faster than the pure python one,
+# both of them are the safe loader that ftw uses.
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
 
 __all__ = [
     "FTW_TYPE",
@@ -101,43 +109,175 @@ def _load_ftw_rules_from_strings(strings):
         yield rule
 
 
+def _load_yaml_file(file_):
+    """ Load a YAML file into python objects.
+    """
+    with open(file_, "r") as fd:
+        return yaml.load(fd, Loader=_YAML_LOADER)
+
+
+class _MappingPairs(list):
+    """ The key-value pairs of a YAML mapping in the document order
+    """
+    pass
+
+
+class _PairsLoader(_YAML_LOADER):
+    """ Load YAML mappings as _MappingPairs instead of dicts.
+
+    The iteration order of a dict depends on the order in which its keys
+    were inserted, and unpickling a dict inserts the keys in the iteration
+    order of the pickled one. So the dicts transferred from another process
+    may be iterated in a different order(e.g. the order of headers).
+    The document order is kept instead, and _restore_mappings rebuilds
+    the dicts in the same way as the YAML constructor.
+    """
+    def construct_yaml_map(self, node):
+        pairs = _MappingPairs()
+        yield pairs
+        self.flatten_mapping(node)
+        for key_node, value_node in node.value:
+            pairs.append((
+                self.construct_object(key_node),
+                self.construct_object(value_node)))
+
+
+_PairsLoader.add_constructor(
+    u"tag:yaml.org,2002:map", _PairsLoader.construct_yaml_map)
+
+
+def _load_yaml_file_as_pairs(file_):
+    """ Load a YAML file, mappings are loaded as _MappingPairs.
+        It's a module level function so that it can run in a process pool.
+    """
+    with open(file_, "r") as fd:
+        return yaml.load(fd, Loader=_PairsLoader)
+
+
+def _restore_mappings(data, restored=None):
+    """ Rebuild the dicts from _MappingPairs loaded by _PairsLoader
+    """
+    if restored is None:
+        restored = {}
+    if id(data) in restored:  # YAML alias
+        return restored[id(data)]
+    if isinstance(data, _MappingPairs):
+        # the same as SafeConstructor.construct_yaml_map
+        mapping = {}
+        result = restored[id(data)] = {}
+        for key, value in data:
+            mapping[_restore_mappings(key, restored)] = \
+                _restore_mappings(value, restored)
+        result.update(mapping)
+        return result
+    if isinstance(data, list):
+        # a new list, so that the pairs can still be saved by ParseCache
+        result = restored[id(data)] = []
+        result.extend(_restore_mappings(item, restored) for item in data)
+        return result
+    return data
+
+
+def _create_rule(file_, yaml_data):
+    ftw_rule = ftw.ruleset.Ruleset(yaml_data)
+    return FtwDict(
+        FTW_TYPE.RULE,
+        file_,
+        ftw_rule,
+        ftw_rule.yaml_file)
+
+
+def _load_yaml_files_as_pairs(files, processes=None):
+    """ Load YAML files in the order of files, mappings are loaded
+        as _MappingPairs, so that they can be saved by ParseCache
+    """
+    if processes and processes > 1 and len(files) > 1:
+        pool = multiprocessing.Pool(processes)
+        try:
+            # imap keeps the order of files
+            chunk_size = max(1, len(files) // (processes * 4))
+            for yaml_data in pool.imap(
+                    _load_yaml_file_as_pairs, files, chunk_size):
+                yield yaml_data
+        finally:
+            pool.terminate()
+            pool.join()
+    else:
+        for file_ in files:
+            yield _load_yaml_file_as_pairs(file_)
+
+
 @pywbutil.accept_iterable
 @pywbutil.expand_nest_generator
-def _load_ftw_rules_from_files(files):
+def _load_ftw_rules_from_files(files, processes=None, report=None):
+    files = [os.path.abspath(os.path.expanduser(file_)) for file_ in files]
     for file_ in files:
-        file_ = os.path.abspath(os.path.expanduser(file_))
         if os.path.splitext(file_)[-1].lower() != ".yaml":
             raise ValueError(file_ + "is not a .yaml file")
-        rules = ftw.util.get_rulesets(file_, False)
-        for ftw_rule in rules:
-            rule = FtwDict(
-                FTW_TYPE.RULE,
-                file_,
-                ftw_rule,
-                ftw_rule.yaml_file)
-            yield rule
+    start_time = time.time()
+    if processes and processes > 1 and len(files) > 1:
+        for file_, yaml_data in itertools.izip(
+                files, _load_yaml_files_as_pairs(files, processes)):
+            yield _create_rule(file_, _restore_mappings(yaml_data))
+    else:
+        for file_ in files:
+            yield _create_rule(file_, _load_yaml_file(file_))
+    if report:
+        report(len(files), time.time() - start_time)
+
+
+def _get_yaml_files(path_):
+    path_ = os.path.abspath(os.path.expanduser(path_))
+    if os.path.isdir(path_):
+        yaml_files = []
+        for root, _, files in os.walk(path_):
+            for file_ in files:
+                file_ext = os.path.splitext(file_)[-1].lower()
+                if file_ext != ".yaml":
+                    continue
+                yaml_files.append(os.path.join(root, file_))
+        return yaml_files
+    elif os.path.isfile(path_):
+        file_ext = os.path.splitext(path_)[-1].lower()
+        if file_ext != ".yaml":
+            raise ValueError(path_ + " is not YAML file with .yaml")
+        return [path_]
+    else:
+        raise IOError("No such file or path: '%s'" % (path_, ))
 
 
-@pywbutil.accept_iterable
-@pywbutil.expand_nest_generator
-def _load_ftw_rules_from_paths(paths):
-    for path_ in paths:
-        path_ = os.path.abspath(os.path.expanduser(path_))
-        if os.path.isdir(path_):
-            for root, _, files in os.walk(path_):
-                for file_ in files:
-                    file_ext = os.path.splitext(file_)[-1].lower()
-                    if file_ext != ".yaml":
-                        continue
-                    yield _load_ftw_rules_from_files(
-                        os.path.join(root, file_))
-        elif os.path.isfile(path_):
-            file_ext = os.path.splitext(path_)[-1].lower()
-            if file_ext != ".yaml":
-                raise ValueError(path_ + " is not YAML file with .yaml")
-            yield _load_ftw_rules_from_files((path_))
-        else:
-            raise IOError("No such file or path: '%s'" % (path_, ))
+def _get_from_cached_files(files, target_type, processes, report, cache):
+    """ Get a target_type generator from YAML files through a ParseCache.
+        The packets of a cached file are generated without parsing
+        the file or building the requests.
+    """
+    start_time = time.time()
+    entries = [cache.lookup(file_) for file_ in files]
+    missed_files = [
+        file_ for file_, entry in itertools.izip(files, entries)
+        if entry is None]
+    missed_data = _load_yaml_files_as_pairs(missed_files, processes)
+    for file_, entry in itertools.izip(files, entries):
+        if entry is not None and target_type == FTW_TYPE.PACKETS \
+                and entry.packets is not None:
+            for packet in entry.packets:
+                yield FtwStr(FTW_TYPE.PACKETS, file_, packet)
+            continue
+        yaml_data = next(missed_data) if entry is None \
+            else entry.yaml_data()
+        rule = _create_rule(file_, _restore_mappings(yaml_data))
+        if target_type == FTW_TYPE.PACKETS:
+            packets = list(_convert(rule, target_type))
+            cache.store(file_, yaml_data, packets)
+            for packet in packets:
+                yield packet
+            continue
+        if entry is None:
+            cache.store(file_, yaml_data)
+        for destination in _convert(rule, target_type):
+            yield destination
+    if report:
+        report(len(files), time.time() - start_time)
 
 
 def _convert(source, target_type):
@@ -155,13 +295,10 @@ def _convert(source, target_type):
     # ftw.stage => pkt
     elif source.FTW_TYPE == FTW_TYPE.STAGE \
             and target_type == FTW_TYPE.PACKETS:
-        http_ua = ftw.http.HttpUA()
-        http_ua.request_object = source.ORIGINAL_DATA.input
-        http_ua.build_request()
         packet = FtwStr(
             FTW_TYPE.PACKETS,
             source.ORIGINAL_FILE,
-            http_ua.request)
+            httpbuilder.build_request(source.ORIGINAL_DATA.input))
         yield packet
     # ftw.test => ftw.stage
     elif source.FTW_TYPE == FTW_TYPE.TEST \
@@ -202,7 +339,7 @@ def _convert(source, target_type):
                 visit_stack.pop()
 
 
-def get(source, target_type):
+def get(source, target_type, processes=None, report=None, cache=None):
     """ Get a target_type generator from sources.
 
     Arguments:
@@ -212,6 +349,13 @@ def get(source, target_type):
             or
             objects that comes from ftwhelper.get
         target_type: a enum of FTW_TYPE to specify the generator type
+        processes: the number of processes to parse YAML files in parallel.
+            The order of the generated items is the same as the serial one.
+            Default is None, which means parsing in the current process.
+        report: a function called with the number of YAML files and
+            the elapsed seconds after all YAML files of a path were loaded.
+        cache: a ftwcache.ParseCache to save the parsed YAML files
+            and the built packets. Default is None, which means no cache.
 
     Return a generator that generate target_type
     """
@@ -223,12 +367,39 @@ def get(source, target_type):
             sources = [source]
         else:
             sources = source
+        paths = []
         for source in sources:
             path_ = os.path.abspath(os.path.expanduser(source))
             if os.path.exists(path_):
-                rules = _load_ftw_rules_from_paths(path_)
-            else:
-                rules = _load_ftw_rules_from_strings(source)
-            for rule in rules:
+                # consecutive paths are loaded together,
+                # so that all of their files share one process pool
+                paths.append(path_)
+                continue
+            for destination in _get_from_paths(
+                    paths, target_type, processes, report, cache):
+                yield destination
+            paths = []
+            for rule in _load_ftw_rules_from_strings(source):
                 for destination in _convert(rule, target_type):
                     yield destination
+        for destination in _get_from_paths(
+                paths, target_type, processes, report, cache):
+            yield destination
+
+
+def _get_from_paths(paths, target_type, processes, report, cache):
+    if not paths:
+        return
+    files = []
+    for path_ in paths:
+        files += _get_yaml_files(path_)
+    if cache is not None:
+        destinations = _get_from_cached_files(
+            files, target_type, processes, report, cache)
+    else:
+        destinations = (
+            destination
+            for rule in _load_ftw_rules_from_files(files, processes, report)
+            for destination in _convert(rule, target_type))
+    for destination in destinations:
+        yield destination
@@ -0,0 +1,336 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+""" Mergeable histogram of latencies
+
+This exports:
+    - Histogram is a class of a log-bucketed histogram of latencies.
+    - ConnectionTimes is a class of the histograms of the rows of
+        the connection times of wb.
+    - connection_times_from_gnuplot is a function that builds
+        a ConnectionTimes from the gnuplot file(-g) of wb.
+    - from_gnuplot is a function that builds a Histogram from
+        the gnuplot file(-g) of wb.
+    - merge is a function that merges histograms.
+
+The buckets are log-linear like HdrHistogram: the values below
+2 ** (precision + 1) have a bucket each, and each power of 2 above is
+split into 2 ** precision buckets, so a value is represented within a
+relative error of 2 ** -precision(0.8% by default) and the number of
+buckets only grows with the logarithm of the largest value. Histograms
+of the same precision are merged by adding the counts of their buckets,
+so the percentiles of many shards, repetitions or nodes are as precise
+as the ones of a single run, which the percentile tables of wb can't be
+combined into. The connection times(min, mean, sd, median and max) are
+described from histograms too, so the memory of the latencies of a run
+doesn't grow with its requests.
+"""
+
+__all__ = [
+    "Histogram",
+    "ConnectionTimes",
+    "connection_times_from_gnuplot",
+    "from_gnuplot",
+    "merge",
+]
+
+import json
+import math
+import collections
+
+
+class Histogram(object):
+    """ A log-bucketed histogram of latencies
+
+    Arguments:
+        - precision: the number of bits of the buckets of each power of 2
+            (default = 7)
+        - time_unit: the unit of the values, e.g. "us" or "ms"
+
+    Attributes:
+        - precision, time_unit: the same as Arguments
+        - total_count: the number of recorded values
+        - min, max: the smallest and the largest values,
+            None if no value is recorded
+        - sum: the sum of the values
+    """
+    def __init__(self, precision=7, time_unit="us"):
+        if not 1 <= precision <= 16:
+            raise ValueError("precision must be in [1, 16]")
+        self.precision = precision
+        self.time_unit = time_unit
+        self._half = 1 << precision
+        self._counts = {}
+        self.total_count = 0
+        self.min = None
+        self.max = None
+        self.sum = 0
+
+    def _index(self, value):
+        if value < 2 * self._half:
+            return value
+        shift = value.bit_length() - self.precision - 1
+        return (shift + 1) * self._half + (value >> shift) - self._half
+
+    def _range(self, index):
+        """ The lowest and the highest values of the bucket of index """
+        if index < 2 * self._half:
+            return index, index
+        shift = index // self._half - 1
+        sub_bucket = index % self._half + self._half
+        return sub_bucket << shift, ((sub_bucket + 1) << shift) - 1
+
+    def record(self, value, count=1):
+        """ Record a non-negative integer value count times """
+        value = int(value)
+        if value < 0:
+            raise ValueError("negative value %d" % (value, ))
+        index = self._index(value)
+        self._counts[index] = self._counts.get(index, 0) + count
+        self.total_count += count
+        self.sum += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        """ Add the counts of other into this histogram
+
+        Return this histogram
+        """
+        if other.precision != self.precision \
+                or other.time_unit != self.time_unit:
+            raise ValueError("can't merge the histograms of different "
+                             "precisions or time units")
+        for index, count in other._counts.items():
+            self._counts[index] = self._counts.get(index, 0) + count
+        self.total_count += other.total_count
+        self.sum += other.sum
+        for name, pick in (("min", min), ("max", max)):
+            values = [value for value in (getattr(self, name),
+                                          getattr(other, name))
+                      if value is not None]
+            setattr(self, name, pick(values) if values else None)
+        return self
+
+    @property
+    def mean(self):
+        if not self.total_count:
+            return None
+        return float(self.sum) / self.total_count
+
+    @property
+    def stddev(self):
+        """ The sample standard deviation, the values of a bucket are
+            taken as its middle one, None if no value is recorded
+        """
+        if not self.total_count:
+            return None
+        if self.total_count == 1:
+            return 0.0
+        mean = self.mean
+        squares = 0.0
+        for index, count in self._counts.items():
+            low, high = self._range(index)
+            squares += count * ((low + high) / 2.0 - mean) ** 2
+        return math.sqrt(squares / (self.total_count - 1))
+
+    def value_at_percentile(self, percentage):
+        """ The highest value of the bucket that the percentage of
+            the values are at most, None if no value is recorded
+        """
+        if not self.total_count:
+            return None
+        rank = max(1, int(math.ceil(percentage / 100.0 * self.total_count)))
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= rank:
+                return max(self.min, min(self.max, self._range(index)[1]))
+        return self.max
+
+    def percentiles(self, percentages=(50, 66, 75, 80, 90, 95, 98, 99, 100)):
+        """ Return an OrderedDict of percentage => value """
+        return collections.OrderedDict(
+            (percentage, self.value_at_percentile(percentage))
+            for percentage in percentages)
+
+    def to_dict(self):
+        return collections.OrderedDict([
+            ("precision", self.precision),
+            ("time_unit", self.time_unit),
+            ("total_count", self.total_count),
+            ("min", self.min),
+            ("max", self.max),
+            ("sum", self.sum),
+            ("buckets", [[index, self._counts[index]]
+                         for index in sorted(self._counts)]),
+        ])
+
+    def to_json(self, **kwargs):
+        """ Serialize to JSON, kwargs are passed to json.dumps """
+        return json.dumps(self.to_dict(), **kwargs)
+
+    @classmethod
+    def from_dict(cls, data):
+        """ Restore a Histogram from the dict of to_dict """
+        histogram = cls(data["precision"], data["time_unit"])
+        histogram._counts = dict((index, count)
+                                 for index, count in data["buckets"])
+        histogram.total_count = data["total_count"]
+        histogram.min = data["min"]
+        histogram.max = data["max"]
+        histogram.sum = data["sum"]
+        return histogram
+
+    @classmethod
+    def load(cls, file_):
+        """ Load a Histogram from the JSON file of to_json """
+        with open(file_) as fd:
+            return cls.from_dict(json.load(fd))
+
+    def save(self, file_):
+        """ Save to file_ as JSON """
+        with open(file_, "w") as fd:
+            fd.write(self.to_json())
+
+
+class ConnectionTimes(object):
+    """ The histograms of the rows of the connection times of wb
+
+    Arguments:
+        - precision, time_unit: the ones of the histograms
+
+    Attributes:
+        - rows: an OrderedDict of "connect", "processing", "total"
+            and "waiting" => Histogram, in the order of the times of
+            a sample, see fanout.load_samples
+        - total: the Histogram of the total times
+    """
+    ROWS = ("connect", "processing", "total", "waiting")
+
+    def __init__(self, precision=7, time_unit="us"):
+        self.rows = collections.OrderedDict(
+            (row, Histogram(precision, time_unit)) for row in self.ROWS)
+
+    @property
+    def total(self):
+        return self.rows["total"]
+
+    def record(self, sample):
+        """ Record the times of a sample, see fanout.load_samples """
+        for row, value in zip(self.ROWS, sample):
+            self.rows[row].record(value)
+
+    def merge(self, other):
+        """ Add the counts of other into these histograms
+
+        Return this ConnectionTimes
+        """
+        for row in self.ROWS:
+            self.rows[row].merge(other.rows[row])
+        return self
+
+    def describe(self):
+        """ Return an OrderedDict of row => the OrderedDict of
+            its min, mean, sd, median and max as wb reports them,
+            it's empty if no sample is recorded
+        """
+        if not self.total.total_count:
+            return collections.OrderedDict()
+        return collections.OrderedDict((row, collections.OrderedDict([
+            ("min", histogram.min),
+            ("mean", int(histogram.mean)),
+            ("sd", round(histogram.stddev, 1)),
+            ("median", histogram.value_at_percentile(50)),
+            ("max", histogram.max),
+        ])) for row, histogram in self.rows.items())
+
+    def to_dict(self):
+        return collections.OrderedDict(
+            (row, histogram.to_dict()) for row, histogram in self.rows.items())
+
+    @classmethod
+    def from_dict(cls, data):
+        """ Restore a ConnectionTimes from the dict of to_dict """
+        connection_times = cls()
+        connection_times.rows = collections.OrderedDict(
+            (row, Histogram.from_dict(data[row])) for row in cls.ROWS)
+        return connection_times
+
+
+def _read_gnuplot(file_):
+    """ Yield the samples in the gnuplot file(-g) of wb line by line,
+        see fanout.load_samples
+    """
+    try:
+        fd = open(file_)
+    except IOError:
+        return
+    with fd:
+        for line in fd:
+            # starttime, seconds, ctime, dtime, ttime, wait
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < 6 or not fields[4].isdigit():
+                # the header
+                continue
+            yield (int(fields[2]), int(fields[3]), int(fields[4]),
+                   int(fields[5]), int(fields[1]))
+
+
+def connection_times_from_gnuplot(file_, precision=7, time_unit="us",
+                                  warmup=0, start=None):
+    """ Build a ConnectionTimes of the requests in the gnuplot file(-g)
+        of wb, the file is read line by line
+
+    Arguments:
+        - warmup: the requests that started in the first warmup seconds
+            of the run are skipped
+        - start: the time(seconds since the epoch) when the run started.
+            wb only saves the last samples of its stats window(-W), so
+            None means the earliest sample in the file, and the file is
+            read twice then
+
+    Return a ConnectionTimes, it's empty if the file doesn't exist
+    """
+    connection_times = ConnectionTimes(precision, time_unit)
+    # the seconds of the samples are truncated
+    first_second = int(start) if start is not None else None
+    if warmup and first_second is None:
+        for sample in _read_gnuplot(file_):
+            if first_second is None or sample[4] < first_second:
+                first_second = sample[4]
+    for sample in _read_gnuplot(file_):
+        if not warmup or first_second is None \
+                or sample[4] >= first_second + warmup:
+            connection_times.record(sample)
+    return connection_times
+
+
+def from_gnuplot(file_, precision=7, time_unit="us", warmup=0, start=None):
+    """ Build a Histogram of the total times(ttime) of the requests
+        in the gnuplot file(-g) of wb, see connection_times_from_gnuplot
+
+    Return a Histogram, it's empty if the file doesn't exist
+    """
+    return connection_times_from_gnuplot(
+        file_, precision, time_unit, warmup, start).total
+
+
+def merge(histograms, precision=7, time_unit="us"):
+    """ Merge histograms into a new Histogram
+
+    Arguments:
+        - histograms: an iterable of Histogram
+        - precision, time_unit: the ones of the new Histogram
+            if histograms is empty
+
+    Return the merged Histogram
+    """
+    merged = None
+    for histogram in histograms:
+        if merged is None:
+            merged = Histogram(histogram.precision, histogram.time_unit)
+        merged.merge(histogram)
+    return merged or Histogram(precision, time_unit)
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+""" Build raw HTTP requests of FTW stages
+
+This exports:
+    - build_request is a function that builds the raw request
+        of a ftw.ruleset.Input.
+    - build_request_from_dict is a function that builds the raw request
+        of the input dict of a stage.
+
+It produces the same bytes as ftw.http.HttpUA.build_request without
+creating a user agent for each request. Cookies aren't supported,
+because a new user agent never has a saved cookie. Unlike HttpUA,
+the fields of str aren't decoded to unicode unless another field is
+unicode, so that their bytes are kept even if they aren't valid UTF-8.
+"""
+
+__all__ = [
+    "build_request",
+    "build_request_from_dict",
+]
+
+import re
+import base64
+import urllib
+import urlparse
+import encodings.aliases
+
+# ftw.http sets the default encoding to utf8,
+# which is used to mix unicode and str in requests
+import ftw
+
+
+_CRLF = "\r\n"
+
+_TEMPLATE = "#method# #uri##version#" + _CRLF + "#headers#" + _CRLF + "#data#"
+
+_CHARSET_PATTERN = re.compile(r'\;\s{0,1}?charset\=(.*?)(?:$|\;|\s)')
+
+_ENCODINGS = frozenset(encodings.aliases.aliases.keys()) \
+    | frozenset(encodings.aliases.aliases.values())
+
+_FORM_URLENCODED = "application/x-www-form-urlencoded"
+
+
+def _encode_data(data, headers, stop_magic):
+    encoding = "utf-8"
+    if "Content-Type" in headers and stop_magic is False:
+        match = _CHARSET_PATTERN.search(headers["Content-Type"])
+        if match:
+            # Python will allow these aliases but doesn't list them
+            choice = match.group(1).replace("-", "_").lower()
+            if choice in _ENCODINGS:
+                encoding = choice
+    try:
+        return data.encode(encoding)
+    except UnicodeEncodeError as err:
+        raise ftw.errors.TestError(
+            "Error encoding the data with the charset specified",
+            {
+                "msg": str(err),
+                "Content-Type": str(headers["Content-Type"]),
+                "data": unicode(data),
+                "function": "httpbuilder.build_request"
+            })
+
+
+def _build_request(
+        method, uri, version, headers, data, stop_magic,
+        raw_request, encoded_request):
+    if raw_request is not None:
+        if encoded_request is not None:
+            raise ftw.errors.TestError(
+                "Cannot specify both raw and encoded modes",
+                {
+                    "function": "httpbuilder.build_request"
+                })
+        # unescaped regardless of magic,
+        # a literal '\' 'r' or 'n' needs an encoded request
+        return raw_request.decode("string_escape")
+    if encoded_request is not None:
+        return base64.b64decode(encoded_request).decode("string_escape")
+    # the placeholders are replaced in the same order as HttpUA,
+    # so that a placeholder inside a field is replaced in the same way
+    request = _TEMPLATE.replace("#method#", method)
+    # a space is added for HEAD requests without uri
+    request = request.replace("#uri#", uri + " ")
+    request = request.replace("#version#", version)
+    if headers:
+        request = request.replace(
+            "#headers#",
+            "".join([
+                "%s: %s\r\n" % (name, value)
+                for name, value in headers.iteritems()]))
+    else:
+        request = request.replace("#headers#", "")
+    if data != "":
+        request = request.replace(
+            "#data#", _encode_data(data, headers, stop_magic))
+    else:
+        request = request.replace("#data#", "")
+    # unicode is encoded by the default encoding as HttpUA's caller does
+    return str(request)
+
+
+def build_request(input_):
+    """ Build the raw request of a ftw.ruleset.Input
+
+    Arguments:
+        - input_: a ftw.ruleset.Input, its data and headers
+            have been normalized by ftw.
+
+    Return a string, the raw request
+    """
+    return _build_request(
+        input_.method,
+        input_.uri,
+        input_.version,
+        input_.headers,
+        input_.data,
+        input_.stop_magic,
+        input_.raw_request,
+        input_.encoded_request)
+
+
+def build_request_from_dict(input_dict):
+    """ Build the raw request of the input dict of a stage
+
+    Arguments:
+        - input_dict: a dict, the 'input' of a stage. Its data and headers
+            are normalized in the same way as ftw.ruleset.Input:
+            a list of data is joined by CRLF, form data is urlencoded,
+            the default Content-Type and Content-Length are added into
+            a copy of its headers, input_dict isn't changed.
+
+    Return a string, the raw request
+    """
+    # the stage may be cached and shared, so its headers are copied
+    # before a header is added, and they're kept as they are otherwise
+    # since a copied dict may iterate in another order
+    headers = input_dict.get("headers")
+    if headers is None:
+        headers = {}
+    data = input_dict.get("data", "")
+    stop_magic = input_dict.get("stop_magic", False)
+    if isinstance(data, list):
+        data = _CRLF.join(data)
+    if data != "":
+        if "Content-Type" not in headers and stop_magic is False:
+            headers = dict(headers)
+            headers["Content-Type"] = _FORM_URLENCODED
+        if headers.get("Content-Type") == _FORM_URLENCODED \
+                and stop_magic is False \
+                and urllib.unquote(data).decode("utf8") == data:
+            query_string = urlparse.parse_qsl(data)
+            if query_string:
+                data = urllib.urlencode(query_string)
+        if "Content-Length" not in headers and stop_magic is False:
+            headers = dict(headers)
+            headers["Content-Length"] = len(data)
+    return _build_request(
+        input_dict.get("method", "GET"),
+        input_dict.get("uri", "/"),
+        input_dict.get("version", "HTTP/1.1"),
+        headers,
+        data,
+        stop_magic,
+        input_dict.get("raw_request"),
+        input_dict.get("encoded_request"))
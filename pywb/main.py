@@ -19,14 +19,31 @@ __all__ = [
 import os
 import sys
 import re
+import json
+import time
 import signal
+import tempfile
 import subprocess
 import collections
 
 import optionparser
 import outputfilter
+import outputpump
+import fanout
+import cluster
+import pyengine
+import saturation
+import slosearch
+import timeseries
+import histogram
+import runarchive
+import resultparser
 import packetsloader
 import packetsdumper
+import packetsmanifest
+import packettemplate
+import trafficmix
+import ftwcache
 import pywbutil
 
 
@@ -37,12 +54,34 @@ class _PacketFileEnhance(optionparser.OptionParser):
     Arguments:
         - packets_file: a string, the file for storing all packets
             needed sent by wb
+
+    Attributes:
+        - load_processes: an integer, the number of processes
+            to parse YAML files, None means parsing them serially
+        - ftw_cache: a ftwcache.ParseCache that saves the packets
+            of YAML files, None means no cache
+        - in_memory: a flag means to save the packets in an anonymous
+            memory file instead of packets_file
+        - templates: a list of (template file, count),
+            the packets rendered from templates follow the ones of '-F'
+        - mixes: a list of (mix specification file, count), the packets
+            drawn from traffic mixes follow the ones of templates
+        - seed: an integer, the seed of random placeholders of templates
+            and of the draws of traffic mixes,
+            None means the packets aren't reproducible
     """
     def __init__(self, packets_file):
         """ Create a _PacketFileEnhance
         """
         self._packets_file = packets_file
         self._read_packets_paths = []
+        self._memory_fd = None
+        self.load_processes = None
+        self.ftw_cache = ftwcache.ParseCache()
+        self.in_memory = False
+        self.templates = []
+        self.mixes = []
+        self.seed = None
 
     def load(self, options):
         """ See OptionParser.do """
@@ -62,14 +101,73 @@ class _PacketFileEnhance(optionparser.OptionParser):
 
     def dump(self):
         """ See OptionParser.dump """
-        if not self._read_packets_paths:
+        if not self._read_packets_paths and not self.templates \
+                and not self.mixes:
             return []
-        with packetsdumper.PacketsDumper(self._packets_file) as dumper:
-            for packet in\
+        report = self._report if self.load_processes else None
+        if self.in_memory:
+            packets_file, packet_count = self._dump_in_memory(report)
+        elif self.templates or self.mixes:
+            # generated packets differ in each run, so no manifest
+            packets_file = self._packets_file
+            packet_count = self._dump_packets(packets_file, report)
+        else:
+            packets_file = self._packets_file
+            # only the changed sources are loaded again
+            packet_count = packetsmanifest.update_packet_file(
+                packets_file,
+                self._read_packets_paths,
+                processes=self.load_processes,
+                report=report,
+                cache=self.ftw_cache)
+        # the count of packets is known,
+        # so that wb needn't parse the packet file to count them
+        if packet_count:
+            return ["-F", packets_file, "-Q", str(packet_count)]
+        return ["-F", packets_file]
+
+    def _dump_in_memory(self, report):
+        """ Save the packets in an anonymous memory file,
+            wb inherits it and opens it by its path under /proc/self/fd
+        """
+        self.close()
+        self._memory_fd = pywbutil.create_memory_file("pywb-packets")
+        packets_file = "/proc/self/fd/%d" % (self._memory_fd, )
+        return packets_file, self._dump_packets(packets_file, report)
+
+    def _dump_packets(self, packets_file, report):
+        """ Save the packets of '-F', of templates and of traffic mixes
+            into packets_file, return the count of packets
+        """
+        with packetsdumper.PacketsDumper(packets_file) as dumper:
+            if self._read_packets_paths:
+                dumper.dump(
                     packetsloader.load_packets_from_paths(
-                        self._read_packets_paths):
-                dumper.dump(packet)
-        return ["-F", self._packets_file]
+                        self._read_packets_paths,
+                        processes=self.load_processes,
+                        report=report,
+                        cache=self.ftw_cache))
+            for index, (template_file, count) in enumerate(self.templates):
+                template = packettemplate.load_template(
+                    template_file, self._get_seed(index))
+                # rendered one by one into the buffer of the dumper
+                dumper.dump(template.generate(count))
+            for index, (mix_file, count) in enumerate(
+                    self.mixes, len(self.templates)):
+                mix = trafficmix.TrafficMix(
+                    trafficmix.load_mix(mix_file), self._get_seed(index))
+                dumper.dump(mix.generate(count))
+        return dumper.packet_count
+
+    def _get_seed(self, index):
+        """ The seed of the index-th packet generator """
+        return self.seed + index if self.seed is not None else None
+
+    def close(self):
+        """ Release the memory file of packets """
+        if self._memory_fd is not None:
+            os.close(self._memory_fd)
+            self._memory_fd = None
 
     def help(self):
         """ See OptionParser.help """
@@ -77,6 +175,811 @@ class _PacketFileEnhance(optionparser.OptionParser):
 include these kind of files\n" % (",".join(packetsloader.LOADERS.keys()))
         return help_string
 
+    @staticmethod
+    def _report(file_count, elapsed_time):
+        sys.stderr.write(
+            "Loaded %d YAML files in %.3f seconds (%.1f files/sec)\n" % (
+                file_count, elapsed_time,
+                file_count / elapsed_time if elapsed_time else 0.0))
+
+
+class _LoadProcessesEnhance(optionparser.OptionParser):
+    """ Load processes parser, add option '--load-processes'
+        to parse the YAML files of '-F' by a process pool
+
+    Arguments:
+        - packet_file_enhance: a _PacketFileEnhance,
+            the parser of '-F' that loads the YAML files
+    """
+    def __init__(self, packet_file_enhance):
+        self._packet_file_enhance = packet_file_enhance
+
+    def load(self, options):
+        """ See OptionParser.load """
+        if not options or not options[0].isdigit() or int(options[0]) < 1:
+            raise ValueError("--load-processes needs a positive integer")
+        self._packet_file_enhance.load_processes = int(options[0])
+        return 1
+
+    def dump(self):
+        """ See OptionParser.dump """
+        return []
+
+    def help(self):
+        """ See OptionParser.help """
+        return "    --load-processes num\n"\
+            + "                    Parse YAML files of -F by num processes "\
+            + "in parallel and report files/sec\n"
+
+
+class _FtwCacheEnhance(optionparser.OptionParser):
+    """ FTW cache parser, add option '--ftw-cache'
+        to change the directory of the parse cache of YAML files
+        or disable it
+
+    Arguments:
+        - packet_file_enhance: a _PacketFileEnhance,
+            the parser of '-F' that loads the YAML files
+    """
+    def __init__(self, packet_file_enhance):
+        self._packet_file_enhance = packet_file_enhance
+
+    def load(self, options):
+        """ See OptionParser.load """
+        if not options or options[0].startswith("-"):
+            raise ValueError("--ftw-cache needs a directory or off")
+        if options[0] == "off":
+            self._packet_file_enhance.ftw_cache = None
+        else:
+            self._packet_file_enhance.ftw_cache = \
+                ftwcache.ParseCache(options[0])
+        return 1
+
+    def dump(self):
+        """ See OptionParser.dump """
+        return []
+
+    def help(self):
+        """ See OptionParser.help """
+        return "    --ftw-cache dir|off\n"\
+            + "                    Cache the packets of YAML files of -F "\
+            + "in dir(default %s) or disable it\n" % (
+                ftwcache.DEFAULT_CACHE_DIR, )
+
+
+class _InMemoryEnhance(optionparser.OptionParser):
+    """ In memory parser, add option '--in-memory'
+        to save the packets of '-F' in an anonymous memory file
+
+    Arguments:
+        - packet_file_enhance: a _PacketFileEnhance,
+            the parser of '-F' that saves the packets
+    """
+    def __init__(self, packet_file_enhance):
+        self._packet_file_enhance = packet_file_enhance
+
+    def load(self, options):
+        """ See OptionParser.load """
+        self._packet_file_enhance.in_memory = True
+        return 0
+
+    def dump(self):
+        """ See OptionParser.dump """
+        return []
+
+    def help(self):
+        """ See OptionParser.help """
+        return "    --in-memory     Save the packets of -F in an anonymous "\
+            + "memory file instead of .default.pkt\n"
+
+
+class _TemplateEnhance(optionparser.OptionParser):
+    """ Template parser, add option '--template'
+        to send packets rendered from a template with placeholders,
+        see packettemplate
+
+    Arguments:
+        - packet_file_enhance: a _PacketFileEnhance,
+            the parser of '-F' that saves the packets
+    """
+    def __init__(self, packet_file_enhance):
+        self._packet_file_enhance = packet_file_enhance
+
+    def load(self, options):
+        """ See OptionParser.load """
+        if len(options) < 2 or not os.path.isfile(
+                os.path.expanduser(options[0])):
+            raise ValueError("--template needs a template file and a count")
+        if not options[1].isdigit() or int(options[1]) < 1:
+            raise ValueError("--template needs a positive count")
+        self._packet_file_enhance.templates.append(
+            (os.path.expanduser(options[0]), int(options[1])))
+        return 2
+
+    def dump(self):
+        """ See OptionParser.dump """
+        return []
+
+    def help(self):
+        """ See OptionParser.help """
+        return "    --template tpl_file count\n"\
+            + "                    Send count packets rendered from "\
+            + "tpl_file with placeholders {{seq}},\n"\
+            + "                    {{random:N}}, {{choice:a|b}}, "\
+            + "{{choice@file}}, {{filler:N}} and {{filler:M-N}}\n"
+
+
+class _MixEnhance(optionparser.OptionParser):
+    """ Mix parser, add option '--mix'
+        to send packets drawn from sources by their weights,
+        see trafficmix
+
+    Arguments:
+        - packet_file_enhance: a _PacketFileEnhance,
+            the parser of '-F' that saves the packets
+    """
+    def __init__(self, packet_file_enhance):
+        self._packet_file_enhance = packet_file_enhance
+
+    def load(self, options):
+        """ See OptionParser.load """
+        if len(options) < 2 or not os.path.isfile(
+                os.path.expanduser(options[0])):
+            raise ValueError("--mix needs a mix specification and a count")
+        if not options[1].isdigit() or int(options[1]) < 1:
+            raise ValueError("--mix needs a positive count")
+        self._packet_file_enhance.mixes.append(
+            (os.path.expanduser(options[0]), int(options[1])))
+        return 2
+
+    def dump(self):
+        """ See OptionParser.dump """
+        return []
+
+    def help(self):
+        """ See OptionParser.help """
+        return "    --mix mix_file count\n"\
+            + "                    Send count packets drawn from the "\
+            + "sources of mix_file by their weights,\n"\
+            + "                    mix_file is a YAML mapping from "\
+            + "paths to weights\n"
+
+
+class _SeedEnhance(optionparser.OptionParser):
+    """ Seed parser, add option '--seed'
+        to make the random packets reproducible
+
+    Arguments:
+        - packet_file_enhance: a _PacketFileEnhance,
+            the parser of '-F' that saves the packets
+    """
+    def __init__(self, packet_file_enhance):
+        self._packet_file_enhance = packet_file_enhance
+
+    def load(self, options):
+        """ See OptionParser.load """
+        if not options or not options[0].isdigit():
+            raise ValueError("--seed needs a non-negative integer")
+        self._packet_file_enhance.seed = int(options[0])
+        return 1
+
+    def dump(self):
+        """ See OptionParser.dump """
+        return []
+
+    def help(self):
+        """ See OptionParser.help """
+        return "    --seed num      Seed of the random placeholders "\
+            + "of --template and the draws of --mix\n"
+
+
+class _PumpStatsEnhance(optionparser.OptionParser):
+    """ Pump stats parser, add option '--pump-stats'
+        to report the metrics of the output pump of wb
+
+    Attributes:
+        - enabled: a flag means to report the metrics
+    """
+    def __init__(self):
+        self.enabled = False
+
+    def load(self, options):
+        """ See OptionParser.load """
+        self.enabled = True
+        return 0
+
+    def dump(self):
+        """ See OptionParser.dump """
+        return []
+
+    def help(self):
+        """ See OptionParser.help """
+        return "    --pump-stats    Report the queue depth and the blocked "\
+            + "time of the output of wb\n"
+
+    @staticmethod
+    def report(stats):
+        sys.stderr.write(
+            "Pumped %d lines(%d bytes) in %.3f seconds, "
+            "max queue depth %d chunks, blocked %.3f seconds, "
+            "dropped %d bytes\n" % (
+                stats["lines"], stats["bytes"], stats["elapsed_time"],
+                stats["max_queue_depth"], stats["blocked_time"],
+                stats["dropped_bytes"]))
+
+
+class _WorkersEnhance(optionparser.OptionParser):
+    """ Workers parser, add option '--workers'
+        to run wb by multiple processes pinned to distinct CPUs
+
+    Attributes:
+        - workers: the number of wb processes
+    """
+    def __init__(self):
+        self.workers = 1
+
+    def load(self, options):
+        """ See OptionParser.load """
+        if not options or not options[0].isdigit() or int(options[0]) < 1:
+            raise ValueError("--workers needs a positive integer")
+        self.workers = int(options[0])
+        return 1
+
+    def dump(self):
+        """ See OptionParser.dump """
+        return []
+
+    def help(self):
+        """ See OptionParser.help """
+        return "    --workers num   Split -c, -n and the packets of -F among "\
+            + "num wb processes\n"\
+            + "                    pinned to distinct CPUs, and merge "\
+            + "their results\n"
+
+
+class _CoordinatorEnhance(optionparser.OptionParser):
+    """ Coordinator parser, add option '--coordinator'
+        to split the run among agents on other hosts
+
+    Attributes:
+        - host: the address to listen for agents(default = "127.0.0.1")
+        - port: the port to listen for agents, None means no coordinator
+        - agents: the number of agents to wait for
+    """
+    def __init__(self):
+        self.host = "127.0.0.1"
+        self.port = None
+        self.agents = 0
+
+    def load(self, options):
+        """ See OptionParser.load """
+        match = re.match(r"^(?:([^:]*):)?(\d+)$", options[0]) \
+            if options else None
+        if len(options) < 2 or not match \
+                or not options[1].isdigit() or int(options[1]) < 1:
+            raise ValueError("--coordinator needs a [host:]port and "
+                             "a positive number of agents")
+        if match.group(1) is not None:
+            self.host = match.group(1)
+        self.port = int(match.group(2))
+        self.agents = int(options[1])
+        return 2
+
+    def dump(self):
+        """ See OptionParser.dump """
+        return []
+
+    def help(self):
+        """ See OptionParser.help """
+        return "    --coordinator [host:]port agents\n"\
+            + "                    Wait for agents on host(default "\
+            + "127.0.0.1):port, split -c, -n,\n"\
+            + "                    -R and the packets of -F among them "\
+            + "and merge their results\n"
+
+
+class _AgentEnhance(optionparser.OptionParser):
+    """ Agent parser, add option '--agent'
+        to run the share of a coordinator
+
+    Attributes:
+        - address: the (host, port) of the coordinator,
+            None means not an agent
+    """
+    def __init__(self):
+        self.address = None
+
+    def load(self, options):
+        """ See OptionParser.load """
+        if not options or not re.match(r"^[^:]+:\d+$", options[0]):
+            raise ValueError("--agent needs the host:port of a coordinator")
+        host, port = options[0].rsplit(":", 1)
+        self.address = (host, int(port))
+        return 1
+
+    def dump(self):
+        """ See OptionParser.dump """
+        return []
+
+    def help(self):
+        """ See OptionParser.help """
+        return "    --agent host:port\n"\
+            + "                    Register to the coordinator at host:port "\
+            + "and run its share,\n"\
+            + "                    the other options come from "\
+            + "the coordinator\n"
+
+
+class _ClusterTokenEnhance(optionparser.OptionParser):
+    """ Cluster token parser, add option '--cluster-token'
+        to authenticate the agents of a coordinator
+
+    Attributes:
+        - token: the shared token of the coordinator and its agents,
+            None means no token
+    """
+    def __init__(self):
+        self.token = None
+
+    def load(self, options):
+        """ See OptionParser.load """
+        if not options or not options[0]:
+            raise ValueError("--cluster-token needs a token")
+        self.token = options[0]
+        return 1
+
+    def dump(self):
+        """ See OptionParser.dump """
+        return []
+
+    def help(self):
+        """ See OptionParser.help """
+        return "    --cluster-token token\n"\
+            + "                    The coordinator only accepts the agents "\
+            + "with the same token\n"
+
+
+class _SaturateEnhance(optionparser.OptionParser):
+    """ Saturate parser, add option '--saturate'
+        to ramp the concurrency or the rate limit of wb until
+        the throughput plateaus or the failures rise
+
+    Attributes:
+        - dimension: "concurrency" or "rate", None means not to ramp
+        - levels: the list of load levels
+    """
+    _OPTIONS = {"concurrency": "-c", "rate": "-R"}
+
+    def __init__(self):
+        self.dimension = None
+        self.levels = []
+
+    @property
+    def option(self):
+        """ The option of wb of the load """
+        return self._OPTIONS[self.dimension]
+
+    def load(self, options):
+        """ See OptionParser.load """
+        if len(options) < 4 or options[0] not in self._OPTIONS \
+                or not options[1].isdigit() or not options[2].isdigit():
+            raise ValueError("--saturate needs concurrency|rate, "
+                             "start, stop and step")
+        self.dimension = options[0]
+        self.levels = saturation.ramp_levels(
+            int(options[1]), int(options[2]), options[3])
+        return 4
+
+    def dump(self):
+        """ See OptionParser.dump """
+        return []
+
+    def help(self):
+        """ See OptionParser.help """
+        return "    --saturate concurrency|rate start stop step\n"\
+            + "                    Ramp -c or -R from start to stop by step"\
+            + "(N or xN), each step\n"\
+            + "                    runs -t/-n, report the knee and "\
+            + "the curve of throughput\n"
+
+
+class _SloEnhance(optionparser.OptionParser):
+    """ SLO parser, add option '--slo'
+        to search the highest rate limit of wb that meets an SLO
+
+    Attributes:
+        - max_latency: the limit of the 99th percentile latency in ms,
+            None means not to search
+        - max_error_rate: the limit of the rate of failed requests
+        - start_rate: the first rate limit to run
+        - max_rate: the highest rate limit to run
+        - trials: the number of runs of each rate
+        - warmup: the seconds at the beginning of each run whose
+            requests are discarded from the latency
+    """
+    def __init__(self):
+        self.max_latency = None
+        self.max_error_rate = None
+        self.start_rate = None
+        self.max_rate = None
+        self.trials = 3
+        self.warmup = 1
+
+    def load(self, options):
+        """ See OptionParser.load """
+        try:
+            self.max_latency = float(options[0])
+            self.max_error_rate = float(options[1]) / 100
+            self.start_rate = fanout.parse_rate(options[2])
+            self.max_rate = fanout.parse_rate(options[3])
+        except (IndexError, ValueError):
+            raise ValueError("--slo needs p99_ms, error_percent, "
+                             "start_rate and max_rate")
+        if not 0 < self.start_rate <= self.max_rate:
+            raise ValueError("--slo needs 0 < start_rate <= max_rate")
+        return 4
+
+    def dump(self):
+        """ See OptionParser.dump """
+        return []
+
+    def help(self):
+        """ See OptionParser.help """
+        return "    --slo p99_ms error_percent start_rate max_rate\n"\
+            + "                    Search the highest -R up to max_rate "\
+            + "whose p99 latency and\n"\
+            + "                    failed requests are under the limits\n"
+
+
+class _SloTrialsEnhance(optionparser.OptionParser):
+    """ SLO trials parser, add option '--slo-trials'
+        to set the number of runs of each rate of --slo
+
+    Arguments:
+        - slo_enhance: a _SloEnhance, the parser of '--slo'
+    """
+    def __init__(self, slo_enhance):
+        self._slo_enhance = slo_enhance
+
+    def load(self, options):
+        """ See OptionParser.load """
+        if not options or not options[0].isdigit() or int(options[0]) <= 0:
+            raise ValueError("--slo-trials needs a positive integer")
+        self._slo_enhance.trials = int(options[0])
+        return 1
+
+    def dump(self):
+        """ See OptionParser.dump """
+        return []
+
+    def help(self):
+        """ See OptionParser.help """
+        return "    --slo-trials num\n"\
+            + "                    Run each rate of --slo num times"\
+            + "(default 3)\n"
+
+
+class _SloWarmupEnhance(optionparser.OptionParser):
+    """ SLO warmup parser, add option '--slo-warmup'
+        to discard the requests of the first seconds of each run of --slo
+
+    Arguments:
+        - slo_enhance: a _SloEnhance, the parser of '--slo'
+    """
+    def __init__(self, slo_enhance):
+        self._slo_enhance = slo_enhance
+
+    def load(self, options):
+        """ See OptionParser.load """
+        if not options or not options[0].isdigit():
+            raise ValueError("--slo-warmup needs a non-negative integer")
+        self._slo_enhance.warmup = int(options[0])
+        return 1
+
+    def dump(self):
+        """ See OptionParser.dump """
+        return []
+
+    def help(self):
+        """ See OptionParser.help """
+        return "    --slo-warmup seconds\n"\
+            + "                    Discard the requests of the first seconds "\
+            + "of each run of --slo\n"\
+            + "                    from the latency(default 1)\n"
+
+
+class _MetricsEnhance(optionparser.OptionParser):
+    """ Metrics parser, add option '--metrics-port'
+        to expose the time series of the progress of wb over HTTP,
+        the extended progress(-5) of wb is enabled for the latency
+        and the failed requests of each interval
+
+    Arguments:
+        - options: a list, the command arguments of pywb
+
+    Attributes:
+        - port: the port of the metrics server on localhost,
+            None means not to serve
+        - jsonl_file: the path of the JSON lines file of the intervals,
+            None means not to save, see '--metrics-jsonl'
+        - time_unit: the unit of the latency of wb, -3 toggles it
+    """
+    def __init__(self, options):
+        self.port = None
+        self.jsonl_file = None
+        self.time_unit = "ms" if options.count("-3") % 2 else "us"
+
+    @property
+    def enabled(self):
+        return self.port is not None or self.jsonl_file is not None
+
+    def load(self, options):
+        """ See OptionParser.load """
+        if not options or not options[0].isdigit():
+            raise ValueError("--metrics-port needs a port")
+        self.port = int(options[0])
+        return 1
+
+    def dump(self):
+        """ See OptionParser.dump """
+        return ["-5"] if self.enabled else []
+
+    def help(self):
+        """ See OptionParser.help """
+        return "    --metrics-port port\n"\
+            + "                    Serve the progress of each interval "\
+            + "on localhost:port,\n"\
+            + "                    /metrics for Prometheus and /series "\
+            + "as JSON lines\n"
+
+
+class _MetricsJsonlEnhance(optionparser.OptionParser):
+    """ Metrics JSON lines parser, add option '--metrics-jsonl'
+        to append the progress of each interval to a JSON lines file
+
+    Arguments:
+        - metrics_enhance: a _MetricsEnhance,
+            the parser of '--metrics-port'
+    """
+    def __init__(self, metrics_enhance):
+        self._metrics_enhance = metrics_enhance
+
+    def load(self, options):
+        """ See OptionParser.load """
+        if not options:
+            raise ValueError("--metrics-jsonl needs a file")
+        self._metrics_enhance.jsonl_file = options[0]
+        return 1
+
+    def dump(self):
+        """ See OptionParser.dump """
+        return []
+
+    def help(self):
+        """ See OptionParser.help """
+        return "    --metrics-jsonl file\n"\
+            + "                    Append the progress of each interval "\
+            + "to file as JSON lines\n"
+
+
+class _ResultJsonEnhance(optionparser.OptionParser):
+    """ Result JSON parser, add option '--result-json'
+        to save the result parsed from the summary of wb as JSON
+
+    Attributes:
+        - result_file: the path of the JSON file, None means not to save
+    """
+    def __init__(self):
+        self.result_file = None
+
+    def load(self, options):
+        """ See OptionParser.load """
+        if not options:
+            raise ValueError("--result-json needs a file")
+        self.result_file = options[0]
+        return 1
+
+    def dump(self):
+        """ See OptionParser.dump """
+        return []
+
+    def help(self):
+        """ See OptionParser.help """
+        return "    --result-json file\n"\
+            + "                    Save the throughput, latencies "\
+            + "and failures of wb to a JSON file\n"
+
+    def save(self, result):
+        """ Save result, an object that has to_json """
+        with open(self.result_file, "w") as fd:
+            fd.write(result.to_json(indent=4))
+            fd.write("\n")
+
+
+class _HistogramEnhance(optionparser.OptionParser):
+    """ Histogram parser, add option '--histogram'
+        to save the mergeable histogram of the latencies of wb as JSON,
+        the latencies come from the gnuplot file(-g) of wb
+
+    Arguments:
+        - options: a list, the command arguments of pywb
+
+    Attributes:
+        - histogram_file: the path of the JSON file,
+            None means not to save
+        - time_unit: the unit of the latency of wb, -3 toggles it
+    """
+    def __init__(self, options):
+        self.histogram_file = None
+        self.time_unit = "ms" if options.count("-3") % 2 else "us"
+
+    def load(self, options):
+        """ See OptionParser.load """
+        if not options:
+            raise ValueError("--histogram needs a file")
+        self.histogram_file = options[0]
+        return 1
+
+    def dump(self):
+        """ See OptionParser.dump """
+        return []
+
+    def help(self):
+        """ See OptionParser.help """
+        return "    --histogram file\n"\
+            + "                    Save the mergeable histogram of "\
+            + "the latencies to a JSON file\n"
+
+    def save(self, histogram_):
+        """ Save histogram_, a histogram.Histogram """
+        histogram_.save(self.histogram_file)
+
+
+class _ArchiveEnhance(optionparser.OptionParser):
+    """ Archive parser, add option '--archive'
+        to archive the run in a SQLite database with a build label
+
+    Attributes:
+        - database: the path of the database, None means not to archive
+        - label: the label of the WAF build
+    """
+    def __init__(self):
+        self.database = None
+        self.label = None
+
+    def load(self, options):
+        """ See OptionParser.load """
+        if len(options) < 2:
+            raise ValueError("--archive needs a database and a label")
+        self.database, self.label = options[0], options[1]
+        return 2
+
+    def dump(self):
+        """ See OptionParser.dump """
+        return []
+
+    def help(self):
+        """ See OptionParser.help """
+        return "    --archive database label\n"\
+            + "                    Archive the parameters, the packets hash, "\
+            + "the result and\n"\
+            + "                    the histogram of the run with the "\
+            + "label of the WAF build\n"
+
+    def save(self, arguments, result, histogram_):
+        """ Archive the run
+
+        Return the run_id
+        """
+        index = optionparser.find_argument(arguments, "-F")
+        archive = runarchive.RunArchive(self.database)
+        try:
+            return archive.add(
+                runarchive.benchmark_name(arguments), result, self.label,
+                arguments[1:],
+                runarchive.corpus_hash([arguments[index]])
+                if index != -1 else None,
+                histogram_)
+        finally:
+            archive.close()
+
+
+class _EngineEnhance(optionparser.OptionParser):
+    """ Engine parser, add option '--engine'
+        to send the packets by the pure-Python engine instead of wb,
+        "asyncio" is an alias of "python"
+
+    Arguments:
+        - options: a list, the command arguments of pywb
+
+    Attributes:
+        - engine: "wb" or "python"
+    """
+    _ENGINES = {"wb": "wb", "python": "python", "asyncio": "python"}
+
+    def __init__(self, options):
+        self.engine = "wb"
+        # the python engine doesn't need wb,
+        # so the engine is known before the arguments are parsed
+        if "--engine" in options:
+            position = options.index("--engine")
+            if position + 1 < len(options):
+                self.engine = self._ENGINES.get(options[position + 1], "wb")
+
+    @property
+    def wb_path(self):
+        """ The executable in the parsed arguments,
+            None means the path of wb
+        """
+        return "pyengine" if self.engine == "python" else None
+
+    def load(self, options):
+        """ See OptionParser.load """
+        if not options or options[0] not in self._ENGINES:
+            raise ValueError("--engine needs wb, python or asyncio")
+        self.engine = self._ENGINES[options[0]]
+        return 1
+
+    def dump(self):
+        """ See OptionParser.dump """
+        return []
+
+    def help(self):
+        """ See OptionParser.help """
+        return "    --engine wb|python|asyncio\n"\
+            + "                    Send the packets by wb(default) or "\
+            + "the pure-Python engine(python or asyncio),\n"\
+            + "                    which supports -c, -n, -t, -k, -F, -R, "\
+            + "-s, -g, -j, -W and -3\n"
+
+
+class _PacketStatsEnhance(optionparser.OptionParser):
+    """ Packet stats parser, add option '--packet-stats'
+        to save the statistics of each packet of the python engine
+        as JSON lines
+
+    Attributes:
+        - stats_file: the path of the JSON lines file,
+            None means not to save
+    """
+    def __init__(self):
+        self.stats_file = None
+
+    def load(self, options):
+        """ See OptionParser.load """
+        if not options:
+            raise ValueError("--packet-stats needs a file")
+        self.stats_file = options[0]
+        return 1
+
+    def dump(self):
+        """ See OptionParser.dump """
+        return []
+
+    def help(self):
+        """ See OptionParser.help """
+        return "    --packet-stats file\n"\
+            + "                    Save the requests, failures and "\
+            + "latencies of each packet\n"\
+            + "                    to file as JSON lines, "\
+            + "it needs --engine python\n"
+
+    def save(self, packet_stats, time_unit):
+        """ Save packet_stats, see pyengine.Runner.packet_stats """
+        with open(self.stats_file, "w") as fd:
+            for index, (requests, failed, non_2xx, total, max_) \
+                    in enumerate(packet_stats):
+                fd.write(json.dumps(collections.OrderedDict([
+                    ("packet", index),
+                    ("requests", requests),
+                    ("failed", failed),
+                    ("non_2xx_responses", non_2xx),
+                    ("mean", total // requests if requests else None),
+                    ("max", max_),
+                    ("time_unit", time_unit),
+                ])))
+                fd.write("\n")
+
 
 class _UploadFileEnhance(optionparser.OptionParser):
     """ Upload file parser, enhance option '-p' and -u'
@@ -204,15 +1107,15 @@ class _HelpInfoGenerator(outputfilter.OutputFilter):
         if opt:
             opt = opt.group(1)
             if opt in self._enhance_options:
-                self.__ignore = True
+                self._ignore = True
             else:
-                self.__ignore = False
+                self._ignore = False
         # first char isn't a space, need cancel ignore
         pattern = r"^\S"
         if re.match(pattern, line):
-            self.__ignore = False
+            self._ignore = False
         # ignore this line
-        if self.__ignore:
+        if self._ignore:
             return None
         return line
 
@@ -230,36 +1133,195 @@ class _HelpInfoGenerator(outputfilter.OutputFilter):
         return line
 
 
-def execute_wb(arguments, filters):
+def execute_wb(arguments, filters, pump_stats=None):
     """ execute wb by a subprocess
 
     Argument:
         - arguments: A string list of the arguments will pass to wb
         - filters: A list of filters to process
-            the output of wb
+            the output of wb, None means that wb inherits stdout and
+            its stderr goes to stdout too, so that python does nothing
+            during the run
+        - pump_stats: A dict to be updated with the metrics of
+            the output pump, see outputpump.OutputPump.stats
 
     Return an interger that is return code of wb
     """
-    wb = subprocess.Popen(
-        arguments, shell=False,
-        stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    if filters is None:
+        # what python printed comes before the output of wb
+        sys.stdout.flush()
+        sys.stderr.flush()
+        # the progress of wb on stderr is captured with stdout,
+        # the same as the filtered output
+        wb = subprocess.Popen(arguments, shell=False,
+                              stderr=subprocess.STDOUT)
+    else:
+        wb = subprocess.Popen(
+            arguments, shell=False,
+            stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
     # ignore SIGINT
     original_handler = signal.getsignal(signal.SIGINT)
     signal.signal(signal.SIGINT, signal.SIG_IGN)
-    while True:
-        line = wb.stdout.readline()
-        if not line:
-            break
-        for filter_ in filters:
+    if filters is not None:
+        # the output is drained by a thread, so filters don't throttle wb
+        stats = outputpump.OutputPump(wb.stdout, filters).run()
+        if pump_stats is not None:
+            pump_stats.update(stats)
+    return_code = wb.wait()
+    # recover SIGINT
+    signal.signal(signal.SIGINT, original_handler)
+    return return_code
+
+
+def _has_target(arguments):
+    """ Whether the arguments of wb have the target,
+        wb prints its usage without it
+    """
+    i = 1
+    while i < len(arguments):
+        if not arguments[i].startswith("-"):
+            return True
+        i += 2 if optionparser.has_argument(arguments[i]) else 1
+    return False
+
+
+# the default -t and -W of wb
+_DEFAULT_TIME_LIMIT = 5
+_DEFAULT_STATS_WINDOW = 50000
+
+
+def _cover_stats_window(arguments):
+    """ Set -W of wb to cover all of the requests of a run,
+        wb only saves the samples of the last -W requests into
+        the gnuplot file(-g)
+
+    Raise ValueError if the requests aren't bounded by -n or -R
+    """
+    find_argument = optionparser.find_argument
+    bounds = []
+    index = find_argument(arguments, "-n")
+    if index != -1:
+        # -n is the passes over the packets of -F
+        packets = 1
+        count_index = find_argument(arguments, "-Q")
+        packets_index = find_argument(arguments, "-F")
+        if count_index != -1 and int(arguments[count_index]) > 0:
+            packets = int(arguments[count_index])
+        elif packets_index != -1:
+            packets = packetsloader.count_packets(arguments[packets_index])
+        bounds.append(int(arguments[index]) * max(packets, 1))
+    rate_index = find_argument(arguments, "-R")
+    time_index = find_argument(arguments, "-t")
+    if rate_index != -1 and (time_index != -1 or index == -1):
+        seconds = int(arguments[time_index]) if time_index != -1 \
+            else _DEFAULT_TIME_LIMIT
+        # the requests of the last partial second
+        bounds.append(
+            fanout.parse_rate(arguments[rate_index]) * (seconds + 1))
+    if not bounds:
+        raise ValueError("the requests of a probe must be bounded "
+                         "by -n or -R to record all of their latencies")
+    window_index = find_argument(arguments, "-W")
+    window = int(arguments[window_index]) if window_index != -1 \
+        else _DEFAULT_STATS_WINDOW
+    optionparser.set_argument(arguments, "-W", str(max(min(bounds), window)))
+
+
+def _probe(arguments, option, level, workers=1, histograms=None,
+           warmup=0, engine="wb"):
+    """ Run wb with the argument of option set to level quietly
+
+    Arguments:
+        - histograms: a list to be appended with the histogram.Histogram
+            of the total times of the requests
+        - warmup: the requests that started in the first warmup seconds
+            of the run aren't recorded into the histogram
+        - engine: "wb" or "python", see '--engine'
+
+    Return the resultparser.WbResult
+    """
+    arguments = list(arguments)
+    optionparser.set_argument(arguments, option, str(level))
+    if histograms is not None and engine != "python":
+        # all of the requests are in the gnuplot files of wb
+        _cover_stats_window(arguments)
+    parser = resultparser.ResultParser()
+    if engine == "python":
+        runner = pyengine.Runner(arguments, workers, warmup=warmup)
+        return_code = runner.run([parser])
+        if histograms is not None:
+            histograms.append(runner.histogram)
+    elif workers > 1:
+        fan_out = fanout.FanOut(arguments, workers, warmup=warmup)
+        return_code = fan_out.run([parser])
+        if histograms is not None:
+            histograms.append(fan_out.histogram)
+    elif histograms is not None:
+        fd, gnuplot_file = tempfile.mkstemp(prefix="pywb-", suffix=".tsv")
+        os.close(fd)
+        try:
+            optionparser.set_argument(arguments, "-g", gnuplot_file)
+            start = time.time()
+            return_code = execute_wb(arguments, [parser])
+            histograms.append(histogram.from_gnuplot(
+                gnuplot_file, time_unit=parser.result.time_unit or "us",
+                warmup=warmup, start=start))
+        finally:
+            os.remove(gnuplot_file)
+    else:
+        return_code = execute_wb(arguments, [parser])
+    parser.result.return_code = return_code
+    return parser.result
+
+
+def _saturate(arguments, saturate_enhance, workers, output_filters,
+              engine="wb"):
+    """ Find the saturation point, the steps and the knee are
+        reported to output_filters
+
+    Return the saturation.SaturationFinder
+    """
+    def report(line):
+        for filter_ in output_filters:
             line = filter_(line)
             if line is None:
                 break
-    # recover SIGINT
-    signal.signal(signal.SIGINT, original_handler)
-    return wb.wait()
+    finder = saturation.SaturationFinder(
+        lambda level: _probe(arguments, saturate_enhance.option, level,
+                             workers, engine=engine),
+        saturate_enhance.levels, saturate_enhance.dimension)
+    finder.run(report)
+    return finder
+
 
+def _search_slo(arguments, slo_enhance, workers, output_filters,
+                engine="wb"):
+    """ Search the highest rate that meets the SLO, the rates and
+        the result are reported to output_filters
 
-def execute(arguments, customized_options={}, customized_filters=[]):
+    Return the slosearch.SloSearch
+    """
+    def report(line):
+        for filter_ in output_filters:
+            line = filter_(line)
+            if line is None:
+                break
+
+    def probe(rate):
+        histograms = []
+        result = _probe(arguments, "-R", rate, workers, histograms,
+                        slo_enhance.warmup, engine)
+        return result, histograms[0]
+    search = slosearch.SloSearch(
+        probe, slo_enhance.max_latency, slo_enhance.max_error_rate,
+        slo_enhance.start_rate, slo_enhance.max_rate,
+        trials=slo_enhance.trials)
+    search.run(report)
+    return search
+
+
+def execute(arguments, customized_options={}, customized_filters=[],
+            parse_result=False):
     """ Execute pywb
 
     Arguments:
@@ -271,31 +1333,198 @@ def execute(arguments, customized_options={}, customized_filters=[]):
                 that specified the action for its option.
         - customized_filters: a list of OutputFilters,
                 customized filters for processing the output of wb
+        - parse_result: a flag means to return a resultparser.WbResult
+            parsed from the summary of wb instead of the return code,
+            or the saturation.SaturationFinder of --saturate,
+            or the slosearch.SloSearch of --slo
 
-    Return an interger that is return code of wb
+    Return an interger that is return code of wb,
+        or a resultparser.WbResult whose return_code is set
+        if parse_result is True
     """
 
+    packet_file_enhance = _PacketFileEnhance(".default.pkt")
+    pump_stats_enhance = _PumpStatsEnhance()
+    result_json_enhance = _ResultJsonEnhance()
+    workers_enhance = _WorkersEnhance()
+    coordinator_enhance = _CoordinatorEnhance()
+    agent_enhance = _AgentEnhance()
+    cluster_token_enhance = _ClusterTokenEnhance()
+    saturate_enhance = _SaturateEnhance()
+    slo_enhance = _SloEnhance()
+    metrics_enhance = _MetricsEnhance(arguments)
+    histogram_enhance = _HistogramEnhance(arguments)
+    archive_enhance = _ArchiveEnhance()
+    engine_enhance = _EngineEnhance(arguments)
+    packet_stats_enhance = _PacketStatsEnhance()
     enhance_options =\
         collections.OrderedDict([
-            ("-F", _PacketFileEnhance(".default.pkt")),
+            ("-F", packet_file_enhance),
             ("-p", _UploadFileEnhance("-p", arguments)),
             ("-u", _UploadFileEnhance("-u", arguments)),
+            ("--load-processes", _LoadProcessesEnhance(packet_file_enhance)),
+            ("--ftw-cache", _FtwCacheEnhance(packet_file_enhance)),
+            ("--in-memory", _InMemoryEnhance(packet_file_enhance)),
+            ("--template", _TemplateEnhance(packet_file_enhance)),
+            ("--mix", _MixEnhance(packet_file_enhance)),
+            ("--seed", _SeedEnhance(packet_file_enhance)),
+            ("--pump-stats", pump_stats_enhance),
+            ("--result-json", result_json_enhance),
+            ("--histogram", histogram_enhance),
+            ("--archive", archive_enhance),
+            ("--engine", engine_enhance),
+            ("--packet-stats", packet_stats_enhance),
+            ("--workers", workers_enhance),
+            ("--coordinator", coordinator_enhance),
+            ("--agent", agent_enhance),
+            ("--cluster-token", cluster_token_enhance),
+            ("--saturate", saturate_enhance),
+            ("--slo", slo_enhance),
+            ("--slo-trials", _SloTrialsEnhance(slo_enhance)),
+            ("--slo-warmup", _SloWarmupEnhance(slo_enhance)),
+            ("--metrics-port", metrics_enhance),
+            ("--metrics-jsonl", _MetricsJsonlEnhance(metrics_enhance)),
         ])
 
     for opt, parser in customized_options.items():
         enhance_options[opt] = parser
 
-    arguments = optionparser.parse(
-        arguments,
-        enhance_options=enhance_options)
-
     output_filters = [
         _HelpInfoGenerator(enhance_options),
         _simple_printer,
     ]
 
+    result_parser = resultparser.ResultParser()
     output_filters = customized_filters + output_filters
-    return execute_wb(arguments, output_filters)
+    series = None
+    metrics_server = None
+    gnuplot_file = None
+    try:
+        help_requested = "-h" in arguments
+        python_engine = not help_requested \
+            and engine_enhance.engine == "python"
+        arguments = optionparser.parse(
+            arguments,
+            enhance_options=enhance_options,
+            wb_path=engine_enhance.wb_path if python_engine else None)
+        if python_engine and (agent_enhance.address is not None
+                              or coordinator_enhance.port is not None):
+            raise ValueError("--engine python doesn't support "
+                             "--agent and --coordinator")
+        if packet_stats_enhance.stats_file is not None \
+                and not python_engine and not help_requested:
+            raise ValueError("--packet-stats needs --engine python")
+        if saturate_enhance.dimension is not None and not help_requested:
+            finder = _saturate(arguments, saturate_enhance,
+                               workers_enhance.workers, output_filters,
+                               engine_enhance.engine)
+            if result_json_enhance.result_file is not None:
+                result_json_enhance.save(finder)
+            if parse_result:
+                return finder
+            return 0 if finder.knee is not None else 1
+        if slo_enhance.max_latency is not None and not help_requested:
+            search = _search_slo(arguments, slo_enhance,
+                                 workers_enhance.workers, output_filters,
+                                 engine_enhance.engine)
+            if result_json_enhance.result_file is not None:
+                result_json_enhance.save(search)
+            if parse_result:
+                return search
+            return 0 if search.best is not None else 1
+        archive_requested = not help_requested \
+            and archive_enhance.database is not None
+        result_requested = parse_result or archive_requested \
+            or result_json_enhance.result_file is not None
+        if result_requested:
+            output_filters.insert(0, result_parser)
+        if metrics_enhance.enabled and not help_requested:
+            # the python engine and the coordinator merge the progress,
+            # the coordinator merges the simple progress without latency
+            series = timeseries.TimeSeries(
+                jsonl_file=metrics_enhance.jsonl_file,
+                time_unit=metrics_enhance.time_unit,
+                workers=1 if python_engine
+                or coordinator_enhance.port is not None
+                else workers_enhance.workers)
+            output_filters.insert(0, series)
+            if metrics_enhance.port is not None:
+                metrics_server = timeseries.MetricsServer(
+                    series, metrics_enhance.port)
+        multiple_processes = not help_requested and (
+            python_engine
+            or agent_enhance.address is not None
+            or coordinator_enhance.port is not None
+            or workers_enhance.workers > 1)
+        histogram_ = None
+        histogram_requested = archive_requested or (
+            not help_requested
+            and histogram_enhance.histogram_file is not None)
+        if histogram_requested and not multiple_processes \
+                and optionparser.find_argument(arguments, "-g") == -1:
+            # the samples of wb are saved to a temporary gnuplot file
+            fd, gnuplot_file = tempfile.mkstemp(prefix="pywb-",
+                                                suffix=".tsv")
+            os.close(fd)
+            optionparser.set_argument(arguments, "-g", gnuplot_file)
+        if agent_enhance.address is not None and not help_requested:
+            runner = cluster.Agent(
+                agent_enhance.address, workers=workers_enhance.workers,
+                token=cluster_token_enhance.token)
+            return_code = runner.run(output_filters)
+        elif coordinator_enhance.port is not None and not help_requested:
+            runner = cluster.Coordinator(
+                (coordinator_enhance.host, coordinator_enhance.port),
+                coordinator_enhance.agents, arguments,
+                token=cluster_token_enhance.token)
+            return_code = runner.run(output_filters)
+        elif python_engine:
+            runner = pyengine.Runner(arguments, workers_enhance.workers)
+            return_code = runner.run(output_filters)
+            if packet_stats_enhance.stats_file is not None:
+                packet_stats_enhance.save(runner.packet_stats,
+                                          runner.result.time_unit)
+        elif workers_enhance.workers > 1 and not help_requested:
+            runner = fanout.FanOut(arguments, workers_enhance.workers)
+            return_code = runner.run(output_filters)
+        elif not customized_filters and not help_requested \
+                and not pump_stats_enhance.enabled and not result_requested \
+                and series is None and _has_target(arguments):
+            # only the printer would process the output,
+            # so wb writes to stdout directly,
+            # but its usage is replaced by the help of pywb without target
+            return_code = execute_wb(arguments, None)
+        else:
+            pump_stats = {}
+            return_code = execute_wb(arguments, output_filters, pump_stats)
+            if pump_stats_enhance.enabled:
+                pump_stats_enhance.report(pump_stats)
+        if histogram_requested:
+            if multiple_processes:
+                histogram_ = runner.histogram
+            else:
+                histogram_ = histogram.from_gnuplot(
+                    arguments[optionparser.find_argument(arguments, "-g")],
+                    time_unit=histogram_enhance.time_unit)
+            if histogram_ is not None \
+                    and histogram_enhance.histogram_file is not None:
+                histogram_enhance.save(histogram_)
+        result_parser.result.return_code = return_code
+        if archive_requested:
+            archive_enhance.save(arguments, result_parser.result, histogram_)
+        if result_json_enhance.result_file is not None:
+            result_json_enhance.save(result_parser.result)
+        if parse_result:
+            return result_parser.result
+        return return_code
+    finally:
+        if gnuplot_file is not None and os.path.exists(gnuplot_file):
+            os.remove(gnuplot_file)
+        if metrics_server is not None:
+            metrics_server.close()
+        if series is not None:
+            series.close()
+        packet_file_enhance.close()
 
 if __name__ == '__main__':
     sys.exit(execute(sys.argv[1:]))
@@ -8,6 +8,12 @@
 This exports:
     - parse is a function that parses all options and
         delegate them to those enhance parsers.
+    - has_argument is a function that checks whether an option
+        of wb needs an argument.
+    - find_argument is a function that finds the argument of an option
+        in the arguments of wb.
+    - set_argument is a function that sets the argument of an option
+        in the arguments of wb.
     - OptionParser is a class, it's an abstract class
         and defines the interfaces. All of option parsers need
         inherit this class.
@@ -18,6 +24,9 @@ Option parser of pywb to improve or modify the action which
 
 __all__ = [
     "parse",
+    "has_argument",
+    "find_argument",
+    "set_argument",
     "OptionParser",
 ]
 
@@ -28,19 +37,57 @@ import abc
 import pywbutil
 
 
-def parse(options, enhance_options):
+_ACCEPTABLE_WB_OPTIONS = "n:c:t:s:b:T:p:u:v:lrkVhwiIx:"\
+                         "y:z:C:H:P:A:g:X:de:SqB:m:Z:f:"\
+                         "Y:a:o:F:j:J:O:R:D:U:Y:W:E:G:Q:"\
+                         "K012:3456789"
+
+
+def has_argument(option):
+    """ Whether option(e.g. "-c") of wb needs an argument """
+    if len(option) != 2 or not option.startswith("-"):
+        return False
+    position = _ACCEPTABLE_WB_OPTIONS.find(option[1])
+    return position != -1 \
+        and position + 1 < len(_ACCEPTABLE_WB_OPTIONS) \
+        and _ACCEPTABLE_WB_OPTIONS[position + 1] == ":"
+
+
+def find_argument(arguments, option):
+    """ Return the index of the argument of option in the arguments of wb
+        whose first one is the path of wb, -1 if option isn't set
+    """
+    i = 1
+    while i < len(arguments):
+        if arguments[i] == option:
+            return i + 1
+        i += 2 if has_argument(arguments[i]) else 1
+    return -1
+
+
+def set_argument(arguments, option, value):
+    """ Set the argument of option in the arguments of wb in place,
+        option is added after the path of wb if it isn't set
+    """
+    index = find_argument(arguments, option)
+    if index == -1:
+        arguments[1:1] = [option, value]
+    else:
+        arguments[index] = value
+
+
+def parse(options, enhance_options, wb_path=None):
     """ Parse all options and delegate them to those enhance parsers
 
     Arguments:
         - options: a list, the command arguments of pywb
         - enhance_options: a dict that key is option and
             the value is option parser of processing arguments
+        - wb_path: the first one of the result,
+            default is the path of wb
     """
 
-    acceptable_wb_options = "n:c:t:s:b:T:p:u:v:lrkVhwiIx:"\
-                            "y:z:C:H:P:A:g:X:de:SqB:m:Z:f:"\
-                            "Y:a:o:F:j:J:O:R:D:U:Y:W:E:G:Q:"\
-                            "K012:3456789"
+    acceptable_wb_options = _ACCEPTABLE_WB_OPTIONS
     # Anonymous_options are those options without prefix dash.
     # They were not defined at acceptable_wb_option.
     # e.g. destination hostname
@@ -77,7 +124,7 @@ def parse(options, enhance_options):
             continue
 
     # combine all options
-    options = [pywbutil.get_wb_path()]
+    options = [wb_path or pywbutil.get_wb_path()]
     for _, trigger in enhance_options.items():
         options += trigger.dump()
     options += defined_options
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+""" Output pump of wb
+
+This exports:
+    - DEFAULT_CHUNK_SIZE is the default size of a read from the pipe.
+    - DEFAULT_QUEUE_SIZE is the default number of chunks in the queue.
+    - OutputPump is a class that drains the output of wb by a thread
+        and passes its lines to the filters.
+
+wb blocks when the pipe of its output is full, so slow filters running
+in the loop of reading would throttle wb and distort its measurement.
+The pump reads the pipe in large chunks by a reader thread into a
+bounded queue, and the filters consume the lines in the thread that
+runs the pump, so filters needn't be thread-safe(e.g. they may use
+a sqlite3 connection of that thread).
+"""
+
+__all__ = [
+    "DEFAULT_CHUNK_SIZE",
+    "DEFAULT_QUEUE_SIZE",
+    "OutputPump",
+]
+
+import os
+import time
+import Queue
+import threading
+
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_QUEUE_SIZE = 256
+
+# markers in the queue
+_END = object()
+_GAP = object()
+
+
+class OutputPump(object):
+    """ Drain a stream by a reader thread and filter its lines
+
+    Arguments:
+        - stream: a file object or a file descriptor to read
+        - filters: a list of filters, each one is called with a line
+            and returns the line for the next filter or None to stop
+        - chunk_size: the maximum number of bytes of a read
+            (default = DEFAULT_CHUNK_SIZE)
+        - queue_size: the maximum number of chunks in the queue
+            (default = DEFAULT_QUEUE_SIZE)
+        - drop: a flag means to drop the chunks that don't fit in
+            the full queue instead of blocking the reader, the lines
+            broken by a drop are dropped too(default = False)
+
+    Attributes:
+        - _queue: a Queue.Queue of chunks and markers
+        - _stats: a dict of the metrics, see stats
+    """
+    def __init__(self, stream, filters,
+                 chunk_size=DEFAULT_CHUNK_SIZE,
+                 queue_size=DEFAULT_QUEUE_SIZE,
+                 drop=False):
+        self._fd = stream if isinstance(stream, int) else stream.fileno()
+        self._filters = filters
+        self._chunk_size = chunk_size
+        self._queue = Queue.Queue(queue_size)
+        self._drop = drop
+        self._stats = {
+            "bytes": 0,
+            "chunks": 0,
+            "lines": 0,
+            "max_queue_depth": 0,
+            "blocked_time": 0.0,
+            "dropped_bytes": 0,
+            "dropped_chunks": 0,
+            "elapsed_time": 0.0,
+        }
+        self._reader = threading.Thread(target=self._read)
+        self._reader.daemon = True
+
+    @property
+    def queue_depth(self):
+        """ The number of chunks waiting for the filters """
+        return self._queue.qsize()
+
+    def stats(self):
+        """ Return a dict of the metrics
+            - bytes, chunks: the size and the number of reads
+            - lines: the number of lines passed to the filters
+            - max_queue_depth: the maximum number of chunks in the queue
+            - blocked_time: the seconds that the reader waited for
+                the full queue, the time that wb may be throttled
+            - dropped_bytes, dropped_chunks: the output dropped
+                because of the full queue
+            - elapsed_time: the seconds of run
+        """
+        return dict(self._stats)
+
+    def _read(self):
+        stats = self._stats
+        queue = self._queue
+        gap = False
+        while True:
+            chunk = os.read(self._fd, self._chunk_size)
+            if not chunk:
+                break
+            stats["bytes"] += len(chunk)
+            stats["chunks"] += 1
+            if self._drop:
+                try:
+                    if gap:
+                        queue.put_nowait(_GAP)
+                        gap = False
+                    queue.put_nowait(chunk)
+                except Queue.Full:
+                    stats["dropped_bytes"] += len(chunk)
+                    stats["dropped_chunks"] += 1
+                    gap = True
+                    continue
+            else:
+                try:
+                    queue.put_nowait(chunk)
+                except Queue.Full:
+                    start_time = time.time()
+                    queue.put(chunk)
+                    stats["blocked_time"] += time.time() - start_time
+            depth = queue.qsize()
+            if depth > stats["max_queue_depth"]:
+                stats["max_queue_depth"] = depth
+        if gap:
+            queue.put(_GAP)
+        queue.put(_END)
+
+    def _filter(self, line):
+        for filter_ in self._filters:
+            line = filter_(line)
+            if line is None:
+                break
+
+    def run(self):
+        """ Start the reader and filter the lines until the end
+            of the stream, return the metrics, see stats
+        """
+        start_time = time.time()
+        self._reader.start()
+        stats = self._stats
+        # the parts of the incomplete line
+        parts = []
+        skipping = False
+        while True:
+            chunk = self._queue.get()
+            if chunk is _END:
+                break
+            if chunk is _GAP:
+                # the line of the dropped chunk is broken
+                parts = []
+                skipping = True
+                continue
+            end = chunk.find("\n")
+            if end == -1:
+                if not skipping:
+                    parts.append(chunk)
+                continue
+            if skipping:
+                skipping = False
+                parts = []
+            else:
+                parts.append(chunk[:end + 1])
+                self._filter("".join(parts))
+                stats["lines"] += 1
+                parts = []
+            lines = chunk[end + 1:].split("\n")
+            for line in lines[:-1]:
+                self._filter(line + "\n")
+            stats["lines"] += len(lines) - 1
+            if lines[-1]:
+                parts.append(lines[-1])
+        if parts:
+            self._filter("".join(parts))
+            stats["lines"] += 1
+        self._reader.join()
+        stats["elapsed_time"] = time.time() - start_time
+        return self.stats()
@@ -6,19 +6,44 @@
 """ Dump packets
 
 This exports:
+    - DEFAULT_BUFFER_SIZE is the default size of the write buffer.
     - PacketsDumper is a class to dump packets into a file
 """
 
-__all__ = ["PacketsDumper"]
+__all__ = [
+    "DEFAULT_BUFFER_SIZE",
+    "PacketsDumper",
+]
 
+import os
 import sys
 
+import packetsindex
+
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+# the types of a single packet, they are written without a copy by str()
+_BYTES_TYPES = (str, bytearray, memoryview, buffer)
+
 
 class PacketsDumper(object):
     """ Dump packets into a file
 
+    The size headers and the payloads of packets are gathered into
+    a buffer, and the buffer is written by one call when it's full.
+    A payload that is larger than the buffer is written directly.
+
     Arguments:
         file_name: A path to save the packets(default = None).
+        index: A flag means to save the offset index of packets
+            into file_name + ".idx" when the dumper is closed,
+            it requires file_name(default = False).
+        buffer_size: The number of bytes buffered before they are
+            written into the file(default = DEFAULT_BUFFER_SIZE).
+        fsync: A flag means to fsync the file when the dumper is closed,
+            so that the packets are on disk before wb reads them
+            (default = False).
 
     Attributes:
         file_name: A path to save the packets.
@@ -28,33 +53,134 @@ class PacketsDumper(object):
             if file name was None, file_fd is stdout.
 
         _is_empty: A flag means the file for saving packets is empty
+
+        packet_count: The number of dumped packets.
+
+        _offset: The number of bytes dumped into the file.
+
+        _index: A list of offset and length of each dumped packet,
+            None if the index isn't required.
+
+        _buffer: A bytearray of the bytes that haven't been written.
+
+        _buffer_size: The same as Arguments.
+
+        _fsync: The same as Arguments.
     """
-    def __init__(self, file_name=None):
+    def __init__(self, file_name=None, index=False,
+                 buffer_size=DEFAULT_BUFFER_SIZE, fsync=False):
         """ Create a packets dumper
         """
+        if index and not file_name:
+            raise ValueError("index of packets requires a file name")
         if file_name:
             self.file_name = file_name
-            self._file_fd = open(self.file_name, 'wb')
+            # unbuffered, the packets are buffered by the dumper
+            self._file_fd = open(self.file_name, 'wb', 0)
         else:
             self._file_fd = sys.stdout
 
         self._is_empty = True
+        self.packet_count = 0
+        self._offset = 0
+        self._index = [] if index else None
+        self._buffer = bytearray()
+        self._buffer_size = buffer_size
+        self._fsync = fsync
 
     def dump(self, packets):
         """ dump packets into the file
+
+        Arguments:
+            packets: A packet or an iterable of packets. A packet is
+                a str, bytearray, memoryview or buffer.
         """
-        if not hasattr(packets, "__iter__"):
+        if isinstance(packets, _BYTES_TYPES) \
+                or not hasattr(packets, "__iter__"):
             packets = [packets]
+        buffer_ = self._buffer
+        buffer_size = self._buffer_size
+        index = self._index
+        offset = self._offset
+        count = 0
         for packet in packets:
             if not packet:
                 continue
-            self._file_fd.write(str(len(packet)) + "\n")
-            self._file_fd.write(str(packet))
+            if not isinstance(packet, _BYTES_TYPES):
+                packet = str(packet)
+            length = len(packet)
+            header = str(length) + "\n"
+            offset += len(header)
+            if index is not None:
+                index.append(offset)
+                index.append(length)
+            offset += length
+            count += 1
+            buffer_ += header
+            if length >= buffer_size:
+                self._write(buffer_)
+                self._file_fd.write(packet)
+                continue
+            buffer_ += packet
+            if len(buffer_) >= buffer_size:
+                self._write(buffer_)
+        self._offset = offset
+        if count:
+            self.packet_count += count
             self._is_empty = False
 
+    def dump_records(self, records, packet_count):
+        """ dump records that are already in the format of packet file,
+            e.g. a range of another packet file
+
+        Arguments:
+            records: A str, bytearray, memoryview or buffer of records.
+            packet_count: The number of packets in records.
+        """
+        if self._index is not None:
+            raise ValueError("index of packets requires dumping each packet")
+        if not records:
+            return
+        if len(records) >= self._buffer_size:
+            self._write(self._buffer)
+            self._file_fd.write(records)
+        else:
+            self._buffer += records
+            if len(self._buffer) >= self._buffer_size:
+                self._write(self._buffer)
+        self._offset += len(records)
+        self.packet_count += packet_count
+        self._is_empty = False
+
+    @property
+    def dumped_size(self):
+        """ The number of bytes dumped into the file """
+        return self._offset
+
+    def _write(self, buffer_):
+        self._file_fd.write(buffer_)
+        del buffer_[:]
+
+    def flush(self, fsync=False):
+        """ Write the buffered packets into the file
+
+        Arguments:
+            fsync: A flag means to fsync the file after writing
+        """
+        if self._buffer:
+            self._write(self._buffer)
+        self._file_fd.flush()
+        if fsync:
+            os.fsync(self._file_fd.fileno())
+
     def __enter__(self):
         return self
 
     def __exit__(self, *_):
         if self._file_fd != sys.stdout:
+            self.flush(self._fsync)
             self._file_fd.close()
+            if self._index is not None:
+                packetsindex.write_index(self.file_name, self._index)
+        else:
+            self.flush()
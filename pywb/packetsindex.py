@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+""" Offset index of packet files
+
+This exports:
+    - INDEX_SUFFIX is the suffix appended to a packet file
+        to get the path of its index.
+    - write_index is a function that saves the index of a packet file.
+    - PacketsIndex is a class that reads the index of a packet file.
+
+The index(<pkt_file>.idx) is a sidecar file of a packet file. It saves
+the (offset, length) of every packet payload in the packet file, so that
+the count of packets, a range of packets or a shard of packets can be
+accessed without parsing the whole packet file.
+
+Layout of the index:
+    - header: magic(8 bytes), size of the packet file(uint64),
+        mtime of the packet file(double), all in little endian.
+    - body: an array of uint64 in little endian,
+        offset and length of each packet in turn.
+"""
+
+__all__ = [
+    "INDEX_SUFFIX",
+    "write_index",
+    "PacketsIndex",
+]
+
+import os
+import sys
+import array
+import struct
+
+
+INDEX_SUFFIX = ".idx"
+
+_MAGIC = "PKTIDX01"
+_HEADER = struct.Struct("<8sQd")
+_ENTRY_SIZE = 2 * 8  # offset and length, both are uint64
+_ITEM_TYPE = "L" if array.array("L").itemsize == 8 else "Q"
+
+
+def _to_little_endian(entries):
+    if sys.byteorder != "little":
+        entries = array.array(_ITEM_TYPE, entries)
+        entries.byteswap()
+    return entries
+
+
+def write_index(pkt_file, entries):
+    """ Save the index of a packet file
+
+    Arguments:
+        - pkt_file: a string, the path of packet file. It must have been
+            completely written, because its size and mtime are saved
+            to detect a stale index.
+        - entries: an array or a list of integers, offset and length of
+            each packet in turn.
+
+    Return the path of the index
+    """
+    index_file = pkt_file + INDEX_SUFFIX
+    stat = os.stat(pkt_file)
+    entries = _to_little_endian(array.array(_ITEM_TYPE, entries))
+    with open(index_file, "wb") as fd:
+        fd.write(_HEADER.pack(_MAGIC, stat.st_size, stat.st_mtime))
+        entries.tofile(fd)
+    return index_file
+
+
+class PacketsIndex(object):
+    """ Read the index of a packet file
+
+    Arguments:
+        - pkt_file: a string, the path of packet file
+
+    Attributes:
+        - pkt_file: the path of packet file
+        - index_file: the path of the index
+
+    Raise IOError if the index doesn't exist or is stale.
+    """
+    def __init__(self, pkt_file):
+        """ Open the index and check whether it matches the packet file
+        """
+        self.pkt_file = pkt_file
+        self.index_file = pkt_file + INDEX_SUFFIX
+        self._fd = open(self.index_file, "rb")
+        try:
+            header = self._fd.read(_HEADER.size)
+            if len(header) != _HEADER.size:
+                raise IOError("%s is truncated" % (self.index_file, ))
+            magic, size, mtime = _HEADER.unpack(header)
+            stat = os.stat(pkt_file)
+            if magic != _MAGIC:
+                raise IOError("%s isn't a packet index" % (self.index_file, ))
+            if size != stat.st_size or mtime != stat.st_mtime:
+                raise IOError("%s is stale" % (self.index_file, ))
+            body_size = os.fstat(self._fd.fileno()).st_size - _HEADER.size
+            if body_size % _ENTRY_SIZE:
+                raise IOError("%s is truncated" % (self.index_file, ))
+            self._count = body_size // _ENTRY_SIZE
+        except Exception:
+            self._fd.close()
+            raise
+
+    def __len__(self):
+        """ The count of packets, it doesn't read the body of the index
+        """
+        return self._count
+
+    def entries(self, start=0, stop=None):
+        """ Read a range of the index
+
+        Arguments:
+            - start: the first packet(inclusive)
+            - stop: the last packet(exclusive), default is the end
+
+        Return an array of integers, offset and length of each packet in turn
+        """
+        start, stop, _ = slice(start, stop).indices(self._count)
+        entries = array.array(_ITEM_TYPE)
+        if stop > start:
+            self._fd.seek(_HEADER.size + start * _ENTRY_SIZE)
+            entries.fromfile(self._fd, (stop - start) * 2)
+        return _to_little_endian(entries)
+
+    def close(self):
+        self._fd.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        self.close()
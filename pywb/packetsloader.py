@@ -10,114 +10,370 @@ This exports:
         of loader. the value is the load function that create
         a packets generator from file.
     - load_packets_from_paths: is a function that load a set of paths
-        that include .pkt or .yaml files to a packets generator.
+        that include .pkt, .yaml, .jsonl, .jsonl.gz or .pcap files
+        to a packets generator.
+    - get_packet_files: is a function that lists the supported files
+        in a set of paths.
+    - build_packets_index: is a function that saves the offset index
+        of a .pkt file.
+    - count_packets: is a function that counts the packets of a .pkt file.
+    - load_packets_from_range: is a function that loads a range of
+        packets of a .pkt file to a packets generator.
+    - load_packets_from_shard: is a function that loads one of
+        the disjoint shards of a .pkt file to a packets generator.
 
-Load packets saved in files(.yaml, .pkt) or strings into a packets generator
+Load packets saved in files(.yaml, .pkt, .jsonl, .jsonl.gz, .pcap)
+or strings into a packets generator
 """
 
 __all__ = [
     "LOADERS",
     "load_packets_from_paths",
+    "get_packet_files",
+    "build_packets_index",
+    "count_packets",
+    "load_packets_from_range",
+    "load_packets_from_shard",
 ]
 
 import os
 import io
 import sys
+import gzip
+import json
+import mmap
 import functools
 import itertools
+import contextlib
+import collections
 
 import ftw
 import yaml
 
 import pywbutil
 import ftwhelper
+import pcapreader
+import httpbuilder
+import packetsindex
 
 
 @pywbutil.accept_iterable
 @pywbutil.expand_nest_generator
-def _load_packets_from_yaml_files(files):
-    yield ftwhelper.get(files, ftwhelper.FTW_TYPE.PACKETS)
+def _load_packets_from_yaml_files(
+        files, processes=None, report=None, cache=None):
+    yield ftwhelper.get(
+        files, ftwhelper.FTW_TYPE.PACKETS, processes, report, cache)
+
+
+def _scan_packets(data, size):
+    """ Scan the packets saved in data and yield (offset, length) of each.
+
+    Arguments:
+        - data: a str-like object that supports find, indexing and slicing,
+            e.g. a str or a mmap.
+        - size: the number of bytes of data.
+
+    Both of the packet formats of wb are supported, a packet is either
+    prefixed by its size and a '\\n' or delimited by '\\0'. Every byte is
+    visited at most a constant number of times, so the scan is linear.
+    """
+    pos = 0
+    while pos < size:
+        # skip delimiters
+        while pos < size and data[pos] == "\0":
+            pos += 1
+        if pos >= size:
+            break
+        if data[pos].isdigit():
+            digits_end = pos
+            while digits_end < size and data[digits_end].isdigit():
+                digits_end += 1
+            if digits_end >= size:
+                # only a size without packet, treat the rest as a packet
+                yield pos, size - pos
+                break
+            # add 1 to skip \n
+            start = digits_end + 1
+            length = min(int(data[pos:digits_end]), max(size - start, 0))
+            yield start, length
+            pos = start + length
+        else:
+            end = data.find("\0", pos)
+            if end == -1:
+                end = size
+            yield pos, end - pos
+            pos = end
+
+
+@contextlib.contextmanager
+def _map_file(file_):
+    """ Map a file into memory read-only
+
+    Arguments:
+        - file_: a path of the file
+
+    Yield a tuple of (data, size), data is a mmap of the file or
+        an empty string if the file is empty.
+    """
+    with open(file_, "rb") as fd:
+        size = os.fstat(fd.fileno()).st_size
+        if size == 0:
+            # an empty file cannot be mapped
+            yield "", 0
+            return
+        data = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield data, size
+        finally:
+            data.close()
 
 
 @pywbutil.accept_iterable
 @pywbutil.expand_nest_generator
 def _load_packets_from_pkt_files(files):
-    buffer_ = ""
-    packet_len = 0
     for file_ in files:
         file_ = os.path.abspath(os.path.expanduser(file_))
-        with open(file_, "rb", io.DEFAULT_BUFFER_SIZE) as fd:
-            while True:
-                bytes_ = fd.read(io.DEFAULT_BUFFER_SIZE)
-                if not bytes_:
-                    if buffer_:
-                        yield buffer_
-                    break
-                buffer_ += bytes_
-                while buffer_:
-
-                    delimite_pos = 0
-                    while delimite_pos < len(buffer_) and buffer_[delimite_pos] == '\0':
-                        delimite_pos += 1
-                    buffer_ = buffer_[delimite_pos:]
-
-                    if not buffer_ or buffer_.isdigit():
-                        break
-
-                    if packet_len == 0:
-                        if buffer_[0].isdigit():
-                            packet_len = int(''.join(itertools.takewhile(str.isdigit, buffer_)))
-                            # add 1 to skip \n 
-                            buffer_ = buffer_[len(str(packet_len)) + 1:]
-                        else:
-                            packet_len = buffer_.find('\0')
-                            if packet_len == -1:
-                                packet_len = 0
-                                break
-                    if packet_len >= 0:
-                        if len(buffer_) >= packet_len:
-                            yield buffer_[:packet_len]
-                            buffer_ = buffer_[packet_len:]
-                            packet_len = 0
-                        else:
-                            break
-                    else:
-                        raise ValueError("Internal error, get buffer(%s)" % (buffer_, ))
+        with _map_file(file_) as (data, size):
+            for offset, length in _scan_packets(data, size):
+                yield data[offset:offset + length]
+
+
+def _open_jsonl_file(file_):
+    if file_.lower().endswith(".gz"):
+        # buffered, GzipFile.readline is slow
+        return io.BufferedReader(gzip.open(file_, "rb"))
+    return open(file_, "rb")
+
+
+def _to_bytes(value):
+    if isinstance(value, unicode):
+        return value.encode("utf-8")
+    if isinstance(value, list):
+        return [_to_bytes(item) for item in value]
+    return value
+
+
+def _decode_json_object(pairs):
+    """ Decode a JSON object with its strings in UTF-8 bytes,
+        so that packets needn't be converted between unicode and bytes.
+        The order of the keys is kept, e.g. the order of the headers
+    """
+    return collections.OrderedDict(
+        [(_to_bytes(key), _to_bytes(value)) for key, value in pairs])
+
+
+@pywbutil.accept_iterable
+@pywbutil.expand_nest_generator
+def _load_packets_from_jsonl_files(files):
+    """ Load JSON Lines files, each line is a request record.
+        The keys of a record are the same as the input of a FTW stage,
+        e.g. method, uri, version, headers, data, raw_request and
+        encoded_request, see httpbuilder.build_request_from_dict.
+        Like the YAML files, headers are sent in the order of a dict,
+        raw_request or encoded_request keeps the exact bytes.
+    """
+    for file_ in files:
+        file_ = os.path.abspath(os.path.expanduser(file_))
+        with contextlib.closing(_open_jsonl_file(file_)) as fd:
+            for line_number, line in enumerate(fd, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(
+                        line, object_pairs_hook=_decode_json_object)
+                except ValueError as e:
+                    raise ValueError(
+                        "%s:%d is not a JSON record: %s"
+                        % (file_, line_number, e))
+                if not isinstance(record, dict):
+                    raise ValueError(
+                        "%s:%d is not a JSON object" % (file_, line_number))
+                yield httpbuilder.build_request_from_dict(record)
+
+
+@pywbutil.accept_iterable
+@pywbutil.expand_nest_generator
+def _load_packets_from_pcap_files(files):
+    """ Load the HTTP/1.x requests captured in pcap files,
+        see pcapreader.read_http_requests.
+    """
+    for file_ in files:
+        file_ = os.path.abspath(os.path.expanduser(file_))
+        yield pcapreader.read_http_requests(file_)
 
 
 LOADERS = {
     ".yaml": _load_packets_from_yaml_files,
     ".pkt": _load_packets_from_pkt_files,
+    ".jsonl": _load_packets_from_jsonl_files,
+    ".jsonl.gz": _load_packets_from_jsonl_files,
+    ".pcap": _load_packets_from_pcap_files,
 }
 
 
-@pywbutil.accept_iterable
-@pywbutil.expand_nest_generator
-def load_packets_from_paths(paths):
-    """ Load a set of paths that
-        include .pkt or .yaml files to a packets generator.
+def _get_file_ext(file_):
+    """ Return the longest extension of file_ in LOADERS,
+        e.g. ".jsonl.gz", or the last extension if it isn't supported
+    """
+    if os.path.dirname(file_) == "/proc/self/fd":
+        # an anonymous memory file of packets has no name,
+        # see pywbutil.create_memory_file
+        return ".pkt"
+    file_name = os.path.basename(file_).lower()
+    file_exts = [
+        file_ext for file_ext in LOADERS if file_name.endswith(file_ext)]
+    if not file_exts:
+        return os.path.splitext(file_name)[-1]
+    return max(file_exts, key=len)
 
-    Arguments:
-        paths: a set of paths include .pkt or .yaml files.
 
-    Return a packets generator
-        that will generate all of packets saved in those paths
+def get_packet_files(paths):
+    """ Return a list of (file extension, file) of the supported files
+        in paths, in the order that load_packets_from_paths loads them
     """
+    packet_files = []
     for path_ in paths:
         path_ = os.path.abspath(os.path.expanduser(path_))
         if os.path.isdir(path_):
             for root, _, files in os.walk(path_):
                 for file_ in files:
-                    file_ext = os.path.splitext(file_)[-1].lower()
+                    file_ext = _get_file_ext(file_)
                     if file_ext not in LOADERS:
                         continue
-                    yield LOADERS[file_ext](
-                        os.path.join(root, file_))
+                    packet_files.append(
+                        (file_ext, os.path.join(root, file_)))
         elif os.path.isfile(path_):
-            file_ext = os.path.splitext(path_)[-1].lower()
+            file_ext = _get_file_ext(path_)
             if file_ext not in LOADERS:
                 raise ValueError(path_ + " is not supported to load packets")
-            yield LOADERS[file_ext](path_)
+            packet_files.append((file_ext, path_))
         else:
             raise IOError("No such file or path: '%s'" % (path_, ))
+    return packet_files
 
+
+@pywbutil.accept_iterable
+@pywbutil.expand_nest_generator
+def load_packets_from_paths(paths, processes=None, report=None, cache=None):
+    """ Load a set of paths that
+        include .pkt, .yaml, .jsonl, .jsonl.gz or .pcap files
+        to a packets generator.
+
+    Arguments:
+        paths: a set of paths include
+            .pkt, .yaml, .jsonl, .jsonl.gz or .pcap files.
+        processes: the number of processes to parse .yaml files
+            in parallel, see ftwhelper.get.
+        report: a function to report the loading speed of .yaml files,
+            see ftwhelper.get.
+        cache: a ftwcache.ParseCache to reuse the packets of unchanged
+            .yaml files, see ftwhelper.get.
+
+    Return a packets generator
+        that will generate all of packets saved in those paths
+    """
+    packet_files = get_packet_files(paths)
+    # consecutive files of the same type are loaded by one loader,
+    # so that .yaml files can be parsed in parallel
+    for file_ext, group in itertools.groupby(
+            packet_files, key=lambda item: item[0]):
+        files = [file_ for _, file_ in group]
+        if file_ext == ".yaml":
+            yield LOADERS[file_ext](files, processes, report, cache)
+        else:
+            yield LOADERS[file_ext](files)
+
+
+def _open_packets_index(file_):
+    """ Return a PacketsIndex of file_ or None if its index is unusable """
+    try:
+        return packetsindex.PacketsIndex(file_)
+    except IOError:
+        return None
+
+
+def build_packets_index(file_):
+    """ Save the offset index(<file_>.idx) of a .pkt file.
+
+    Arguments:
+        file_: a path of .pkt file.
+
+    Return the count of packets
+    """
+    file_ = os.path.abspath(os.path.expanduser(file_))
+    entries = []
+    with _map_file(file_) as (data, size):
+        for offset, length in _scan_packets(data, size):
+            entries.append(offset)
+            entries.append(length)
+    packetsindex.write_index(file_, entries)
+    return len(entries) // 2
+
+
+def count_packets(file_):
+    """ Count the packets of a .pkt file.
+        It's O(1) if the file has a valid index, otherwise it parses the file.
+
+    Arguments:
+        file_: a path of .pkt file.
+
+    Return the count of packets
+    """
+    file_ = os.path.abspath(os.path.expanduser(file_))
+    index = _open_packets_index(file_)
+    if index:
+        with index:
+            return len(index)
+    with _map_file(file_) as (data, size):
+        return sum(1 for _ in _scan_packets(data, size))
+
+
+def load_packets_from_range(file_, start=0, stop=None):
+    """ Load a range of packets of a .pkt file.
+        Only the required part of the file is read if the file has
+        a valid index, otherwise the file is parsed from the beginning.
+
+    Arguments:
+        file_: a path of .pkt file.
+        start: the first packet(inclusive).
+        stop: the last packet(exclusive), default is the end of file.
+
+    Return a packets generator
+    """
+    file_ = os.path.abspath(os.path.expanduser(file_))
+    if start < 0 or (stop is not None and stop < 0):
+        raise ValueError("negative range [%s, %s) is not supported"
+                         % (start, stop))
+    index = _open_packets_index(file_)
+    with _map_file(file_) as (data, size):
+        if index:
+            with index:
+                entries = index.entries(start, stop)
+            for i in xrange(0, len(entries), 2):
+                offset = entries[i]
+                yield data[offset:offset + entries[i + 1]]
+        else:
+            spans = itertools.islice(_scan_packets(data, size), start, stop)
+            for offset, length in spans:
+                yield data[offset:offset + length]
+
+
+def load_packets_from_shard(file_, shard, shard_count):
+    """ Load one of the disjoint shards of a .pkt file.
+        The packets are split into shard_count contiguous ranges
+        whose sizes differ at most by one.
+
+    Arguments:
+        file_: a path of .pkt file.
+        shard: the number of shard, in [0, shard_count).
+        shard_count: the total number of shards.
+
+    Return a packets generator
+    """
+    if shard_count <= 0 or not 0 <= shard < shard_count:
+        raise ValueError("invalid shard %s of %s" % (shard, shard_count))
+    count = count_packets(file_)
+    return load_packets_from_range(
+        file_,
+        count * shard // shard_count,
+        count * (shard + 1) // shard_count)
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+""" Incremental generation of packet files
+
+This exports:
+    - MANIFEST_SUFFIX is the suffix appended to a packet file
+        to get the path of its manifest.
+    - update_packet_file is a function that generates a packet file
+        from a set of paths, and reuses the packets of unchanged sources.
+
+The manifest(<pkt_file>.manifest) is a JSON sidecar file of a generated
+packet file. It saves the size and mtime of the packet file and,
+for each source file in order, its path, size, mtime, sha1, and the byte
+range and the count of its packets in the packet file.
+
+A source is unchanged if its size and mtime, or its sha1, are the same
+as the ones in the manifest. The packet file is reused as it is if all
+of the sources are unchanged, otherwise the packets of the unchanged
+sources are copied from the old packet file and only the changed
+sources are loaded again.
+"""
+
+__all__ = [
+    "MANIFEST_SUFFIX",
+    "update_packet_file",
+]
+
+import os
+import json
+import itertools
+
+import pywbutil
+import packetsloader
+import packetsdumper
+
+
+MANIFEST_SUFFIX = ".manifest"
+
+# change it if the format of manifest or the way of building packets changes
+_MANIFEST_VERSION = 1
+
+
+def _read_manifest(packet_file):
+    """ Return the manifest of packet_file,
+        None if it doesn't exist or doesn't match the packet file
+    """
+    try:
+        with open(packet_file + MANIFEST_SUFFIX, "r") as fd:
+            manifest = json.load(fd)
+        stat = os.stat(packet_file)
+        if manifest["version"] != _MANIFEST_VERSION \
+                or manifest["size"] != stat.st_size \
+                or manifest["mtime"] != stat.st_mtime:
+            return None
+        return manifest
+    except (IOError, OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def _write_manifest(packet_file, sources, packet_count):
+    stat = os.stat(packet_file)
+    manifest = {
+        "version": _MANIFEST_VERSION,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "packet_count": packet_count,
+        "sources": sources,
+    }
+    manifest_file = packet_file + MANIFEST_SUFFIX
+    with open(manifest_file + ".tmp", "w") as fd:
+        json.dump(manifest, fd, indent=1)
+    os.rename(manifest_file + ".tmp", manifest_file)
+
+
+def _describe_source(file_, old_source):
+    """ Return the manifest record of file_ without its range,
+        and whether it's the same as old_source
+    """
+    stat = os.stat(file_)
+    source = {
+        "path": file_,
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+    }
+    if old_source is not None \
+            and (old_source["size"], old_source["mtime"]) \
+            == (stat.st_size, stat.st_mtime):
+        source["sha1"] = old_source["sha1"]
+        return source, True
+    # touched or modified
+    source["sha1"] = pywbutil.file_digest(file_)
+    return source, \
+        old_source is not None and old_source["sha1"] == source["sha1"]
+
+
+def _dump_sources(dumper, file_ext, sources, processes, report, cache):
+    """ Load the packets of sources, which are of the same type,
+        and fill the range of each source
+    """
+    for source in sources:
+        source["offset"] = dumper.dumped_size
+        source["length"] = 0
+        source["count"] = 0
+    if file_ext != ".yaml":
+        for source in sources:
+            _dump_source_packets(
+                dumper, source,
+                packetsloader.load_packets_from_paths(source["path"]))
+        return
+    # loaded together to share one process pool,
+    # the packets of YAML files know which file they come from
+    packets = packetsloader.load_packets_from_paths(
+        [source["path"] for source in sources],
+        processes=processes, report=report, cache=cache)
+    remaining_sources = iter(sources)
+    for file_, file_packets in itertools.groupby(
+            packets, key=lambda packet: packet.ORIGINAL_FILE):
+        # skip the sources without packets
+        source = next(remaining_sources)
+        while source["path"] != file_:
+            source = next(remaining_sources)
+        _dump_source_packets(dumper, source, file_packets)
+
+
+def _dump_source_packets(dumper, source, packets):
+    source["offset"] = dumper.dumped_size
+    count = dumper.packet_count
+    dumper.dump(packets)
+    source["length"] = dumper.dumped_size - source["offset"]
+    source["count"] = dumper.packet_count - count
+
+
+def update_packet_file(
+        packet_file, paths, processes=None, report=None, cache=None):
+    """ Generate a packet file from a set of paths incrementally
+
+    Arguments:
+        - packet_file: a string, the path of the generated packet file.
+            It's excluded from the sources if it's in paths.
+        - paths: a set of paths include .pkt or .yaml files.
+        - processes, report, cache: see packetsloader.load_packets_from_paths.
+
+    Return the count of packets in packet_file
+    """
+    packet_file = os.path.abspath(packet_file)
+    files = [
+        (file_ext, file_)
+        for file_ext, file_ in packetsloader.get_packet_files(paths)
+        if file_ != packet_file]
+    manifest = _read_manifest(packet_file)
+    old_sources = {}
+    if manifest is not None:
+        old_sources = dict(
+            (source["path"], source) for source in manifest["sources"])
+
+    sources = []
+    unchanged = []
+    for _, file_ in files:
+        old_source = old_sources.get(file_)
+        source, is_unchanged = _describe_source(file_, old_source)
+        if is_unchanged:
+            for key in ("offset", "length", "count"):
+                source[key] = old_source[key]
+        sources.append(source)
+        unchanged.append(is_unchanged)
+
+    if manifest is not None and all(unchanged) \
+            and [s["path"] for s in sources] \
+            == [s["path"] for s in manifest["sources"]]:
+        # the packet file is the same, the stats of sources may be updated
+        if sources != manifest["sources"]:
+            _write_manifest(packet_file, sources, manifest["packet_count"])
+        return manifest["packet_count"]
+
+    temp_file = packet_file + ".tmp"
+    old_fd = open(packet_file, "rb") if manifest is not None else None
+    try:
+        with packetsdumper.PacketsDumper(temp_file) as dumper:
+            for (is_unchanged, file_ext), group in itertools.groupby(
+                    zip(unchanged, files, sources),
+                    key=lambda item: (item[0], item[1][0])):
+                group_sources = [source for _, _, source in group]
+                if not is_unchanged:
+                    _dump_sources(
+                        dumper, file_ext, group_sources,
+                        processes, report, cache)
+                    continue
+                for source in group_sources:
+                    old_fd.seek(source["offset"])
+                    source["offset"] = dumper.dumped_size
+                    dumper.dump_records(
+                        old_fd.read(source["length"]), source["count"])
+        os.rename(temp_file, packet_file)
+    except Exception:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+    finally:
+        if old_fd is not None:
+            old_fd.close()
+    _write_manifest(packet_file, sources, dumper.packet_count)
+    return dumper.packet_count
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+""" Packet templates with per-request placeholders
+
+This exports:
+    - PacketTemplate is a class that compiles a template of a request
+        and renders distinct packets from it.
+    - load_template is a function that compiles a template file.
+
+A template is a raw HTTP request with placeholders:
+    - {{seq}}: the sequence number of the rendered packet.
+    - {{random:N}}: a random token of N hex digits.
+    - {{choice:a|b|c}}: one of the items, chosen uniformly.
+    - {{choice@path}}: one of the non-empty lines of the file path,
+        a relative path is relative to the directory of the template.
+    - {{filler:N}}: N bytes of filler.
+    - {{filler:M-N}}: a random size between M and N bytes of filler.
+Any other text, including the unknown {{...}}, is kept as it is.
+
+The line endings of the request line and the headers are converted to
+CRLF, the body is kept as it is. If the template has a Content-Length
+header and its body has placeholders, the header is set to the length
+of each rendered body.
+
+A template is compiled once into a format string and a list of
+renderers of its placeholders, so rendering a packet costs one
+formatting. Packets are rendered lazily by generate, so that a large
+number of distinct requests needn't be saved in files beforehand.
+"""
+
+__all__ = [
+    "PacketTemplate",
+    "load_template",
+]
+
+import os
+import re
+import random
+
+
+_PLACEHOLDER_PATTERN = re.compile(
+    r"\{\{(seq|random|choice|filler)(?::([^}]*)|@([^}]*))?\}\}")
+_HEADER_END_PATTERN = re.compile(r"\r?\n\r?\n")
+_CONTENT_LENGTH_PATTERN = re.compile(
+    r"^(content-length[ \t]*:[ \t]*)[^\r\n]*", re.IGNORECASE | re.MULTILINE)
+_SIZE_RANGE_PATTERN = re.compile(r"^\s*(\d+)\s*(?:-\s*(\d+)\s*)?$")
+
+_FILLER_BYTE = "a"
+
+
+class PacketTemplate(object):
+    """ A compiled template of a request
+
+    Arguments:
+        - template: a string, the raw request with placeholders
+        - seed: the seed of random placeholders,
+            None means the renders aren't reproducible(default = None)
+        - directory: the directory of the relative paths of
+            {{choice@path}}, None means the current directory
+            (default = None)
+
+    Attributes:
+        - _random: a random.Random of the random placeholders
+        - _directory: see Arguments
+        - _head_format, _body_format: the format strings of the request
+            line with headers and of the body
+        - _head_renderers, _body_renderers: the lists of functions that
+            render the placeholders of the format strings from the
+            sequence number, None in _head_renderers is the length
+            of the body
+    """
+    def __init__(self, template, seed=None, directory=None):
+        self._random = random.Random(seed)
+        self._directory = directory
+        match = _HEADER_END_PATTERN.search(template)
+        if match:
+            head, body = template[:match.start()], template[match.end():]
+        else:
+            head, body = template, ""
+        head = re.sub(r"\r?\n", "\r\n", head) + "\r\n\r\n"
+        self._body_format, self._body_renderers = self._compile(body)
+        content_length = None
+        if self._body_renderers:
+            # the placeholder of Content-Length can't be in the template
+            content_length = _CONTENT_LENGTH_PATTERN.search(head)
+        if content_length:
+            head_format, head_renderers = self._compile(
+                head[:content_length.end(1)])
+            tail_format, tail_renderers = self._compile(
+                head[content_length.end():])
+            self._head_format = head_format + "%d" + tail_format
+            self._head_renderers = \
+                head_renderers + [None] + tail_renderers
+        else:
+            self._head_format, self._head_renderers = self._compile(head)
+
+    def _compile(self, text):
+        """ Return the format string and the renderers of text """
+        format_parts = []
+        renderers = []
+        position = 0
+        for match in _PLACEHOLDER_PATTERN.finditer(text):
+            format_parts.append(
+                text[position:match.start()].replace("%", "%%"))
+            position = match.end()
+            renderer = self._compile_placeholder(*match.groups())
+            if isinstance(renderer, str):
+                # a constant
+                format_parts.append(renderer.replace("%", "%%"))
+            else:
+                format_parts.append("%s")
+                renderers.append(renderer)
+        format_parts.append(text[position:].replace("%", "%%"))
+        return "".join(format_parts), renderers
+
+    def _compile_placeholder(self, name, argument, path):
+        """ Return a function that renders the placeholder
+            from the sequence number, or a constant string
+        """
+        if name == "seq":
+            return str
+        if name == "choice":
+            if path is not None:
+                if self._directory is not None:
+                    path = os.path.join(self._directory, path)
+                with open(path, "rb") as fd:
+                    items = [line.rstrip("\r\n") for line in fd]
+                items = [item for item in items if item]
+            else:
+                items = (argument or "").split("|")
+            if not items:
+                raise ValueError("{{choice}} needs at least one item")
+            if len(items) == 1:
+                return items[0]
+            # cheaper than random.choice
+            random_ = self._random.random
+            item_count = len(items)
+            return lambda _: items[int(random_() * item_count)]
+        match = _SIZE_RANGE_PATTERN.match(argument or "")
+        if not match:
+            raise ValueError(
+                "{{%s}} needs a size, not [%s]" % (name, argument))
+        low = int(match.group(1))
+        high = int(match.group(2) or low)
+        if low > high:
+            raise ValueError("{{%s:%s}} has an empty range" % (name, argument))
+        if name == "random":
+            if low != high:
+                raise ValueError("{{random}} needs a fixed size")
+            getrandbits = self._random.getrandbits
+            return lambda _: "%0*x" % (low, getrandbits(low * 4)) \
+                if low else ""
+        # filler
+        filler = _FILLER_BYTE * high
+        if low == high:
+            return filler
+        random_ = self._random.random
+        size_count = high - low + 1
+        return lambda _: filler[:low + int(random_() * size_count)]
+
+    def render(self, seq):
+        """ Render the packet of the sequence number seq """
+        body = self._body_format % tuple(
+            [renderer(seq) for renderer in self._body_renderers])
+        head = self._head_format % tuple([
+            len(body) if renderer is None else renderer(seq)
+            for renderer in self._head_renderers])
+        return head + body
+
+    def generate(self, count, start=0):
+        """ Generate count packets with sequence numbers from start """
+        render = self.render
+        for seq in xrange(start, start + count):
+            yield render(seq)
+
+
+def load_template(file_, seed=None):
+    """ Compile a template file
+
+    Arguments:
+        - file_: a string, the path of the template
+        - seed: see PacketTemplate
+
+    Return a PacketTemplate
+    """
+    with open(file_, "rb") as fd:
+        return PacketTemplate(
+            fd.read(), seed, os.path.dirname(os.path.abspath(file_)))
@@ -0,0 +1,406 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+""" Read HTTP requests from packet captures
+
+This exports:
+    - read_http_requests is a function that reads a pcap file and
+        generates the HTTP/1.x requests sent by clients.
+
+The capture is read record by record in one pass. TCP segments of each
+direction of a connection are reassembled by their sequence numbers,
+retransmitted and out-of-order segments are handled. A direction whose
+data starts with an HTTP request line is parsed into requests, and each
+request is generated as soon as it's complete, with its body of
+Content-Length or chunked encoding. Other directions(e.g. responses,
+TLS) are ignored.
+
+Supported link types are null/loopback, Ethernet(with VLAN tags),
+raw IP, Linux cooked capture v1 and v2. IP fragments are ignored.
+"""
+
+__all__ = [
+    "read_http_requests",
+]
+
+import re
+import struct
+
+
+_PCAP_MAGICS = {
+    "\xd4\xc3\xb2\xa1": "<",  # microsecond, little endian
+    "\xa1\xb2\xc3\xd4": ">",  # microsecond, big endian
+    "\x4d\x3c\xb2\xa1": "<",  # nanosecond, little endian
+    "\xa1\xb2\x3c\x4d": ">",  # nanosecond, big endian
+}
+_PCAPNG_MAGIC = "\x0a\x0d\x0d\x0a"
+
+_LINKTYPE_NULL = 0
+_LINKTYPE_ETHERNET = 1
+_LINKTYPE_RAW = (12, 14, 101)
+_LINKTYPE_LINUX_SLL = 113
+_LINKTYPE_IPV4 = 228
+_LINKTYPE_IPV6 = 229
+_LINKTYPE_LINUX_SLL2 = 276
+
+_ETHERTYPE_IPV4 = 0x0800
+_ETHERTYPE_IPV6 = 0x86dd
+_ETHERTYPE_VLANS = (0x8100, 0x88a8, 0x9100)
+
+_IPPROTO_TCP = 6
+_IPV6_EXTENSION_HEADERS = (0, 43, 60)  # hop-by-hop, routing, destination
+_IPV6_FRAGMENT_HEADER = 44
+
+_TCP_FIN = 0x01
+_TCP_SYN = 0x02
+_TCP_RST = 0x04
+
+_SEQ_MASK = 0xffffffff
+_SEQ_HALF = 0x80000000
+
+# a stream is dropped if it buffers more bytes than these
+_MAX_PENDING_SIZE = 16 * 1024 * 1024
+_MAX_HEADER_SIZE = 64 * 1024
+
+_REQUEST_LINE_PATTERN = re.compile(r"[A-Z]+ [^ \r\n]+ HTTP/1\.[0-9]\r?\n")
+_METHOD_PREFIX_PATTERN = re.compile(r"[A-Z]*( |$)")
+_HEADER_END_PATTERN = re.compile(r"\r?\n\r?\n")
+
+
+class _HttpRequestParser(object):
+    """ Split the data sent by a client into HTTP/1.x requests
+
+    Attributes:
+        - ignored: a flag means the data isn't HTTP requests,
+            or it can't be parsed anymore.
+        - _buffer: a bytearray of the data that hasn't been parsed.
+        - _wanted_size: the size of the buffer that the incomplete
+            request needs, the request isn't parsed again before it.
+    """
+    def __init__(self):
+        self.ignored = False
+        self._buffer = bytearray()
+        self._wanted_size = 0
+
+    def feed(self, data):
+        """ Append data and return a list of complete requests """
+        if self.ignored:
+            return []
+        self._buffer += data
+        if len(self._buffer) < self._wanted_size:
+            return []
+        self._wanted_size = 0
+        requests = []
+        while self._buffer and not self.ignored:
+            request = self._parse_request()
+            if request is None:
+                break
+            requests.append(request)
+        return requests
+
+    def _parse_request(self):
+        buffer_ = self._buffer
+        # CRLFs between requests are skipped as servers do
+        start = 0
+        while start < len(buffer_) and buffer_[start] in (0x0d, 0x0a):
+            start += 1
+        if start:
+            del buffer_[:start]
+            if not buffer_:
+                return None
+        match = _HEADER_END_PATTERN.search(buffer_)
+        if not match:
+            head = str(buffer_[:16])
+            if not _METHOD_PREFIX_PATTERN.match(head) \
+                    or len(buffer_) > _MAX_HEADER_SIZE:
+                self._ignore()
+            return None
+        header_end = match.end()
+        header = str(buffer_[:header_end])
+        if not _REQUEST_LINE_PATTERN.match(header):
+            self._ignore()
+            return None
+        content_length = 0
+        chunked = False
+        for line in header.splitlines()[1:]:
+            name, _, value = line.partition(":")
+            name = name.strip().lower()
+            if name == "content-length":
+                try:
+                    content_length = int(value.strip())
+                except ValueError:
+                    self._ignore()
+                    return None
+            elif name == "transfer-encoding":
+                chunked = value.strip().lower().endswith("chunked")
+        if chunked:
+            request_end = self._find_chunked_body_end(header_end)
+        else:
+            request_end = header_end + content_length
+            if request_end > len(buffer_):
+                self._wanted_size = request_end
+                request_end = None
+        if request_end is None:
+            return None
+        request = str(buffer_[:request_end])
+        del buffer_[:request_end]
+        return request
+
+    def _find_chunked_body_end(self, position):
+        """ Return the end of the chunked body that starts at position,
+            None if it's incomplete
+        """
+        buffer_ = self._buffer
+        while True:
+            line_end = buffer_.find("\n", position)
+            if line_end == -1:
+                return None
+            size_line = str(buffer_[position:line_end]).split(";")[0]
+            try:
+                size = int(size_line.strip(), 16)
+            except ValueError:
+                self._ignore()
+                return None
+            position = line_end + 1
+            if size == 0:
+                break
+            # the chunk and its CRLF
+            position += size
+            line_end = buffer_.find("\n", position)
+            if line_end == -1:
+                return None
+            position = line_end + 1
+        # trailers end with an empty line
+        while True:
+            line_end = buffer_.find("\n", position)
+            if line_end == -1:
+                return None
+            line = buffer_[position:line_end]
+            position = line_end + 1
+            if not line.strip():
+                return position
+
+    def _ignore(self):
+        self.ignored = True
+        del self._buffer[:]
+
+
+class _TcpStream(object):
+    """ Reassemble the segments of one direction of a TCP connection
+
+    Attributes:
+        - parser: the _HttpRequestParser of the reassembled data.
+        - _next_seq: the sequence number of the next byte,
+            None until the first segment.
+        - _pending: a dict of out-of-order segments, seq => payload.
+        - _pending_size: the number of bytes in _pending.
+    """
+    def __init__(self, next_seq=None):
+        self.parser = _HttpRequestParser()
+        self._next_seq = next_seq
+        self._pending = {}
+        self._pending_size = 0
+
+    def _distance(self, seq):
+        """ The signed distance from the next byte to seq """
+        return ((seq - self._next_seq + _SEQ_HALF) & _SEQ_MASK) - _SEQ_HALF
+
+    def add(self, seq, payload):
+        """ Add a segment and return a list of complete requests """
+        if self.parser.ignored:
+            return []
+        if self._next_seq is None:
+            self._next_seq = seq
+        distance = self._distance(seq)
+        if distance > 0:
+            # keep the longest one of the segments at seq
+            if len(payload) > len(self._pending.get(seq, "")):
+                self._pending_size += \
+                    len(payload) - len(self._pending.get(seq, ""))
+                self._pending[seq] = payload
+                if self._pending_size > _MAX_PENDING_SIZE:
+                    self.gap()
+            return []
+        requests = self._append(payload[-distance:])
+        while self._pending and not self.parser.ignored:
+            # the pending segments that reach the next byte
+            ready = [
+                seq for seq in self._pending
+                if self._distance(seq) <= 0]
+            if not ready:
+                break
+            for seq in sorted(ready, key=self._distance):
+                payload = self._pending.pop(seq)
+                self._pending_size -= len(payload)
+                requests += self._append(payload[-self._distance(seq):])
+        return requests
+
+    def _append(self, payload):
+        if not payload:
+            return []
+        self._next_seq = (self._next_seq + len(payload)) & _SEQ_MASK
+        return self.parser.feed(payload)
+
+    def gap(self):
+        """ Some data is lost, the rest can't be parsed """
+        self.parser.ignored = True
+        self._pending.clear()
+        self._pending_size = 0
+
+
+def _parse_ipv4(data):
+    """ Return (source, destination, TCP segment) or None """
+    if len(data) < 20:
+        return None
+    header_length = (ord(data[0]) & 0x0f) * 4
+    total_length, = struct.unpack(">H", data[2:4])
+    flags_offset, = struct.unpack(">H", data[6:8])
+    if ord(data[9]) != _IPPROTO_TCP or flags_offset & 0x3fff:
+        # not TCP, or a fragment
+        return None
+    # the padding of link layer is removed
+    if header_length <= total_length <= len(data):
+        data = data[:total_length]
+    return data[12:16], data[16:20], data[header_length:]
+
+
+def _parse_ipv6(data):
+    """ Return (source, destination, TCP segment) or None """
+    if len(data) < 40:
+        return None
+    payload_length, = struct.unpack(">H", data[4:6])
+    next_header = ord(data[6])
+    source, destination = data[8:24], data[24:40]
+    if 40 + payload_length <= len(data) and payload_length:
+        data = data[:40 + payload_length]
+    position = 40
+    while next_header in _IPV6_EXTENSION_HEADERS:
+        if position + 2 > len(data):
+            return None
+        next_header = ord(data[position])
+        position += (ord(data[position + 1]) + 1) * 8
+    if next_header != _IPPROTO_TCP:
+        # not TCP, or a fragment
+        return None
+    return source, destination, data[position:]
+
+
+def _parse_ip(data):
+    if not data:
+        return None
+    version = ord(data[0]) >> 4
+    if version == 4:
+        return _parse_ipv4(data)
+    if version == 6:
+        return _parse_ipv6(data)
+    return None
+
+
+def _parse_ethertype(ethertype, data):
+    if ethertype == _ETHERTYPE_IPV4:
+        return _parse_ipv4(data)
+    if ethertype == _ETHERTYPE_IPV6:
+        return _parse_ipv6(data)
+    return None
+
+
+def _parse_link(linktype, byte_order, data):
+    """ Return (source, destination, TCP segment) or None """
+    if linktype == _LINKTYPE_ETHERNET:
+        if len(data) < 14:
+            return None
+        ethertype, = struct.unpack(">H", data[12:14])
+        position = 14
+        while ethertype in _ETHERTYPE_VLANS and len(data) >= position + 4:
+            ethertype, = struct.unpack(">H", data[position + 2:position + 4])
+            position += 4
+        return _parse_ethertype(ethertype, data[position:])
+    if linktype in _LINKTYPE_RAW \
+            or linktype in (_LINKTYPE_IPV4, _LINKTYPE_IPV6):
+        return _parse_ip(data)
+    if linktype == _LINKTYPE_NULL:
+        # the address family is in the byte order of the capturing host
+        return _parse_ip(data[4:])
+    if linktype == _LINKTYPE_LINUX_SLL:
+        if len(data) < 16:
+            return None
+        return _parse_ethertype(struct.unpack(">H", data[14:16])[0], data[16:])
+    if linktype == _LINKTYPE_LINUX_SLL2:
+        if len(data) < 20:
+            return None
+        return _parse_ethertype(struct.unpack(">H", data[0:2])[0], data[20:])
+    raise ValueError("unsupported link type %d" % (linktype, ))
+
+
+def _read_records(fd):
+    """ Generate (linktype, byte order, captured data, is truncated) """
+    header = fd.read(24)
+    if len(header) < 24:
+        raise ValueError("%s isn't a pcap file" % (fd.name, ))
+    if header[:4] == _PCAPNG_MAGIC:
+        raise ValueError(
+            "%s is a pcapng file, only pcap is supported" % (fd.name, ))
+    if header[:4] not in _PCAP_MAGICS:
+        raise ValueError("%s isn't a pcap file" % (fd.name, ))
+    byte_order = _PCAP_MAGICS[header[:4]]
+    linktype, = struct.unpack(byte_order + "I", header[20:24])
+    # FCS length and flags may be in the upper bits
+    linktype &= 0x0fffffff
+    record_header = struct.Struct(byte_order + "IIII")
+    while True:
+        header = fd.read(record_header.size)
+        if len(header) < record_header.size:
+            return
+        _, _, captured_length, original_length = record_header.unpack(header)
+        data = fd.read(captured_length)
+        if len(data) < captured_length:
+            return
+        yield linktype, byte_order, data, captured_length < original_length
+
+
+def read_http_requests(file_):
+    """ Read a pcap file and generate the HTTP/1.x requests sent by clients
+
+    Arguments:
+        - file_: a string, the path of a pcap file
+
+    Return a generator of raw requests in the order they are completed
+    """
+    streams = {}
+    with open(file_, "rb") as fd:
+        for linktype, byte_order, data, truncated in _read_records(fd):
+            segment = _parse_link(linktype, byte_order, data)
+            if segment is None:
+                continue
+            source, destination, tcp = segment
+            if len(tcp) < 20:
+                continue
+            source_port, destination_port, seq = \
+                struct.unpack(">HHI", tcp[:8])
+            tcp_header_length = (ord(tcp[12]) >> 4) * 4
+            flags = ord(tcp[13])
+            payload = tcp[tcp_header_length:]
+            key = (source, source_port, destination, destination_port)
+            if flags & _TCP_RST:
+                streams.pop(key, None)
+                streams.pop(
+                    (destination, destination_port, source, source_port),
+                    None)
+                continue
+            if flags & _TCP_SYN:
+                # a new connection, the data starts after the SYN
+                streams[key] = _TcpStream((seq + 1) & _SEQ_MASK)
+                continue
+            stream = streams.get(key)
+            if stream is None:
+                # the capture started in the middle of the connection
+                stream = streams[key] = _TcpStream()
+            if truncated:
+                stream.gap()
+            elif payload:
+                for request in stream.add(seq, payload):
+                    yield request
+            if flags & _TCP_FIN:
+                del streams[key]
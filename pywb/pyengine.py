@@ -0,0 +1,779 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+""" Pure-Python load engine
+
+This exports:
+    - parse_target is a function that parses the target of wb.
+    - Engine is a class of an event loop that sends packets over
+        pooled connections.
+    - Runner is a class that runs an engine per process and merges
+        their results like fanout.FanOut merges wb workers.
+
+The engine is an alternative of wb that doesn't need the binary and is
+easy to extend, e.g. it records the statistics of each packet. It takes
+the same arguments as wb, but only -c, -n, -t, -k, -F, -R, -s, -g, -j,
+-W and -3 have effects, -Q, -q, -2 and -5 are accepted and ignored,
+and the other options are refused. Each engine is a poll loop of
+non-blocking sockets: a connection sends the next packet as soon as its
+response is complete, and it's reused if -k is set and the response
+allows keep-alive. Like wb, -n is the number of passes over the packets
+of -F, and the statistics of requests follow wb(connect, processing,
+waiting and total times), so the summary is printed in the format of
+wb by resultparser.format_summary.
+"""
+
+__all__ = [
+    "parse_target",
+    "Engine",
+    "Runner",
+]
+
+import re
+import time
+import errno
+import select
+import socket
+import collections
+import multiprocessing
+
+import optionparser
+import fanout
+import histogram
+import packetsloader
+import pywbutil
+import resultparser
+
+
+# the default seconds of a run without -n, the same as wb
+_DEFAULT_DURATION = 5
+_DEFAULT_TIMEOUT = 30
+_DEFAULT_WINDOW = 50000
+_READ_SIZE = 64 * 1024
+# the options of wb that the engine supports or ignores
+_SUPPORTED_OPTIONS = ("-c", "-n", "-t", "-k", "-F", "-R", "-s", "-g", "-j",
+                      "-W", "-3")
+_IGNORED_OPTIONS = ("-Q", "-q", "-2", "-5")
+_TARGET_PATTERN = re.compile(r"^(?:(https?)://)?([^/:]+)(?::(\d+))?(/.*)?$")
+
+# the states of a connection
+_CONNECTING, _SENDING, _RECEIVING = range(3)
+
+
+def parse_target(target):
+    """ Parse the target of wb, e.g. "http://localhost:8080/index.html"
+
+    Return a tuple of (host, port, path)
+    """
+    match = _TARGET_PATTERN.match(target)
+    if not match:
+        raise ValueError("invalid target %s" % (target, ))
+    if match.group(1) == "https":
+        raise ValueError("https isn't supported by the python engine")
+    return (match.group(2), int(match.group(3) or 80),
+            match.group(4) or "/")
+
+
+def _default_request(host, port, path, keepalive):
+    """ The request that wb sends without -F """
+    if port != 80:
+        host = "%s:%d" % (host, port)
+    return "GET %s HTTP/1.0\r\n%sHost: %s\r\n" \
+        "User-Agent: ApacheBench/2.3\r\nAccept: */*\r\n\r\n" % (
+            path, "Connection: Keep-Alive\r\n" if keepalive else "", host)
+
+
+class _Response(object):
+    """ An incremental parser of an HTTP response
+
+    Arguments:
+        - head: a flag means that the request is HEAD,
+            so the response has no body
+
+    Attributes:
+        - status: the status code, None until the headers are received
+        - server: the Server header
+        - received: the bytes received
+        - body_length: the bytes of the body
+        - keepalive: a flag means that the connection can be reused
+    """
+    def __init__(self, head=False):
+        self._head = head
+        self._buffer = ""
+        self._remaining = None
+        self._chunked = False
+        self._until_close = False
+        self.status = None
+        self.server = None
+        self.received = 0
+        self.body_length = 0
+        self.keepalive = False
+
+    def _parse_headers(self, headers):
+        lines = headers.split("\r\n")
+        fields = lines[0].split(" ", 2)
+        if len(fields) < 2 or not fields[0].startswith("HTTP/") \
+                or not fields[1].isdigit():
+            raise ValueError("invalid status line %r" % (lines[0], ))
+        version = fields[0]
+        self.status = int(fields[1])
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        self.server = headers.get("server")
+        connection = headers.get("connection", "").lower()
+        if version == "HTTP/1.0":
+            self.keepalive = connection == "keep-alive"
+        else:
+            self.keepalive = connection != "close"
+        if self._head or 100 <= self.status < 200 \
+                or self.status in (204, 304):
+            self._remaining = 0
+        elif "chunked" in headers.get("transfer-encoding", "").lower():
+            self._chunked = True
+        elif "content-length" in headers:
+            self._remaining = int(headers["content-length"])
+        else:
+            self._until_close = True
+            self.keepalive = False
+
+    def _feed_chunks(self):
+        """ Consume the complete chunks in the buffer,
+            return True if the last chunk is consumed
+        """
+        while True:
+            line_end = self._buffer.find("\r\n")
+            if line_end == -1:
+                return False
+            size = int(self._buffer[:line_end].split(";")[0], 16)
+            if size == 0:
+                # the last chunk is followed by trailers and an empty line
+                if self._buffer.startswith("\r\n", line_end + 2):
+                    return True
+                return self._buffer.find("\r\n\r\n", line_end) != -1
+            chunk_end = line_end + 2 + size + 2
+            if len(self._buffer) < chunk_end:
+                return False
+            self.body_length += size
+            self._buffer = self._buffer[chunk_end:]
+
+    def feed(self, data):
+        """ Feed the received data, return True if the response is complete
+        """
+        self.received += len(data)
+        if self.status is None:
+            self._buffer += data
+            end = self._buffer.find("\r\n\r\n")
+            if end == -1:
+                return False
+            self._parse_headers(self._buffer[:end])
+            data = self._buffer[end + 4:]
+            self._buffer = ""
+        if self._chunked:
+            self._buffer += data
+            return self._feed_chunks()
+        self.body_length += len(data)
+        if self._remaining is None:
+            return False
+        self._remaining -= len(data)
+        return self._remaining <= 0
+
+    def finish(self):
+        """ The connection is closed,
+            return True if the response is complete
+        """
+        return self.status is not None and self._until_close
+
+
+class _Connection(object):
+    def __init__(self):
+        self.socket = None
+        self.state = None
+        self.packet = None
+        self.data = None
+        self.sent = 0
+        self.reused = False
+        self.response = None
+        self.start = self.connected = self.written = self.first_byte = None
+
+
+class Engine(object):
+    """ An event loop that sends packets over pooled connections
+
+    Arguments:
+        - address: the (host, port) of the target
+        - packets: a list of raw requests that are sent in turn
+        - concurrency: the number of connections
+        - requests: the number of requests, None means until duration
+        - duration: the seconds of the run, None means until requests
+        - keepalive: a flag means to reuse the connections
+        - rate: the limit of requests per second, None means no limit
+        - timeout: the seconds to wait for a response
+        - check_length: a flag means that a response whose body length
+            differs from the first one is failed by length
+        - time_unit: the unit of the samples, "us" or "ms"
+        - window: the number of the latest samples to keep,
+            0 means not to keep them
+        - warmup: the requests that started in the first warmup seconds
+            aren't recorded into the histograms
+        - report: a callable that receives the number of completed
+            requests after each iteration of the loop
+
+    Attributes:
+        - result: the resultparser.WbResult after run
+        - connection_times: the histogram.ConnectionTimes of
+            the requests after run
+        - samples: the latest window samples of requests after run,
+            see fanout.load_samples
+        - packet_stats: a list of [requests, failed, non-2xx responses,
+            total time, max time] of each packet after run
+    """
+    def __init__(self, address, packets, concurrency=1, requests=None,
+                 duration=None, keepalive=False, rate=None,
+                 timeout=_DEFAULT_TIMEOUT, check_length=False,
+                 time_unit="us", window=_DEFAULT_WINDOW, warmup=0,
+                 report=None):
+        if not packets:
+            raise ValueError("no packet to send")
+        if requests is None and duration is None:
+            raise ValueError("requests or duration is needed")
+        self._address = address
+        self._packets = packets
+        self._heads = [packet.startswith("HEAD ") for packet in packets]
+        self._concurrency = concurrency
+        self._requests = requests
+        self._duration = duration
+        self._keepalive = keepalive
+        self._rate = rate
+        self._timeout = timeout
+        self._check_length = check_length
+        self._scale = 1000000 if time_unit == "us" else 1000
+        self._warmup = warmup
+        self._first_second = None
+        self._report = report
+        self._poller = None
+        self._connections = {}
+        self._idle = []
+        self._issued = 0
+        self._last_done = None
+        self.result = resultparser.WbResult()
+        self.result.time_unit = time_unit
+        self.connection_times = histogram.ConnectionTimes(time_unit=time_unit)
+        self.samples = collections.deque(maxlen=window)
+        self.packet_stats = [[0, 0, 0, 0, 0] for _ in packets]
+
+    def _connect(self, connection, now):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(0)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        code = sock.connect_ex(self._address)
+        connection.socket = sock
+        connection.reused = False
+        connection.connected = None
+        self._connections[sock.fileno()] = connection
+        if code in (0, errno.EISCONN):
+            connection.state = _SENDING
+            connection.connected = now
+        elif code in (errno.EINPROGRESS, errno.EWOULDBLOCK):
+            connection.state = _CONNECTING
+        else:
+            self._fail(connection, "connect", now)
+            return
+        self._poller.register(sock, select.POLLOUT)
+
+    def _send(self, connection, now, packet=None):
+        """ Send a packet by connection, the next one if packet is None """
+        if packet is None:
+            packet = self._issued % len(self._packets)
+            self._issued += 1
+        connection.packet = packet
+        connection.data = self._packets[packet]
+        connection.sent = 0
+        connection.response = _Response(self._heads[packet])
+        connection.start = now
+        connection.written = connection.first_byte = None
+        if connection.socket is None:
+            self._connect(connection, now)
+        else:
+            connection.reused = True
+            connection.connected = now
+            connection.state = _SENDING
+            self._poller.modify(connection.socket, select.POLLOUT)
+
+    def _close(self, connection):
+        if connection.socket is not None:
+            self._connections.pop(connection.socket.fileno(), None)
+            try:
+                self._poller.unregister(connection.socket)
+            except (KeyError, ValueError, IOError):
+                pass
+            connection.socket.close()
+            connection.socket = None
+        connection.state = None
+
+    def _retry(self, connection, now):
+        """ The idle keep-alive connection was closed by the target,
+            send the packet again by a new connection like wb
+        """
+        self._close(connection)
+        packet = connection.packet
+        self._send(connection, now, packet)
+        connection.start = now
+
+    def _count(self, connection, now, failed):
+        result = self.result
+        result.complete_requests += 1
+        stats = self.packet_stats[connection.packet]
+        stats[0] += 1
+        if failed:
+            stats[1] += 1
+        self._last_done = now
+
+    def _fail(self, connection, reason, now):
+        if reason == "write":
+            self.result.write_errors += 1
+        else:
+            self.result.failures[reason] += 1
+            self.result.failed_requests += 1
+        self._count(connection, now, reason != "write")
+        self._close(connection)
+        self._idle.append(connection)
+
+    def _complete(self, connection, now, closed=False):
+        result = self.result
+        response = connection.response
+        failed = False
+        if self._check_length:
+            if result.document_length is None:
+                result.document_length = response.body_length
+            elif response.body_length != result.document_length:
+                result.failures["length"] += 1
+                result.failed_requests += 1
+                failed = True
+        if result.server_software is None:
+            result.server_software = response.server or ""
+        if not 200 <= response.status < 300:
+            result.non_2xx_responses += 1
+            result.status_codes[response.status] = \
+                result.status_codes.get(response.status, 0) + 1
+            self.packet_stats[connection.packet][2] += 1
+        result.total_transferred += response.received
+        result.html_transferred += response.body_length
+        reuse = self._keepalive and response.keepalive and not closed
+        if reuse:
+            result.keepalive_requests += 1
+        self._count(connection, now, failed)
+        scale = self._scale
+        start = connection.start
+        connected = connection.connected or start
+        first_byte = connection.first_byte or now
+        total = int((now - start) * scale)
+        connect = int((connected - start) * scale)
+        sample = (
+            connect, total - connect, total,
+            int((first_byte - (connection.written or connected)) * scale),
+            int(start))
+        if sample[4] >= self._first_second + self._warmup:
+            self.connection_times.record(sample)
+        self.samples.append(sample)
+        stats = self.packet_stats[connection.packet]
+        stats[3] += total
+        stats[4] = max(stats[4], total)
+        if reuse:
+            connection.state = None
+            self._poller.modify(connection.socket, 0)
+        else:
+            self._close(connection)
+        self._idle.append(connection)
+
+    def _on_writable(self, connection, now):
+        if connection.state == _CONNECTING:
+            code = connection.socket.getsockopt(
+                socket.SOL_SOCKET, socket.SO_ERROR)
+            if code:
+                self._fail(connection, "connect", now)
+                return
+            connection.connected = now
+            connection.state = _SENDING
+        try:
+            connection.sent += connection.socket.send(
+                connection.data[connection.sent:])
+        except socket.error as error:
+            if error.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            if connection.reused and error.errno in (
+                    errno.EPIPE, errno.ECONNRESET):
+                self._retry(connection, now)
+                return
+            self._fail(connection, "write", now)
+            return
+        if connection.sent >= len(connection.data):
+            connection.written = now
+            connection.state = _RECEIVING
+            self._poller.modify(connection.socket, select.POLLIN)
+
+    def _on_readable(self, connection, now):
+        try:
+            data = connection.socket.recv(_READ_SIZE)
+        except socket.error as error:
+            if error.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            data = None
+        response = connection.response
+        if not data:
+            if connection.reused and not response.received:
+                self._retry(connection, now)
+            elif data is not None and response.finish():
+                self._complete(connection, now, closed=True)
+            else:
+                self._fail(connection, "receive", now)
+            return
+        if connection.first_byte is None:
+            connection.first_byte = now
+        try:
+            complete = response.feed(data)
+        except ValueError:
+            self._fail(connection, "exceptions", now)
+            return
+        if complete:
+            self._complete(connection, now)
+
+    def _check_timeouts(self, now):
+        for connection in list(self._connections.values()):
+            if connection.state is not None \
+                    and now - connection.start > self._timeout:
+                self._fail(connection, "exceptions", now)
+
+    def run(self):
+        """ Send the packets until the requests are complete or
+            the duration is over
+
+        Return the resultparser.WbResult
+        """
+        result = self.result
+        result.server_hostname, result.server_port = self._address
+        result.concurrency = self._concurrency
+        result.complete_requests = result.failed_requests = 0
+        result.failures = collections.OrderedDict(
+            (reason, 0)
+            for reason in ("connect", "receive", "length", "exceptions"))
+        result.keepalive_requests = 0
+        result.total_transferred = result.html_transferred = 0
+        self._poller = select.poll()
+        self._idle = [_Connection() for _ in range(self._concurrency)]
+        start = time.time()
+        self._first_second = int(start)
+        self._last_done = start
+        deadline = start + self._duration if self._duration else None
+        last_check = start
+        try:
+            while True:
+                now = time.time()
+                if deadline is not None and now >= deadline:
+                    self._last_done = deadline
+                    break
+                next_send = None
+                while self._idle and (self._requests is None
+                                      or self._issued < self._requests):
+                    if self._rate:
+                        next_send = start + float(self._issued) / self._rate
+                        if next_send > now:
+                            break
+                        next_send = None
+                    self._send(self._idle.pop(), now)
+                if self._requests is not None \
+                        and result.complete_requests >= self._requests:
+                    # the idle keep-alive connections are closed below
+                    break
+                timeout = 0.1
+                if next_send is not None:
+                    timeout = min(timeout, next_send - now)
+                if deadline is not None:
+                    timeout = min(timeout, deadline - now)
+                for fd, event in self._poller.poll(
+                        max(0, int(timeout * 1000))):
+                    connection = self._connections.get(fd)
+                    if connection is None:
+                        continue
+                    if connection.state is None:
+                        # the target closed an idle keep-alive connection,
+                        # the next request opens a new one
+                        self._close(connection)
+                        continue
+                    now = time.time()
+                    if connection.state == _RECEIVING:
+                        self._on_readable(connection, now)
+                    else:
+                        self._on_writable(connection, now)
+                if now - last_check >= 0.1:
+                    self._check_timeouts(now)
+                    last_check = now
+                if self._report:
+                    self._report(result.complete_requests)
+        finally:
+            for connection in list(self._connections.values()):
+                self._close(connection)
+            for connection in self._idle:
+                self._close(connection)
+        if self._report:
+            self._report(result.complete_requests)
+        result.time_taken = max(self._last_done - start, 1e-6)
+        result.requests_per_second = \
+            result.complete_requests / result.time_taken
+        result.transfer_rate_received = \
+            result.total_transferred / 1024.0 / result.time_taken
+        return result
+
+
+def _parse_arguments(arguments):
+    """ Parse the arguments of wb for the engine
+
+    Return a tuple of (a dict of option => value, target)
+    """
+    options = {}
+    target = None
+    i = 1
+    while i < len(arguments):
+        argument = arguments[i]
+        if not argument.startswith("-"):
+            target = argument
+            i += 1
+            continue
+        if argument not in _SUPPORTED_OPTIONS \
+                and argument not in _IGNORED_OPTIONS:
+            raise ValueError("%s isn't supported by the python engine"
+                             % (argument, ))
+        if optionparser.has_argument(argument):
+            if i + 1 >= len(arguments):
+                raise ValueError("option [%s] need an argument"
+                                 % (argument, ))
+            options[argument] = arguments[i + 1]
+            i += 2
+        else:
+            # -3 toggles the time unit
+            options[argument] = options.get(argument, 0) + 1
+            i += 1
+    if target is None:
+        raise ValueError("the target is needed")
+    return options, target
+
+
+def _work(index, config, packets_config, counters, queue):
+    """ Run an engine in a worker process and put its result to queue """
+    try:
+        packet_file, shard, shard_count = packets_config
+        if packet_file is None:
+            packets = [config.pop("request")]
+        else:
+            packets = list(packetsloader.load_packets_from_shard(
+                packet_file, shard, shard_count))
+            config.pop("request")
+        passes = config.pop("passes")
+        if passes is not None:
+            config["requests"] = passes * len(packets)
+
+        def report(completed):
+            counters[index] = completed
+        engine = Engine(packets=packets, report=report, **config)
+        engine.run()
+        queue.put((index, engine.result.to_dict(),
+                   engine.connection_times.to_dict(), list(engine.samples),
+                   engine.packet_stats, None))
+    except Exception as error:
+        queue.put((index, None, None, [], [], "%s: %s"
+                   % (error.__class__.__name__, error)))
+
+
+def _write_gnuplot(file_, samples):
+    """ Write samples in the format of the gnuplot file(-g) of wb """
+    with open(file_, "w") as fd:
+        fd.write("starttime\tseconds\tctime\tdtime\tttime\twait\n")
+        for connect, processing, total, wait, second in samples:
+            fd.write("%s\t%d\t%d\t%d\t%d\t%d\n" % (
+                time.ctime(second), second, connect, processing, total,
+                wait))
+
+
+class Runner(object):
+    """ Run an engine per process and merge their results
+
+    Arguments:
+        - arguments: a string list of the arguments of wb,
+            the first one(the path of wb) is ignored
+        - workers: the number of processes
+        - cpus: a list of CPUs, the i-th process is pinned to
+            cpus[i % len(cpus)], default is all of the CPUs
+        - warmup: the requests that started in the first warmup seconds
+            aren't recorded into the histograms
+
+    Attributes:
+        - result: the merged resultparser.WbResult after run
+        - connection_times: the histogram.ConnectionTimes of
+            the requests of all processes after run
+        - histogram: the histogram.Histogram of the total times of
+            the requests of all processes after run
+        - packet_stats: a list of [requests, failed, non-2xx responses,
+            total time, max time] of each packet of -F after run
+    """
+    def __init__(self, arguments, workers=1, cpus=None, warmup=0):
+        if workers < 1:
+            raise ValueError("invalid number of workers %s" % (workers, ))
+        self._options, target = _parse_arguments(arguments)
+        self._host, self._port, self._path = parse_target(target)
+        self._workers = workers
+        self._cpus = cpus or range(multiprocessing.cpu_count())
+        self._warmup = warmup
+        self.result = None
+        self.connection_times = None
+        self.histogram = None
+        self.packet_stats = []
+
+    def _split(self, option, default):
+        value = self._options.get(option)
+        if value is None:
+            if default is None:
+                return [None] * self._workers
+            value = default
+        total = fanout.parse_rate(str(value))
+        if total < self._workers:
+            raise ValueError("%s %d is less than %d workers"
+                             % (option, total, self._workers))
+        return fanout.split_count(total, self._workers)
+
+    def _configs(self):
+        """ Return a list of the (config, packets config) of workers """
+        options = self._options
+        time_unit = "ms" if options.get("-3", 0) % 2 else "us"
+        duration = int(options["-t"]) if "-t" in options else None
+        packet_file = options.get("-F")
+        concurrencies = self._split("-c", 1)
+        rates = self._split("-R", None)
+        if "-n" in options:
+            if packet_file is None:
+                # the requests are split among workers
+                requests = self._split("-n", None)
+            else:
+                # the passes over the packets of each shard
+                requests = [int(options["-n"])] * self._workers
+        else:
+            requests = [None] * self._workers
+            if duration is None:
+                duration = _DEFAULT_DURATION
+        configs = []
+        for i in range(self._workers):
+            config = {
+                "address": (self._host, self._port),
+                "request": _default_request(
+                    self._host, self._port, self._path, "-k" in options),
+                "concurrency": concurrencies[i],
+                "requests": requests[i] if packet_file is None else None,
+                "passes": requests[i] if packet_file is not None else None,
+                "duration": duration,
+                "keepalive": "-k" in options,
+                "rate": rates[i],
+                "timeout": int(options.get("-s", _DEFAULT_TIMEOUT)),
+                "check_length": packet_file is None,
+                "time_unit": time_unit,
+                # the samples are only kept for the gnuplot file
+                "window": int(options.get("-W", _DEFAULT_WINDOW))
+                if "-g" in options else 0,
+                "warmup": self._warmup,
+            }
+            if packet_file is not None and config["requests"] is None \
+                    and config["passes"] is None and duration is None:
+                config["duration"] = _DEFAULT_DURATION
+            configs.append((config, (packet_file, i, self._workers)))
+        return configs
+
+    def _report_progress(self, second, completed, previous, interval,
+                         filters):
+        fanout._filter(filters, "%2d: Completed %6d requests, "
+                       "rate is %d #/sec.\n"
+                       % (second, completed,
+                          (completed - previous) // interval))
+
+    def run(self, filters=[]):
+        """ Run the engines, the progress of each interval(-j) and
+            the merged summary are passed to filters
+
+        Return 0 if all of the engines succeed, otherwise 1
+        """
+        configs = self._configs()
+        interval = int(self._options.get("-j", 1))
+        counters = multiprocessing.Array("l", self._workers, lock=False)
+        queue = multiprocessing.Queue()
+        processes = []
+        for i, (config, packets_config) in enumerate(configs):
+            process = multiprocessing.Process(
+                target=_work,
+                args=(i, config, packets_config, counters, queue))
+            process.daemon = True
+            process.start()
+            pywbutil.set_cpu_affinity(
+                process.pid, self._cpus[i % len(self._cpus)])
+            processes.append(process)
+        reports = [None] * self._workers
+        errors = []
+        remaining = self._workers
+        second = 0
+        previous = 0
+        start = time.time()
+        while remaining:
+            wait = None
+            if interval > 0:
+                wait = max(0, start + (second + 1) * interval - time.time())
+            try:
+                report = queue.get(timeout=wait)
+            except Exception:
+                # the queue is empty at the end of an interval
+                if not any(process.is_alive() for process in processes):
+                    errors.append("a worker exited unexpectedly")
+                    break
+                second += 1
+                completed = sum(counters)
+                self._report_progress(second, completed, previous, interval,
+                                      filters)
+                previous = completed
+                continue
+            index, result, connection_times, samples, packet_stats, error \
+                = report
+            reports[index] = (result, connection_times, samples,
+                              packet_stats)
+            if error:
+                errors.append(error)
+            remaining -= 1
+        for process in processes:
+            process.join()
+        if interval > 0:
+            self._report_progress(second + 1, sum(counters), previous,
+                                  interval, filters)
+        for error in errors:
+            fanout._filter(filters, "Worker failed: %s\n" % (error, ))
+        results = []
+        samples = []
+        self.connection_times = histogram.ConnectionTimes(
+            time_unit=configs[0][0]["time_unit"])
+        self.packet_stats = []
+        for report in reports:
+            if report is None or report[0] is None:
+                continue
+            result, connection_times, worker_samples, packet_stats = report
+            results.append(resultparser.WbResult.from_dict(result))
+            self.connection_times.merge(
+                histogram.ConnectionTimes.from_dict(connection_times))
+            samples += [tuple(sample) for sample in worker_samples]
+            self.packet_stats += packet_stats
+        self.histogram = self.connection_times.total
+        self.result = fanout.merge_results(results, self.connection_times)
+        if self.result.complete_requests is not None:
+            self.result.document_path = self._path
+            if self._options.get("-F") is not None:
+                self.result.document_length = None
+            for line in resultparser.format_summary(self.result):
+                fanout._filter(filters, line)
+        if "-g" in self._options:
+            _write_gnuplot(self._options["-g"], samples)
+        return 1 if errors or not results else 0
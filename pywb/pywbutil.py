@@ -13,6 +13,10 @@ This exports:
     - expand_nest_generator is a decorator to
         recursively expand the return values of the func,
         if the return values is generators.
+    - file_digest is a function to get the sha1 of a file's content.
+    - create_memory_file is a function to create an anonymous file
+        in memory that can be inherited by subprocesses.
+    - set_cpu_affinity is a function to pin a process to a CPU.
 """
 
 __all__ = [
@@ -20,13 +24,21 @@ __all__ = [
     "MIME_TYPE_DICT",
     "accept_iterable",
     "expand_nest_generator",
+    "file_digest",
+    "create_memory_file",
+    "set_cpu_affinity",
 ]
 
 import os
 import sys
 import functools
 import types
+import fcntl
+import ctypes
+import hashlib
+import tempfile
 import mimetypes
+import ctypes.util
 
 
 def get_wb_path():
@@ -101,3 +113,76 @@ def expand_nest_generator(func):
                 except StopIteration:
                     visit_stack.pop()
     return _decorator
+
+
+def file_digest(file_):
+    """ Get the hex sha1 of the content of file_
+    """
+    digest = hashlib.sha1()
+    with open(file_, "rb") as fd:
+        for block in iter(lambda: fd.read(1024 * 1024), ""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _memfd_create(name):
+    """ Call memfd_create(2) through libc, return None if it's unsupported
+    """
+    libc_name = ctypes.util.find_library("c")
+    if not libc_name:
+        return None
+    libc = ctypes.CDLL(libc_name, use_errno=True)
+    if not hasattr(libc, "memfd_create"):  # glibc < 2.27
+        return None
+    # no MFD_CLOEXEC, so that the file is inherited by subprocesses
+    fd = libc.memfd_create(ctypes.c_char_p(name), ctypes.c_uint(0))
+    if fd < 0:
+        return None
+    return fd
+
+
+def create_memory_file(name):
+    """ Create an anonymous file in memory
+
+    It's a memfd if the system supports it, otherwise it's a deleted file
+    in /dev/shm. The file isn't closed on exec, so that a subprocess can
+    open it by the path "/proc/self/fd/<fd>".
+
+    Arguments:
+        - name: a string, the name of the file for debugging
+
+    Return the file descriptor. Raise OSError if neither is supported.
+    """
+    fd = _memfd_create(name)
+    if fd is not None:
+        return fd
+    if not os.path.isdir("/dev/shm"):
+        raise OSError("anonymous memory files aren't supported")
+    fd, path_ = tempfile.mkstemp(prefix=name + ".", dir="/dev/shm")
+    os.unlink(path_)
+    # tempfile sets close-on-exec
+    flags = fcntl.fcntl(fd, fcntl.F_GETFD)
+    fcntl.fcntl(fd, fcntl.F_SETFD, flags & ~fcntl.FD_CLOEXEC)
+    return fd
+
+
+def set_cpu_affinity(pid, cpu):
+    """ Pin the process pid to the CPU cpu by sched_setaffinity(2)
+
+    Return a flag means whether the process is pinned,
+        it's False if the system doesn't support it
+    """
+    libc_name = ctypes.util.find_library("c")
+    if not libc_name:
+        return False
+    libc = ctypes.CDLL(libc_name, use_errno=True)
+    if not hasattr(libc, "sched_setaffinity"):
+        return False
+    # a cpu_set_t of 1024 CPUs
+    bits = 8 * ctypes.sizeof(ctypes.c_ulong)
+    mask = (ctypes.c_ulong * (1024 // bits))()
+    if not 0 <= cpu < 1024:
+        return False
+    mask[cpu // bits] = 1 << (cpu % bits)
+    return libc.sched_setaffinity(
+        ctypes.c_int(pid), ctypes.sizeof(mask), ctypes.byref(mask)) == 0
@@ -0,0 +1,421 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+""" Parse the summary of wb
+
+This exports:
+    - WbResult is a class of the structured result of a run of wb.
+    - ResultParser is an OutputFilter that parses the summary of wb
+        into a WbResult in one pass.
+    - parse is a function that parses the output of wb.
+    - format_summary is a function that formats a WbResult
+        as the summary of wb.
+
+Only the lines after "Server Software:", which starts the summary,
+are matched, so the verbose output before it costs one prefix check
+per line. This module is compatible with python 3, so that tools can
+import it without pywb.
+"""
+
+__all__ = [
+    "WbResult",
+    "ResultParser",
+    "parse",
+    "format_summary",
+]
+
+import re
+import json
+import collections
+
+import outputfilter
+
+
+_SUMMARY_START = "Server Software:"
+_ANSI_ESCAPE_PATTERN = re.compile(r"\x1b\[[0-9;]*m")
+_FIELD_PATTERN = re.compile(r"^([A-Za-z][A-Za-z0-9 /-]*):\s*(.*?)\s*$")
+_NUMBER_PATTERN = re.compile(r"-?\d+(?:\.\d+)?")
+_FAILURES_PATTERN = re.compile(
+    r"^\s*\(Connect: (\d+), Receive: (\d+), Length: (\d+), "
+    r"Exceptions: (\d+)\)")
+_STATUS_CODE_PATTERN = re.compile(r"^(\d{3}) responses: (\d+)")
+_RATE_PATTERN = re.compile(r"^\s+(\d+(?:\.\d+)?) kb/s (sent|total)")
+_TABLE_UNIT_PATTERN = re.compile(r"^Connection Times \((\w+)\)")
+_PERCENTILE_UNIT_PATTERN = re.compile(
+    r"^Percentage of the requests served within a certain time \((\w+)\)")
+_PERCENTILE_PATTERN = re.compile(r"^\s*(\d+)%\s+(\d+)")
+
+# the rows and the columns of the table of connection times
+_TABLE_ROWS = {
+    "Connect": "connect",
+    "Processing": "processing",
+    "Waiting": "waiting",
+    "Total": "total",
+}
+_CONFIDENCE_COLUMNS = ("min", "mean", "sd", "median", "max")
+_SIMPLE_COLUMNS = ("min", "mean", "max")
+
+# the fields of the summary => the attributes of WbResult
+_FIELD_ATTRIBUTES = {
+    "Concurrency Level": "concurrency",
+    "Time taken for tests": "time_taken",
+    "Complete requests": "complete_requests",
+    "Failed requests": "failed_requests",
+    "Write errors": "write_errors",
+    "Non-2xx responses": "non_2xx_responses",
+    "Keep-Alive requests": "keepalive_requests",
+    "Total transferred": "total_transferred",
+    "Total body sent": "total_body_sent",
+    "HTML transferred": "html_transferred",
+    "Requests per second": "requests_per_second",
+    "Total samples of stats": "samples",
+}
+
+# the attributes of WbResult in the order of serialization
+_RESULT_FIELDS = (
+    "return_code",
+    "server_software", "server_hostname", "server_port",
+    "document_path", "document_length",
+    "concurrency", "time_taken",
+    "complete_requests", "failed_requests", "failures",
+    "write_errors", "non_2xx_responses", "status_codes",
+    "keepalive_requests",
+    "total_transferred", "total_body_sent", "html_transferred",
+    "requests_per_second", "time_per_request", "time_per_request_all",
+    "transfer_rate_received", "transfer_rate_sent", "transfer_rate_total",
+    "samples", "time_unit", "connection_times", "percentiles",
+)
+
+
+def _to_number(text):
+    """ The first number in text, None if there isn't """
+    match = _NUMBER_PATTERN.search(text)
+    if not match:
+        return None
+    number = match.group(0)
+    return float(number) if "." in number else int(number)
+
+
+class WbResult(object):
+    """ The structured result of a run of wb
+
+    Attributes:
+        - return_code: the return code of wb, None if it isn't known
+        - server_software, server_hostname, server_port,
+            document_path: the target
+        - document_length: the bytes of the document,
+            None if it's variable
+        - concurrency: the number of concurrent connections
+        - time_taken: the seconds of the run
+        - complete_requests, failed_requests: the numbers of requests
+        - failures: a dict of the failed requests by reason,
+            connect, receive, length and exceptions
+        - write_errors: the number of failed writes
+        - non_2xx_responses: the number of the responses that aren't 2xx
+        - status_codes: a dict, status code => number of responses,
+            wb reports it only if there are non-2xx responses
+        - keepalive_requests: the number of keep-alive requests
+        - total_transferred, html_transferred, total_body_sent: bytes
+        - requests_per_second: the throughput
+        - time_per_request, time_per_request_all: the mean milliseconds
+            of a request, and across all concurrent requests
+        - transfer_rate_received, transfer_rate_sent, transfer_rate_total:
+            the transfer rates in KB/sec
+        - samples: the number of requests in the statistics
+        - time_unit: the unit of connection_times and percentiles,
+            "ms" or "us"
+        - connection_times: a dict, connect, processing, waiting and
+            total => a dict of min, mean, sd, median and max
+        - percentiles: an OrderedDict, percentage => time
+    """
+    def __init__(self):
+        self.return_code = None
+        self.server_software = None
+        self.server_hostname = None
+        self.server_port = None
+        self.document_path = None
+        self.document_length = None
+        self.concurrency = None
+        self.time_taken = None
+        self.complete_requests = None
+        self.failed_requests = None
+        self.failures = {}
+        self.write_errors = 0
+        self.non_2xx_responses = 0
+        self.status_codes = {}
+        self.keepalive_requests = None
+        self.total_transferred = None
+        self.html_transferred = None
+        self.total_body_sent = None
+        self.requests_per_second = None
+        self.time_per_request = None
+        self.time_per_request_all = None
+        self.transfer_rate_received = None
+        self.transfer_rate_sent = None
+        self.transfer_rate_total = None
+        self.samples = None
+        self.time_unit = None
+        self.connection_times = {}
+        self.percentiles = collections.OrderedDict()
+
+    def get_time(self, value, unit="ms"):
+        """ Convert value of time_unit to unit("ms" or "us") """
+        if value is None or self.time_unit is None \
+                or self.time_unit == unit:
+            return value
+        if unit == "ms":
+            return value / 1000.0
+        return value * 1000
+
+    def to_dict(self):
+        """ Return an OrderedDict of the attributes """
+        result = collections.OrderedDict(
+            (name, getattr(self, name)) for name in _RESULT_FIELDS)
+        result["percentiles"] = collections.OrderedDict(
+            (str(percentage), value)
+            for percentage, value in self.percentiles.items())
+        result["status_codes"] = collections.OrderedDict(
+            (str(code), count)
+            for code, count in sorted(self.status_codes.items()))
+        return result
+
+    def to_json(self, **kwargs):
+        """ Serialize to JSON, kwargs are passed to json.dumps """
+        return json.dumps(self.to_dict(), **kwargs)
+
+    @classmethod
+    def from_dict(cls, data):
+        """ Create a WbResult from the dict of to_dict """
+        result = cls()
+        for name in _RESULT_FIELDS:
+            if name in data:
+                setattr(result, name, data[name])
+        result.percentiles = collections.OrderedDict(sorted(
+            (int(percentage), value)
+            for percentage, value in data.get("percentiles", {}).items()))
+        result.status_codes = dict(
+            (int(code), count)
+            for code, count in data.get("status_codes", {}).items())
+        return result
+
+
+class ResultParser(outputfilter.OutputFilter):
+    """ Parse the summary of wb into a WbResult, lines are passed through
+
+    Attributes:
+        - result: the WbResult
+        - _in_summary: a flag means the summary has started
+        - _section: None, "table" or "percentiles",
+            the multi-line section that the line belongs to
+        - _table_columns: the columns of the table of connection times
+    """
+    def __init__(self):
+        self.result = WbResult()
+        self._in_summary = False
+        self._section = None
+        self._table_columns = _CONFIDENCE_COLUMNS
+
+    @property
+    def in_summary(self):
+        """ Whether the summary has started """
+        return self._in_summary
+
+    def __call__(self, line):
+        if line is None:
+            return None
+        if not self._in_summary:
+            if not line.startswith(_SUMMARY_START):
+                return line
+            self._in_summary = True
+        self._parse(_ANSI_ESCAPE_PATTERN.sub("", line).rstrip("\r\n"))
+        return line
+
+    def _parse(self, line):
+        result = self.result
+        if self._section == "percentiles":
+            match = _PERCENTILE_PATTERN.match(line)
+            if match:
+                result.percentiles[int(match.group(1))] = \
+                    int(match.group(2))
+                return
+            self._section = None
+        match = _TABLE_UNIT_PATTERN.match(line)
+        if match:
+            result.time_unit = match.group(1)
+            self._section = "table"
+            return
+        match = _PERCENTILE_UNIT_PATTERN.match(line)
+        if match:
+            result.time_unit = match.group(1)
+            self._section = "percentiles"
+            return
+        if self._section == "table":
+            if line.strip().startswith("min"):
+                self._table_columns = _CONFIDENCE_COLUMNS \
+                    if "median" in line else _SIMPLE_COLUMNS
+                return
+            name, _, values = line.partition(":")
+            if name in _TABLE_ROWS:
+                values = [_to_number(value) for value in values.split()]
+                result.connection_times[_TABLE_ROWS[name]] = \
+                    collections.OrderedDict(zip(self._table_columns, values))
+                return
+            if line.strip():
+                self._section = None
+        match = _FAILURES_PATTERN.match(line)
+        if match:
+            result.failures = collections.OrderedDict(zip(
+                ("connect", "receive", "length", "exceptions"),
+                [int(value) for value in match.groups()]))
+            return
+        match = _STATUS_CODE_PATTERN.match(line)
+        if match:
+            result.status_codes[int(match.group(1))] = int(match.group(2))
+            return
+        match = _RATE_PATTERN.match(line)
+        if match:
+            setattr(result, "transfer_rate_" + match.group(2),
+                    float(match.group(1)))
+            return
+        match = _FIELD_PATTERN.match(line)
+        if match:
+            self._parse_field(match.group(1), match.group(2))
+
+    def _parse_field(self, name, value):
+        result = self.result
+        if name == "Server Software":
+            result.server_software = value
+        elif name == "Server Hostname":
+            result.server_hostname = value
+        elif name == "Server Port":
+            result.server_port = _to_number(value)
+        elif name == "Document Path":
+            result.document_path = value
+        elif name == "Document Length":
+            result.document_length = _to_number(value)
+        elif name == "Time per request":
+            if "across all" in value:
+                result.time_per_request_all = _to_number(value)
+            else:
+                result.time_per_request = _to_number(value)
+        elif name == "Transfer rate":
+            result.transfer_rate_received = _to_number(value)
+        else:
+            attribute = _FIELD_ATTRIBUTES.get(name)
+            if attribute is not None:
+                setattr(result, attribute, _to_number(value))
+
+
+def parse(output):
+    """ Parse the output of wb
+
+    Arguments:
+        - output: a string or an iterable of lines of the output
+
+    Return a WbResult
+    """
+    if isinstance(output, str):
+        output = output.splitlines(True)
+    parser = ResultParser()
+    for line in output:
+        parser(line)
+    return parser.result
+
+
+def format_summary(result):
+    """ Format result as the summary of wb, without colors
+
+    Arguments:
+        - result: a WbResult
+
+    Return a list of lines
+    """
+    lines = [
+        "Server Software:        %s\n" % (result.server_software, ),
+        "Server Hostname:        %s\n" % (result.server_hostname, ),
+        "Server Port:            %s\n" % (result.server_port, ),
+        "\n",
+        "Document Path:          %s\n" % (result.document_path, ),
+    ]
+    if result.document_length is None:
+        lines.append("Document Length:        Variable\n")
+    else:
+        lines.append("Document Length:        %d bytes\n"
+                     % (result.document_length, ))
+    lines += [
+        "\n",
+        "Concurrency Level:      %d\n" % (result.concurrency, ),
+        "Time taken for tests:   %.3f seconds\n" % (result.time_taken, ),
+        "Complete requests:      %d\n" % (result.complete_requests, ),
+        "Failed requests:        %d\n" % (result.failed_requests, ),
+    ]
+    if result.failed_requests:
+        lines.append(
+            "   (Connect: %d, Receive: %d, Length: %d, Exceptions: %d)\n"
+            % tuple(result.failures.get(reason, 0) for reason in (
+                "connect", "receive", "length", "exceptions")))
+    if result.write_errors:
+        lines.append("Write errors:           %d\n" % (result.write_errors, ))
+    if result.non_2xx_responses:
+        lines.append("Non-2xx responses:      %d\n"
+                     % (result.non_2xx_responses, ))
+    for code, count in sorted(result.status_codes.items()):
+        lines.append("%d responses: %d\n" % (code, count))
+    if result.keepalive_requests is not None:
+        lines.append("Keep-Alive requests:    %d\n"
+                     % (result.keepalive_requests, ))
+    lines.append("Total transferred:      %d bytes\n"
+                 % (result.total_transferred, ))
+    if result.total_body_sent is not None:
+        lines.append("Total body sent:        %d\n"
+                     % (result.total_body_sent, ))
+    lines.append("HTML transferred:       %d bytes\n"
+                 % (result.html_transferred, ))
+    if result.requests_per_second is not None:
+        lines.append("Requests per second:    %.2f [#/sec] (mean)\n"
+                     % (result.requests_per_second, ))
+    if result.time_per_request is not None:
+        lines.append("Time per request:       %.3f [ms] (mean)\n"
+                     % (result.time_per_request, ))
+    if result.time_per_request_all is not None:
+        lines.append("Time per request:       %.3f [ms] "
+                     "(mean, across all concurrent requests)\n"
+                     % (result.time_per_request_all, ))
+    if result.transfer_rate_received is not None:
+        lines.append("Transfer rate:          %.2f [Kbytes/sec] received\n"
+                     % (result.transfer_rate_received, ))
+    if result.transfer_rate_sent is not None:
+        lines.append("                        %.2f kb/s sent\n"
+                     % (result.transfer_rate_sent, ))
+    if result.transfer_rate_total is not None:
+        lines.append("                        %.2f kb/s total\n"
+                     % (result.transfer_rate_total, ))
+    if result.samples is not None:
+        lines.append("Total samples of stats: %d\n" % (result.samples, ))
+    if result.connection_times:
+        lines += [
+            "Connection Times (%s)\n" % (result.time_unit, ),
+            "              min  mean[+/-sd] median   max\n",
+        ]
+        for name, row in (("Connect:    ", "connect"),
+                          ("Processing: ", "processing"),
+                          ("Waiting:    ", "waiting"),
+                          ("Total:      ", "total")):
+            times = result.connection_times[row]
+            lines.append("%s%5d %4d %5.1f %6d %7d\n" % (
+                name, times["min"], times["mean"], times["sd"],
+                times["median"], times["max"]))
+    if result.percentiles:
+        lines += [
+            "\n",
+            "Percentage of the requests served within a certain time (%s)\n"
+            % (result.time_unit, ),
+        ]
+        for percentage, time_ in result.percentiles.items():
+            if percentage == 100:
+                lines.append(" 100%%  %5d (longest request)\n" % (time_, ))
+            else:
+                lines.append("  %d%%  %5d\n" % (percentage, time_))
+    return lines
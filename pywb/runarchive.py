@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+""" Archive of benchmark runs
+
+This exports:
+    - corpus_hash is a function that returns the sha1 of packet files.
+    - benchmark_name is a function that names a benchmark by
+        the arguments of wb.
+    - ArchivedRun is a class of a run in the archive.
+    - Comparison is a class of the comparison of a metric of a run
+        against its baseline.
+    - RunArchive is a class of a SQLite archive of runs.
+
+A run is archived with its benchmark name(the parameters of wb), the
+hash of its packet corpus, the label of the WAF build, the parsed
+summary of wb and the histogram of latencies. The baseline of a run is
+the latest runs before it of the same benchmark and corpus. A metric
+regresses if it's worse than the prediction interval of the baseline,
+which is built from Student's t distribution since the baseline is a
+few runs, and if the change exceeds a minimum ratio, so that the noise
+of runs isn't flagged.
+"""
+
+__all__ = [
+    "corpus_hash",
+    "benchmark_name",
+    "ArchivedRun",
+    "Comparison",
+    "RunArchive",
+]
+
+import json
+import time
+import sqlite3
+import hashlib
+import collections
+
+import confidence
+
+
+_SQL_INITIALIZE = '''
+CREATE TABLE IF NOT EXISTS Run (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created REAL NOT NULL,
+    name TEXT NOT NULL,
+    label TEXT,
+    arguments TEXT,
+    corpus_hash TEXT,
+    requests_per_second REAL,
+    latency_p99_ms REAL,
+    error_rate REAL,
+    result TEXT,
+    histogram TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_run_benchmark ON Run(name, corpus_hash);
+'''
+
+_SQL_INSERT_RUN = '''
+INSERT INTO Run (
+    created,
+    name,
+    label,
+    arguments,
+    corpus_hash,
+    requests_per_second,
+    latency_p99_ms,
+    error_rate,
+    result,
+    histogram
+    )
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+'''
+
+_RUN_COLUMNS = '''
+    run_id, created, name, label, arguments, corpus_hash,
+    requests_per_second, latency_p99_ms, error_rate, result, histogram
+'''
+
+_SQL_QUERY_RUN = "SELECT %s FROM Run WHERE run_id = ?;" % (_RUN_COLUMNS, )
+
+_SQL_QUERY_LATEST_RUN = '''
+SELECT %s FROM Run WHERE name LIKE ? ORDER BY run_id DESC LIMIT 1;
+''' % (_RUN_COLUMNS, )
+
+_SQL_QUERY_RUNS = '''
+SELECT %s FROM Run WHERE name LIKE ? ORDER BY run_id DESC LIMIT ?;
+''' % (_RUN_COLUMNS, )
+
+_SQL_QUERY_BASELINE = '''
+SELECT %s FROM Run
+WHERE name = ? AND corpus_hash IS ? AND run_id < ?
+ORDER BY run_id DESC LIMIT ?;
+''' % (_RUN_COLUMNS, )
+
+# the metrics that are compared, name => a flag means higher is better
+_METRICS = collections.OrderedDict([
+    ("requests_per_second", True),
+    ("latency_p99_ms", False),
+])
+
+
+def corpus_hash(paths):
+    """ The hex sha1 of the contents of the packet files of paths,
+        None if there isn't a path
+    """
+    if not paths:
+        return None
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, "rb") as fd:
+            for block in iter(lambda: fd.read(1024 * 1024), b""):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def benchmark_name(arguments, ignored_options=("-F", "-g")):
+    """ Name a benchmark by the arguments of wb except the path of wb
+        and the options of generated files, e.g. "-c 20 -t 10 localhost"
+    """
+    name = []
+    skip = False
+    for argument in arguments[1:]:
+        if skip:
+            skip = False
+        elif argument in ignored_options:
+            skip = True
+        else:
+            name.append(argument)
+    return " ".join(name)
+
+
+class ArchivedRun(object):
+    """ A run in the archive
+
+    Attributes:
+        - run_id, created, name, label, corpus_hash,
+            requests_per_second, latency_p99_ms, error_rate:
+            the columns of the run
+        - arguments: the list of the arguments of wb
+        - result: the dict of resultparser.WbResult.to_dict
+        - histogram: the dict of histogram.Histogram.to_dict,
+            None if it isn't archived
+    """
+    def __init__(self, row):
+        (self.run_id, self.created, self.name, self.label, arguments,
+         self.corpus_hash, self.requests_per_second, self.latency_p99_ms,
+         self.error_rate, result, histogram_) = row
+        self.arguments = json.loads(arguments) if arguments else []
+        self.result = json.loads(result) if result else None
+        self.histogram = json.loads(histogram_) if histogram_ else None
+
+    def to_dict(self):
+        return collections.OrderedDict([
+            ("run_id", self.run_id),
+            ("created", self.created),
+            ("name", self.name),
+            ("label", self.label),
+            ("corpus_hash", self.corpus_hash),
+            ("requests_per_second", self.requests_per_second),
+            ("latency_p99_ms", self.latency_p99_ms),
+            ("error_rate", self.error_rate),
+        ])
+
+
+class Comparison(object):
+    """ The comparison of a metric of a run against its baseline
+
+    Arguments:
+        - metric: "requests_per_second" or "latency_p99_ms"
+        - value: the value of the run
+        - baseline: a list of the values of the baseline runs
+        - higher_is_better: a flag of the direction of the metric
+        - min_change: the ratio of change under which
+            the metric doesn't regress
+
+    Attributes:
+        - metric, value, higher_is_better: the same as Arguments
+        - mean, margin: the mean of the baseline and the half width
+            of the 95% prediction interval of a new run,
+            None if the baseline has less than two values
+        - change: the ratio of change from mean, None if it's unknown
+        - status: "regression", "improvement", "unchanged" or
+            "insufficient" if the baseline is too short
+    """
+    def __init__(self, metric, value, baseline, higher_is_better,
+                 min_change=0.05):
+        self.metric = metric
+        self.value = value
+        self.higher_is_better = higher_is_better
+        self.mean = self.margin = self.change = None
+        baseline = [item for item in baseline if item is not None]
+        if value is None or len(baseline) < 2:
+            self.status = "insufficient"
+            return
+        self.mean, self.margin = confidence.prediction_margin(baseline)
+        if self.mean:
+            self.change = (value - self.mean) / self.mean
+        worse = value < self.mean - self.margin if higher_is_better \
+            else value > self.mean + self.margin
+        better = value > self.mean + self.margin if higher_is_better \
+            else value < self.mean - self.margin
+        significant = self.change is None or abs(self.change) >= min_change
+        if worse and significant:
+            self.status = "regression"
+        elif better and significant:
+            self.status = "improvement"
+        else:
+            self.status = "unchanged"
+
+    def to_dict(self):
+        return collections.OrderedDict([
+            ("metric", self.metric),
+            ("value", self.value),
+            ("baseline_mean", self.mean),
+            ("baseline_margin", self.margin),
+            ("change", self.change),
+            ("status", self.status),
+        ])
+
+
+class RunArchive(object):
+    """ A SQLite archive of benchmark runs
+
+    Arguments:
+        - path: the path of the database, it's created if it doesn't exist
+    """
+    def __init__(self, path):
+        self._connection = sqlite3.connect(path)
+        self._connection.executescript(_SQL_INITIALIZE)
+
+    def add(self, name, result, label=None, arguments=(),
+            corpus_hash=None, histogram_=None):
+        """ Archive a run
+
+        Arguments:
+            - name: the name of the benchmark, see benchmark_name
+            - result: the resultparser.WbResult of the run
+            - label: the label of the WAF build
+            - arguments: the list of the arguments of wb
+            - corpus_hash: the hash of the packet corpus, see corpus_hash
+            - histogram_: the histogram.Histogram of the latencies
+
+        Return the run_id
+        """
+        latency = result.get_time(result.percentiles.get(99))
+        if histogram_ is not None and histogram_.total_count:
+            # the histogram is more precise than the percentiles of wb
+            latency = histogram_.value_at_percentile(99) \
+                / (1000.0 if histogram_.time_unit == "us" else 1.0)
+        completed = result.complete_requests
+        error_rate = None
+        if completed:
+            error_rate = float((result.failed_requests or 0)
+                               + (result.write_errors or 0)) / completed
+        with self._connection:
+            cursor = self._connection.execute(_SQL_INSERT_RUN, (
+                time.time(), name, label, json.dumps(list(arguments)),
+                corpus_hash, result.requests_per_second, latency,
+                error_rate, result.to_json(),
+                histogram_.to_json() if histogram_ is not None else None))
+        return cursor.lastrowid
+
+    def get(self, run_id=None, name="%"):
+        """ Return the ArchivedRun of run_id, or the latest one whose
+            name matches the LIKE pattern name if run_id is None,
+            None if there isn't such run
+        """
+        if run_id is None:
+            row = self._connection.execute(
+                _SQL_QUERY_LATEST_RUN, (name, )).fetchone()
+        else:
+            row = self._connection.execute(
+                _SQL_QUERY_RUN, (run_id, )).fetchone()
+        return ArchivedRun(row) if row else None
+
+    def runs(self, name="%", limit=20):
+        """ Return a list of the latest ArchivedRun whose name matches
+            the LIKE pattern name, the latest one first
+        """
+        return [ArchivedRun(row) for row in self._connection.execute(
+            _SQL_QUERY_RUNS, (name, limit))]
+
+    def baseline(self, run, window=10):
+        """ Return a list of the latest window ArchivedRun before run
+            of the same benchmark and corpus
+        """
+        return [ArchivedRun(row) for row in self._connection.execute(
+            _SQL_QUERY_BASELINE,
+            (run.name, run.corpus_hash, run.run_id, window))]
+
+    def compare(self, run, window=10, min_change=0.05):
+        """ Compare the metrics of run against its baseline
+
+        Return a list of Comparison
+        """
+        baseline = self.baseline(run, window)
+        return [Comparison(metric, getattr(run, metric),
+                           [getattr(item, metric) for item in baseline],
+                           higher_is_better, min_change)
+                for metric, higher_is_better in _METRICS.items()]
+
+    def close(self):
+        self._connection.close()
@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+""" Library API of pywb
+
+This exports:
+    - Run is a class of a run of wb started by start.
+    - start is a function that starts a run of wb without blocking.
+    - run is a function that runs wb and returns its result.
+    - wait_all is a function that waits for many runs by one thread.
+
+Packets are passed as iterables and saved in an anonymous memory file
+that wb inherits as its stdin, so a run doesn't touch the disk. The
+other descriptors are closed in wb, so a run doesn't hold the memory
+files and the pipes of the other runs. The output of wb is
+read by the thread that drives the run and parsed into a
+resultparser.WbResult. A Run is selectable(it has fileno), so that
+many runs can be driven by one select loop, see wait_all.
+"""
+
+__all__ = [
+    "Run",
+    "start",
+    "run",
+    "wait_all",
+]
+
+import os
+import fcntl
+import select
+import subprocess
+
+import packetsloader
+import packetsdumper
+import pywbutil
+import resultparser
+
+
+_READ_SIZE = 64 * 1024
+
+
+class Run(object):
+    """ A run of wb started by start
+
+    Arguments:
+        - command: a string list, the path of wb and its arguments
+        - packets_fd: the memory file of packets that wb inherits as
+            its stdin, it's closed when the run finishes,
+            None if there isn't
+        - filters: a list of filters that process the output of wb,
+            see outputfilter.OutputFilter
+
+    Attributes:
+        - command: the same as Arguments
+        - result: the resultparser.WbResult, it's complete after wait
+    """
+    def __init__(self, command, packets_fd=None, filters=()):
+        self.command = command
+        self._packets_fd = packets_fd
+        self._parser = resultparser.ResultParser()
+        self._filters = [self._parser] + list(filters)
+        self._partial_line = ""
+        self.result = self._parser.result
+        try:
+            self._process = subprocess.Popen(
+                command, shell=False, close_fds=True, stdin=packets_fd,
+                stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        except:
+            self._close_packets()
+            raise
+        self._fd = self._process.stdout.fileno()
+
+    def fileno(self):
+        """ The file descriptor of the output of wb, for select """
+        return self._fd
+
+    @property
+    def pid(self):
+        return self._process.pid
+
+    def _filter(self, line):
+        for filter_ in self._filters:
+            line = filter_(line)
+            if line is None:
+                break
+
+    def read(self):
+        """ Read and process the available output of wb, it blocks
+            if there isn't any output
+
+        Return False if the output is finished
+        """
+        if self._fd is None:
+            return False
+        chunk = os.read(self._fd, _READ_SIZE)
+        if not chunk:
+            if self._partial_line:
+                self._filter(self._partial_line)
+                self._partial_line = ""
+            self._process.stdout.close()
+            self._fd = None
+            return False
+        lines = (self._partial_line + chunk).split("\n")
+        for line in lines[:-1]:
+            self._filter(line + "\n")
+        self._partial_line = lines[-1]
+        return True
+
+    def poll(self):
+        """ Return the return code of wb, None if it's running """
+        return self._process.poll()
+
+    def wait(self):
+        """ Process the output until wb exits
+
+        Return the resultparser.WbResult whose return_code is set
+        """
+        while self.read():
+            pass
+        self.result.return_code = self._process.wait()
+        self._close_packets()
+        return self.result
+
+    def terminate(self):
+        """ Stop wb, the result is still available by wait """
+        if self._process.poll() is None:
+            self._process.terminate()
+
+    def _close_packets(self):
+        if self._packets_fd is not None:
+            os.close(self._packets_fd)
+            self._packets_fd = None
+
+
+def _dump_packets(packets, packet_files):
+    """ Save packets into a memory file,
+        return its file descriptor and the count of packets
+    """
+    fd = pywbutil.create_memory_file("pywb-run")
+    # only the run of the packets inherits it, as the stdin of wb
+    flags = fcntl.fcntl(fd, fcntl.F_GETFD)
+    fcntl.fcntl(fd, fcntl.F_SETFD, flags | fcntl.FD_CLOEXEC)
+    try:
+        with packetsdumper.PacketsDumper("/proc/self/fd/%d" % (fd, )) \
+                as dumper:
+            if packet_files:
+                dumper.dump(packetsloader.load_packets_from_paths(
+                    packet_files))
+            if packets is not None:
+                dumper.dump(packets)
+    except:
+        os.close(fd)
+        raise
+    return fd, dumper.packet_count
+
+
+def start(target, packets=None, packet_files=None, concurrency=1,
+          duration=None, requests=None, rate=None, keepalive=False,
+          options=(), filters=(), wb_path=None):
+    """ Start a run of wb without blocking
+
+    Arguments:
+        - target: the destination of wb, e.g. "localhost:8080/"
+        - packets: an iterable of packets(raw requests) to send
+        - packet_files: a list of files or directories that -F supports,
+            their packets are sent before packets
+        - concurrency: the number of concurrent connections(-c)
+        - duration: the seconds of the run(-t)
+        - requests: the number of requests(-n)
+        - rate: the limit of requests per second(-R)
+        - keepalive: a flag means to use keep-alive connections(-k)
+        - options: a list of other arguments of wb
+        - filters: a list of filters that process the output of wb
+        - wb_path: the path of wb, default is pywbutil.get_wb_path()
+
+    Return a Run
+    """
+    command = [wb_path or pywbutil.get_wb_path(),
+               "-c", str(concurrency)]
+    if duration is not None:
+        command += ["-t", str(duration)]
+    if requests is not None:
+        command += ["-n", str(requests)]
+    if rate is not None:
+        command += ["-R", str(rate)]
+    if keepalive:
+        command.append("-k")
+    packets_fd = None
+    if packets is not None or packet_files:
+        packets_fd, packet_count = _dump_packets(packets, packet_files)
+        command += ["-F", "/proc/self/fd/0"]
+        if packet_count:
+            command += ["-Q", str(packet_count)]
+    command += list(options)
+    command.append(target)
+    return Run(command, packets_fd, filters)
+
+
+def run(target, **kwargs):
+    """ Run wb and wait for it, the arguments are the same as start
+
+    Return the resultparser.WbResult whose return_code is set
+    """
+    return start(target, **kwargs).wait()
+
+
+def wait_all(runs):
+    """ Wait for runs by the calling thread, their outputs are processed
+        as soon as they are available
+
+    Return a list of resultparser.WbResult in the order of runs
+    """
+    pending = [run_ for run_ in runs if run_.fileno() is not None]
+    while pending:
+        readable, _, _ = select.select(pending, [], [])
+        for run_ in readable:
+            if not run_.read():
+                pending.remove(run_)
+    return [run_.wait() for run_ in runs]
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+""" Find the saturation point of the target
+
+This exports:
+    - ramp_levels is a function that generates the load levels.
+    - Step is a class of the result of a load level.
+    - SaturationFinder is a class that ramps the load until
+        the throughput plateaus or the failures rise.
+
+The load is either the concurrency(-c) or the rate limit(-R) of wb.
+Each level is measured by a probe, a run of wb. The ramp stops when
+the throughput hasn't improved for some steps, or when the rate of
+failed requests exceeds a limit. The knee is the lowest level whose
+throughput reaches the maximum throughput within the plateau tolerance,
+beyond it more load only adds latency.
+"""
+
+__all__ = [
+    "ramp_levels",
+    "Step",
+    "SaturationFinder",
+]
+
+import json
+import collections
+
+
+def ramp_levels(start, stop, step):
+    """ Generate the load levels from start to stop(inclusive)
+
+    Arguments:
+        - start, stop: positive integers
+        - step: a string, "N" adds N and "xN" multiplies by N each step
+
+    Return a list of levels
+    """
+    if step.startswith("x"):
+        factor = float(step[1:])
+        if factor <= 1:
+            raise ValueError("the factor of step must be greater than 1")
+        next_level = lambda level: max(level + 1, int(level * factor))
+    else:
+        increment = int(step)
+        if increment <= 0:
+            raise ValueError("step must be positive")
+        next_level = lambda level: level + increment
+    if start <= 0 or stop < start:
+        raise ValueError("invalid range of levels [%s, %s]" % (start, stop))
+    levels = []
+    level = start
+    while level < stop:
+        levels.append(level)
+        level = next_level(level)
+    levels.append(stop)
+    return levels
+
+
+class Step(object):
+    """ The result of a load level
+
+    Arguments:
+        - level: the concurrency or the rate limit
+        - result: the resultparser.WbResult of the probe
+
+    Attributes:
+        - level, result: the same as Arguments
+        - requests_per_second: the throughput
+        - latency: the 99th percentile of the latency in ms,
+            None if it isn't reported
+        - error_rate: the rate of failed requests(connect, receive,
+            length and exceptions), the non-2xx responses aren't errors
+            because the WAF is expected to block requests
+    """
+    def __init__(self, level, result):
+        self.level = level
+        self.result = result
+        self.requests_per_second = result.requests_per_second or 0.0
+        self.latency = result.get_time(result.percentiles.get(99))
+        completed = result.complete_requests or 0
+        failed = (result.failed_requests or 0) + (result.write_errors or 0)
+        self.error_rate = float(failed) / completed if completed else 1.0
+
+    def to_dict(self):
+        return collections.OrderedDict([
+            ("level", self.level),
+            ("requests_per_second", self.requests_per_second),
+            ("latency_p99_ms", self.latency),
+            ("error_rate", self.error_rate),
+        ])
+
+
+class SaturationFinder(object):
+    """ Ramp the load until the throughput plateaus or the failures rise
+
+    Arguments:
+        - probe: a callable, level => resultparser.WbResult of a run
+            at that load
+        - levels: a list of load levels in increasing order,
+            see ramp_levels
+        - dimension: the name of the load, "concurrency" or "rate"
+        - plateau: the relative gain of throughput under which a step
+            doesn't improve the throughput(default = 0.05)
+        - patience: the number of consecutive steps without improvement
+            to stop the ramp(default = 2)
+        - max_error_rate: the rate of failed requests to stop the ramp
+            (default = 0.01)
+
+    Attributes:
+        - steps: a list of Step of the measured levels
+        - knee: the Step of the knee, None if no level is measured
+        - stop_reason: "plateau", "errors" or "end"
+    """
+    def __init__(self, probe, levels, dimension="concurrency",
+                 plateau=0.05, patience=2, max_error_rate=0.01):
+        self._probe = probe
+        self._levels = levels
+        self._plateau = plateau
+        self._patience = patience
+        self._max_error_rate = max_error_rate
+        self.dimension = dimension
+        self.steps = []
+        self.knee = None
+        self.stop_reason = None
+
+    def run(self, report=None):
+        """ Measure the levels until the ramp stops
+
+        Arguments:
+            - report: a callable that receives a line for each step
+                and for the knee
+
+        Return the Step of the knee
+        """
+        best = None
+        stale_steps = 0
+        self.stop_reason = "end"
+        for level in self._levels:
+            step = Step(level, self._probe(level))
+            self.steps.append(step)
+            if report:
+                report(self._format_step("", step))
+            if step.error_rate > self._max_error_rate:
+                self.stop_reason = "errors"
+                break
+            if best is None or step.requests_per_second \
+                    > best.requests_per_second * (1 + self._plateau):
+                best = step
+                stale_steps = 0
+            else:
+                stale_steps += 1
+                if stale_steps >= self._patience:
+                    self.stop_reason = "plateau"
+                    break
+        self.knee = self._find_knee()
+        if report and self.knee:
+            report(self._format_step("Knee(%s) " % (self.stop_reason, ),
+                                     self.knee))
+        return self.knee
+
+    def _find_knee(self):
+        """ The lowest level whose throughput is within the plateau
+            tolerance of the maximum, the failed levels are excluded
+        """
+        steps = [step for step in self.steps
+                 if step.error_rate <= self._max_error_rate]
+        if not steps:
+            return None
+        maximum = max(step.requests_per_second for step in steps)
+        for step in steps:
+            if step.requests_per_second >= maximum * (1 - self._plateau):
+                return step
+
+    def _format_step(self, prefix, step):
+        latency = "%.3f ms" % (step.latency, ) \
+            if step.latency is not None else "unknown"
+        return "%s%s %d: %.2f requests/sec, p99 %s, %.2f%% failed\n" % (
+            prefix, self.dimension.capitalize(), step.level,
+            step.requests_per_second, latency, step.error_rate * 100)
+
+    def to_dict(self):
+        return collections.OrderedDict([
+            ("dimension", self.dimension),
+            ("stop_reason", self.stop_reason),
+            ("knee", self.knee.to_dict() if self.knee else None),
+            ("curve", [step.to_dict() for step in self.steps]),
+        ])
+
+    def to_json(self, **kwargs):
+        """ Serialize the knee and the curve to JSON """
+        return json.dumps(self.to_dict(), **kwargs)
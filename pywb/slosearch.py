@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+""" Search the maximum throughput under an SLO
+
+This exports:
+    - Trial is a class of the result of a run at a rate.
+    - Point is a class of the trials of a rate.
+    - SloSearch is a class that searches the highest rate
+        that meets the SLO.
+
+The SLO is a limit of the 99th percentile latency and a limit of the
+rate of failed requests. The offered load is the rate limit(-R) of wb.
+The search doubles(or halves) the rate until the SLO is met by one rate
+and missed by another, then bisects the bracket until it's narrower
+than the precision. Each rate is run for some trials, the latency of a
+trial is the 99th percentile of the histogram of its requests, which
+leaves out the requests of its first seconds(the warmup), and a rate
+meets the SLO if the mean of its trials does.
+"""
+
+__all__ = [
+    "Trial",
+    "Point",
+    "SloSearch",
+]
+
+import json
+import collections
+
+import saturation
+import confidence
+
+
+class Trial(saturation.Step):
+    """ The result of a run at a rate
+
+    Arguments:
+        - rate: the rate limit
+        - result: the resultparser.WbResult of the run
+        - histogram_: the histogram.Histogram of the total times of
+            the requests after the warmup, None if it's unknown
+
+    Attributes:
+        - the same as saturation.Step, but the latency is computed
+            from histogram_, or it's the one of the summary
+            if histogram_ is empty
+    """
+    def __init__(self, rate, result, histogram_=None):
+        super(Trial, self).__init__(rate, result)
+        if histogram_ is not None and histogram_.total_count:
+            self.latency = result.get_time(
+                float(histogram_.value_at_percentile(99)))
+
+
+class Point(object):
+    """ The trials of a rate
+
+    Arguments:
+        - rate: the rate limit
+        - trials: a list of Trial
+
+    Attributes:
+        - rate, trials: the same as Arguments
+        - latency: the mean of the 99th percentile latencies in ms,
+            None if a trial doesn't report it
+        - latency_margin: the half width of the 95% confidence interval
+            of latency
+        - error_rate, requests_per_second: the means of the trials
+        - passed: a flag means that the point meets the SLO,
+            it's set by SloSearch
+    """
+    def __init__(self, rate, trials):
+        self.rate = rate
+        self.trials = trials
+        latencies = [trial.latency for trial in trials]
+        if None in latencies:
+            self.latency, self.latency_margin = None, None
+        else:
+            self.latency, self.latency_margin = \
+                confidence.mean_margin(latencies)
+        self.error_rate = confidence.mean_margin(
+            [trial.error_rate for trial in trials])[0]
+        self.requests_per_second = confidence.mean_margin(
+            [trial.requests_per_second for trial in trials])[0]
+        self.passed = False
+
+    def to_dict(self):
+        return collections.OrderedDict([
+            ("rate", self.rate),
+            ("passed", self.passed),
+            ("requests_per_second", self.requests_per_second),
+            ("latency_p99_ms", self.latency),
+            ("latency_p99_margin_ms", self.latency_margin),
+            ("error_rate", self.error_rate),
+            ("trials", [trial.to_dict() for trial in self.trials]),
+        ])
+
+
+class SloSearch(object):
+    """ Search the highest rate that meets the SLO
+
+    Arguments:
+        - probe: a callable, rate => (resultparser.WbResult,
+            histogram.Histogram) of a run at that rate limit, the
+            histogram leaves out the requests of the warmup of the run
+        - max_latency: the limit of the 99th percentile latency in ms
+        - max_error_rate: the limit of the rate of failed requests
+        - start_rate: the first rate to run
+        - max_rate: the highest rate to run, None means no limit
+        - trials: the number of runs of each rate(default = 3)
+        - precision: the search stops when the bracket is narrower than
+            this ratio of its lower rate(default = 0.05)
+
+    Attributes:
+        - points: a list of Point of the measured rates in order
+        - best: the Point of the highest rate that meets the SLO,
+            None if no rate meets it
+        - limit: the Point of the lowest rate that misses the SLO,
+            None if no rate misses it,
+            the maximum rate under the SLO is in [best.rate, limit.rate)
+    """
+    def __init__(self, probe, max_latency, max_error_rate, start_rate,
+                 max_rate=None, trials=3, precision=0.05):
+        if start_rate <= 0 or trials <= 0:
+            raise ValueError("the start rate and trials must be positive")
+        self._probe = probe
+        self._max_latency = max_latency
+        self._max_error_rate = max_error_rate
+        self._start_rate = start_rate
+        self._max_rate = max_rate
+        self._trials = trials
+        self._precision = precision
+        self.points = []
+        self.best = None
+        self.limit = None
+
+    def _measure(self, rate):
+        trials = []
+        for _ in range(self._trials):
+            result, histogram_ = self._probe(rate)
+            trials.append(Trial(rate, result, histogram_))
+        point = Point(rate, trials)
+        point.passed = point.latency is not None \
+            and point.latency <= self._max_latency \
+            and point.error_rate <= self._max_error_rate
+        self.points.append(point)
+        return point
+
+    def _next_rate(self, rate):
+        """ The next rate to run, None if the search is finished """
+        if self.best is None:
+            # no rate meets the SLO yet
+            return rate // 2 or None
+        if self.limit is None:
+            # no rate misses the SLO yet
+            if self._max_rate is not None and rate >= self._max_rate:
+                return None
+            rate *= 2
+            if self._max_rate is not None:
+                rate = min(rate, self._max_rate)
+            return rate
+        if self.limit.rate - self.best.rate \
+                <= max(1, self.best.rate * self._precision):
+            return None
+        return (self.best.rate + self.limit.rate) // 2
+
+    def run(self, report=None):
+        """ Search until the bracket is narrow enough
+
+        Arguments:
+            - report: a callable that receives a line for each rate
+                and for the result
+
+        Return the Point of the highest rate that meets the SLO
+        """
+        rate = self._start_rate
+        while rate is not None:
+            point = self._measure(rate)
+            if point.passed:
+                self.best = point
+            else:
+                self.limit = point
+            if report:
+                report(self._format_point("", point))
+            rate = self._next_rate(rate)
+        if report:
+            if self.best is None:
+                report("No rate meets the SLO\n")
+            else:
+                report(self._format_point("Max ", self.best))
+                report("The maximum rate under the SLO is in [%d, %s)\n" % (
+                    self.best.rate,
+                    self.limit.rate if self.limit else "unknown"))
+        return self.best
+
+    def _format_point(self, prefix, point):
+        latency = "%.3f ms(+/-%.3f)" % (point.latency, point.latency_margin) \
+            if point.latency is not None else "unknown"
+        return "%sRate %d: %.2f requests/sec, p99 %s, %.2f%% failed, %s\n" % (
+            prefix, point.rate, point.requests_per_second, latency,
+            point.error_rate * 100, "pass" if point.passed else "fail")
+
+    def to_dict(self):
+        return collections.OrderedDict([
+            ("max_latency_ms", self._max_latency),
+            ("max_error_rate", self._max_error_rate),
+            ("best", self.best.to_dict() if self.best else None),
+            ("limit", self.limit.rate if self.limit else None),
+            ("points", [point.to_dict() for point in self.points]),
+        ])
+
+    def to_json(self, **kwargs):
+        """ Serialize the result and the points to JSON """
+        return json.dumps(self.to_dict(), **kwargs)
@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+""" Time series of the progress of wb
+
+This exports:
+    - parse_progress is a function that parses a progress line of wb.
+    - merge_points is a function that merges the intervals of
+        the progress lines of workers.
+    - TimeSeries is an output filter that records the progress lines
+        into a ring buffer and a JSON lines file.
+    - MetricsServer is a class that exposes a TimeSeries over HTTP.
+
+wb prints a progress line each interval(-j). The simple line only has
+the completed requests and the rate, the extended line(-5) also has
+the received and sent kBps, the latency(min/max/mean/sd) and the failed
+requests of the interval. An interval without completed requests has
+no latency, wb prints its minimum as the initial AB_MAX. The lines of
+the workers(--workers) are merged into one interval. The server
+responds /metrics in the text format of Prometheus with the latest
+interval and the totals, and /series with the intervals in the ring
+buffer as JSON lines.
+"""
+
+__all__ = [
+    "parse_progress",
+    "merge_points",
+    "TimeSeries",
+    "MetricsServer",
+]
+
+import re
+import json
+import math
+import time
+import threading
+import collections
+import BaseHTTPServer
+
+import outputfilter
+
+
+_SIMPLE_PATTERN = re.compile(
+    r"^\s*(\d+): Completed\s+(\d+) requests, rate is (\d+) #/sec")
+# Time Req(#/sec) Recv(kBps) [Sent(kBps)]
+#   Latency(min/max/mean/sd) Failed[(C/R/L/E/W/Non-2xx)]
+_EXTENDED_PATTERN = re.compile(
+    r"^(\d+)\s+(\d+)\s+(\d+)\s+(?:(\d+)\s+)?"
+    r"(\d+)\s*/(\d+)\s*/(\d+)\s*/([\d.]+)\s*/(\d+)"
+    r"(?:\((\d+)/(\d+)/(\d+)/(\d+)/(\d+)/(\d+)\))?\s*$")
+_FAILURES = ("connect", "receive", "length", "exceptions", "write",
+             "non_2xx")
+# the minimum latency of an interval without completed requests
+_AB_MAX = 0x7fffffffffffffff
+
+
+def parse_progress(line, time_unit="us"):
+    """ Parse a progress line of wb
+
+    Arguments:
+        - line: a line of the output of wb
+        - time_unit: the unit of the latency of wb, "us" or "ms"(-3)
+
+    Return an OrderedDict of the interval, None if line isn't
+        a progress line. The latency is converted to ms, and the fields
+        that the line doesn't have are None, so is the latency of
+        an interval without completed requests
+    """
+    point = collections.OrderedDict([
+        ("interval", None),
+        ("time", None),
+        ("requests_per_second", None),
+        ("completed", None),
+        ("received_kbps", None),
+        ("sent_kbps", None),
+        ("latency_min_ms", None),
+        ("latency_max_ms", None),
+        ("latency_mean_ms", None),
+        ("latency_sd_ms", None),
+        ("failed", None),
+        ("failures", None),
+    ])
+    match = _SIMPLE_PATTERN.match(line)
+    if match:
+        point["interval"] = int(match.group(1))
+        point["completed"] = int(match.group(2))
+        point["requests_per_second"] = int(match.group(3))
+        return point
+    match = _EXTENDED_PATTERN.match(line)
+    if not match:
+        return None
+    scale = 1000.0 if time_unit == "us" else 1.0
+    point["interval"] = int(match.group(1))
+    point["requests_per_second"] = int(match.group(2))
+    point["received_kbps"] = int(match.group(3))
+    if match.group(4) is not None:
+        point["sent_kbps"] = int(match.group(4))
+    if int(match.group(5)) != _AB_MAX:
+        point["latency_min_ms"] = int(match.group(5)) / scale
+        point["latency_max_ms"] = int(match.group(6)) / scale
+        point["latency_mean_ms"] = int(match.group(7)) / scale
+        point["latency_sd_ms"] = float(match.group(8)) / scale
+    point["failed"] = int(match.group(9))
+    if match.group(10) is not None:
+        point["failures"] = collections.OrderedDict(
+            (reason, int(count))
+            for reason, count in zip(_FAILURES, match.groups()[9:]))
+    return point
+
+
+def _add(values):
+    values = [value for value in values if value is not None]
+    return sum(values) if values else None
+
+
+def merge_points(points):
+    """ Merge the points of the same interval of workers
+
+    The rates, the completed and the failed requests are added up,
+    the mean and the sd of the latency are pooled by the rates, which
+    are proportional to the requests of the interval
+
+    Return the merged OrderedDict, see parse_progress
+    """
+    merged = collections.OrderedDict(points[0])
+    for field in ("requests_per_second", "completed", "received_kbps",
+                  "sent_kbps", "failed"):
+        merged[field] = _add(point[field] for point in points)
+    merged["time"] = max(point["time"] for point in points)
+    failures = [point["failures"] for point in points
+                if point["failures"] is not None]
+    merged["failures"] = collections.OrderedDict(
+        (reason, sum(failure[reason] for failure in failures))
+        for reason in _FAILURES) if failures else None
+    timed = [point for point in points
+             if point["latency_mean_ms"] is not None]
+    for field in ("latency_min_ms", "latency_max_ms",
+                  "latency_mean_ms", "latency_sd_ms"):
+        merged[field] = None
+    if not timed:
+        return merged
+    merged["latency_min_ms"] = min(point["latency_min_ms"]
+                                   for point in timed)
+    merged["latency_max_ms"] = max(point["latency_max_ms"]
+                                   for point in timed)
+    # the rate of an interval with a few requests may be rounded to 0
+    weights = [point["requests_per_second"] or 1 for point in timed]
+    count = float(sum(weights))
+    mean = sum(weight * point["latency_mean_ms"]
+               for weight, point in zip(weights, timed)) / count
+    squares = sum(weight * (point["latency_sd_ms"] ** 2
+                            + (point["latency_mean_ms"] - mean) ** 2)
+                  for weight, point in zip(weights, timed))
+    merged["latency_mean_ms"] = mean
+    merged["latency_sd_ms"] = math.sqrt(squares / count)
+    return merged
+
+
+class TimeSeries(outputfilter.OutputFilter):
+    """ Record the progress lines of wb
+
+    Arguments:
+        - capacity: the number of the latest intervals
+            kept in the ring buffer(default = 3600)
+        - jsonl_file: the path of the JSON lines file that
+            every interval is appended to, None means not to save
+        - time_unit: the unit of the latency of wb, see parse_progress
+        - workers: the number of the workers whose lines of
+            an interval are merged into one, see merge_points.
+            An interval is recorded when all workers have reported it,
+            or a later interval is complete, or at close
+
+    Attributes:
+        - failed_requests: the total of failed requests
+        - failures: a dict, the totals of failed requests by reason
+    """
+    def __init__(self, capacity=3600, jsonl_file=None, time_unit="us",
+                 workers=1):
+        self._points = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._time_unit = time_unit
+        self._workers = workers
+        # interval => the points of the workers
+        self._pending = collections.OrderedDict()
+        self._jsonl = open(jsonl_file, "a") if jsonl_file else None
+        self.failed_requests = 0
+        self.failures = collections.OrderedDict(
+            (reason, 0) for reason in _FAILURES)
+
+    def __call__(self, line):
+        if line is None:
+            return None
+        point = parse_progress(line, self._time_unit)
+        if point is None:
+            return line
+        point["time"] = time.time()
+        interval = point["interval"]
+        self._pending.setdefault(interval, []).append(point)
+        if len(self._pending[interval]) >= self._workers:
+            # the earlier intervals that some workers missed are recorded
+            while self._pending:
+                current, points = self._pending.popitem(last=False)
+                self._record(merge_points(points))
+                if current == interval:
+                    break
+        return line
+
+    def _record(self, point):
+        with self._lock:
+            self._points.append(point)
+            self.failed_requests += point["failed"] or 0
+            for reason, count in (point["failures"] or {}).items():
+                self.failures[reason] += count
+        if self._jsonl:
+            self._jsonl.write(json.dumps(point) + "\n")
+            self._jsonl.flush()
+
+    @property
+    def points(self):
+        """ A list of the intervals in the ring buffer """
+        with self._lock:
+            return list(self._points)
+
+    def to_prometheus(self):
+        """ Render the latest interval and the totals
+            in the text format of Prometheus
+        """
+        with self._lock:
+            latest = self._points[-1] if self._points else None
+            failed_requests = self.failed_requests
+            failures = list(self.failures.items())
+        lines = []
+
+        def metric(name, type_, help_, samples):
+            samples = [(labels, value) for labels, value in samples
+                       if value is not None]
+            if not samples:
+                return
+            lines.append("# HELP %s %s" % (name, help_))
+            lines.append("# TYPE %s %s" % (name, type_))
+            for labels, value in samples:
+                lines.append("%s%s %s" % (name, labels, value))
+        latest = latest or {}
+        metric("pywb_interval", "gauge", "The number of the last interval",
+               [("", latest.get("interval"))])
+        metric("pywb_requests_per_second", "gauge",
+               "The requests per second of the last interval",
+               [("", latest.get("requests_per_second"))])
+        metric("pywb_completed_requests", "gauge",
+               "The completed requests until the last interval",
+               [("", latest.get("completed"))])
+        metric("pywb_received_kbps", "gauge",
+               "The received kBps of the last interval",
+               [("", latest.get("received_kbps"))])
+        metric("pywb_sent_kbps", "gauge",
+               "The sent kBps of the last interval",
+               [("", latest.get("sent_kbps"))])
+        metric("pywb_latency_ms", "gauge",
+               "The latency of the requests of the last interval",
+               [('{stat="%s"}' % (stat, ), latest.get("latency_%s_ms"
+                                                      % (stat, )))
+                for stat in ("min", "max", "mean", "sd")])
+        if latest.get("failed") is not None:
+            metric("pywb_failed_requests_total", "counter",
+                   "The failed requests",
+                   [("", failed_requests)])
+            metric("pywb_failures_total", "counter",
+                   "The failed requests by reason",
+                   [('{reason="%s"}' % (reason, ), count)
+                    for reason, count in failures])
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        """ Record the pending intervals and close the JSON lines file """
+        while self._pending:
+            self._record(merge_points(self._pending.popitem(last=False)[1]))
+        if self._jsonl:
+            self._jsonl.close()
+            self._jsonl = None
+
+
+class _MetricsHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def do_GET(self):
+        series = self.server.series
+        if self.path == "/metrics":
+            body = series.to_prometheus()
+            content_type = "text/plain; version=0.0.4"
+        elif self.path == "/series":
+            body = "".join(json.dumps(point) + "\n"
+                           for point in series.points)
+            content_type = "application/x-ndjson"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format_, *args):
+        # the output of wb isn't mixed with the access log
+        pass
+
+
+class MetricsServer(object):
+    """ Expose a TimeSeries over HTTP by a daemon thread
+
+    Arguments:
+        - series: the TimeSeries
+        - port: the port to listen, 0 means any free port
+        - host: the address to listen(default = "127.0.0.1")
+
+    Attributes:
+        - address: the (host, port) that the server listens
+    """
+    def __init__(self, series, port, host="127.0.0.1"):
+        self._httpd = BaseHTTPServer.HTTPServer((host, port),
+                                                _MetricsHandler)
+        self._httpd.series = series
+        self.address = self._httpd.server_address
+        self._thread = threading.Thread(target=self._httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
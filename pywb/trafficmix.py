@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+""" Weighted traffic mix
+
+This exports:
+    - AliasSampler is a class that samples indexes by their weights
+        in constant time.
+    - TrafficMix is a class that generates a packet stream of any length
+        whose sources match the weights of a mix.
+    - load_mix is a function that reads a mix specification file.
+
+A mix specification is a YAML mapping from sources to weights, e.g.
+    benign/: 95
+    sqli.yaml: 5
+a source is a path that packetsloader supports, a relative path is
+relative to the specification file. Weights are non-negative numbers
+and needn't sum to 100.
+"""
+
+__all__ = [
+    "AliasSampler",
+    "TrafficMix",
+    "load_mix",
+]
+
+import os
+import random
+
+import yaml
+
+import packetsloader
+
+
+class AliasSampler(object):
+    """ Sample indexes by their weights with Vose's alias method
+
+    Building the tables is O(n), and a sample costs one random number.
+
+    Arguments:
+        - weights: a list of non-negative numbers, not all zero
+        - random_: a random.Random to draw samples(default = a new one)
+
+    Attributes:
+        - _probabilities: a list, the probability to keep the index
+            of each column of the table
+        - _aliases: a list, the other index of each column
+    """
+    def __init__(self, weights, random_=None):
+        weights = [float(weight) for weight in weights]
+        if not weights or any(weight < 0 for weight in weights) \
+                or not sum(weights):
+            raise ValueError(
+                "weights must be non-negative and not all zero")
+        self._random = random_ or random.Random()
+        count = len(weights)
+        total = sum(weights)
+        scaled = [weight * count / total for weight in weights]
+        self._probabilities = [1.0] * count
+        self._aliases = range(count)
+        small = [i for i, value in enumerate(scaled) if value < 1.0]
+        large = [i for i, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            self._probabilities[less] = scaled[less]
+            self._aliases[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+        # the rest are 1.0 up to the rounding errors
+
+    def sample(self):
+        """ Return an index drawn by the weights """
+        value = self._random.random() * len(self._probabilities)
+        index = int(value)
+        if value - index < self._probabilities[index]:
+            return index
+        return self._aliases[index]
+
+    def generate(self, count):
+        """ Generate count indexes drawn by the weights """
+        random_ = self._random.random
+        probabilities = self._probabilities
+        aliases = self._aliases
+        column_count = len(probabilities)
+        for _ in xrange(count):
+            value = random_() * column_count
+            index = int(value)
+            if value - index < probabilities[index]:
+                yield index
+            else:
+                yield aliases[index]
+
+
+class TrafficMix(object):
+    """ Generate packets from sources by their weights
+
+    The source of each packet is drawn by the weights,
+    and the packets of a source are sent in turn.
+
+    Arguments:
+        - sources: a list of (path, weight), the path is a file or
+            a directory that packetsloader supports
+        - seed: the seed of the draws,
+            None means the stream isn't reproducible(default = None)
+
+    Attributes:
+        - sources: the same as Arguments
+        - _packets: a list of the packet lists of sources
+        - _sampler: the AliasSampler of sources
+    """
+    def __init__(self, sources, seed=None):
+        self.sources = list(sources)
+        self._packets = []
+        for path_, _ in self.sources:
+            packets = list(packetsloader.load_packets_from_paths(path_))
+            if not packets:
+                raise ValueError("%s has no packets" % (path_, ))
+            self._packets.append(packets)
+        self._sampler = AliasSampler(
+            [weight for _, weight in self.sources], random.Random(seed))
+
+    def generate(self, count):
+        """ Generate count packets """
+        packets = self._packets
+        positions = [0] * len(packets)
+        for index in self._sampler.generate(count):
+            source_packets = packets[index]
+            position = positions[index]
+            yield source_packets[position]
+            position += 1
+            positions[index] = position if position < len(source_packets) \
+                else 0
+
+
+def load_mix(file_):
+    """ Read a mix specification file
+
+    Arguments:
+        - file_: a string, the path of a YAML mapping from sources
+            to weights
+
+    Return a list of (path, weight) sorted by path,
+        so that the draws of a seed don't depend on the order of the file
+    """
+    with open(file_, "r") as fd:
+        spec = yaml.safe_load(fd)
+    if not isinstance(spec, dict) or not spec:
+        raise ValueError("%s isn't a mapping from sources to weights" % (
+            file_, ))
+    base_dir = os.path.dirname(os.path.abspath(file_))
+    sources = []
+    for path_, weight in spec.items():
+        if isinstance(weight, bool) \
+                or not isinstance(weight, (int, long, float)):
+            raise ValueError("the weight of %s isn't a number" % (path_, ))
+        sources.append((
+            os.path.join(base_dir, os.path.expanduser(str(path_))),
+            weight))
+    return sorted(sources)
@@ -1,5 +1,8 @@
 import BaseHTTPServer
 import threading
+import tempfile
+import stat
+import sys
 import os
 
 
@@ -24,3 +27,73 @@ class HTTPServerInstance(object):
 _HOME_DIR = os.path.join(os.path.dirname(__file__), os.path.pardir)
 _DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
 
+
+_FAKE_WB = """#!%s
+import sys
+import getopt
+
+options, hosts = getopt.getopt(sys.argv[1:], "c:n:t:F:Q:g:kR:W:")
+options = dict(options)
+concurrency = int(options["-c"])
+requests = int(options["-n"])
+print("worker -c %%d -n %%d -Q %%s -R %%s" %% (
+    concurrency, requests, options.get("-Q"), options.get("-R")))
+# -n is the passes over the packets of -F like wb
+if "-F" in options and "-Q" in options:
+    requests *= int(options["-Q"])
+for second in (1, 2):
+    sys.stderr.write("%%2d: Completed %%6d requests, rate is %%d #/sec.\\n"
+                     %% (second, requests * second // 2, requests))
+sys.stderr.flush()
+if "-F" in options:
+    print("packets %%d bytes" %% (len(open(options["-F"], "rb").read()), ))
+if "-g" in options:
+    with open(options["-g"], "w") as fd:
+        fd.write("starttime\\tseconds\\tctime\\tdtime\\tttime\\twait\\n")
+        for i in range(requests):
+            fd.write("Mon Jan  1 00:00:00 2018\\t1514764800\\t%%d\\t%%d\\t%%d\\t%%d\\n"
+                     %% (concurrency, i * 10, concurrency + i * 10, i * 5))
+print(\"\"\"Server Software:        fake
+Server Hostname:        localhost
+Server Port:            80
+
+Document Path:          /
+Document Length:        Variable
+
+Concurrency Level:      %%d
+Time taken for tests:   1.000 seconds
+Complete requests:      %%d
+Failed requests:        1
+   (Connect: 0, Receive: 1, Length: 0, Exceptions: 0)
+Non-2xx responses:      1
+403 responses: 1
+Total transferred:      1000 bytes
+HTML transferred:       500 bytes
+Requests per second:    %%d.50 [#/sec] (mean)
+Time per request:       1.000 [ms] (mean)
+Transfer rate:          1.00 [Kbytes/sec] received
+Total samples of stats: %%d
+Connection Times (us)
+              min  mean[+/-sd] median   max
+Connect:        0    0   0.0      0       0
+Processing:     0    0   0.0      0       0
+Waiting:        0    0   0.0      0       0
+Total:          0    0   0.0      0       0
+
+Percentage of the requests served within a certain time (us)
+ 100%%%%      0 (longest request)\"\"\" %% (concurrency, requests, requests, requests))
+"""
+
+
+class FakeWb(object):
+    """ A script that parses the options of wb like wb, writes a sample
+        per request to the file of -g and prints a summary
+    """
+    def __enter__(self):
+        fd, self._path = tempfile.mkstemp(suffix=".py")
+        with os.fdopen(fd, "w") as fake_fd:
+            fake_fd.write(_FAKE_WB % (sys.executable, ))
+        os.chmod(self._path, stat.S_IRWXU)
+        return self._path
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        os.remove(self._path)
@@ -1,10 +1,11 @@
 import os
 import uuid
-import filecmp
 import BaseHTTPServer
 import threading
 import functools
 
+import pywb
+
 from ftw_compatible_tool import base
 from ftw_compatible_tool import context
 from ftw_compatible_tool import broker
@@ -59,13 +60,37 @@ def test_load_and_gen_packets():
         os.path.dirname(__file__), "data", "packets.yaml")
     bs._load_yaml_tests(packets_yaml)
     bs._gen_requests()
-    packets_pkt = conf.pkt_path
+    packets_pkt = bs._packets_path()
     expect_pkt = os.path.join(
         os.path.dirname(__file__), "data", "packets.pkt")
-    assert(filecmp.cmp(packets_pkt, expect_pkt))
+    # the two tests build the same request, it's sent once
+    assert(list(pywb.packetsloader.load_packets_from_paths(packets_pkt))
+           == list(pywb.packetsloader.load_packets_from_paths(
+               expect_pkt))[:3])
     uuid.uuid1 = old_uuid1
 
 
+def test_gen_unique_packets():
+    ctx = context.Context(broker.Broker(), traffic.Delimiter("magic"))
+    ctx.broker.subscribe(broker.TOPICS.WARNING, warning_as_error)
+    conf = base.BaseConf()
+    bs = base.Base(ctx, conf)
+    database.Sqlite3DB(ctx)
+    packets_yaml = os.path.join(
+        os.path.dirname(__file__), "data", "packets.yaml")
+    # the same tests are loaded twice
+    bs._load_yaml_tests(packets_yaml)
+    bs._load_yaml_tests(packets_yaml)
+    bs._gen_requests()
+    pywb_packets = list(pywb.packetsloader.load_packets_from_paths(
+        bs._packets_path()))
+    yaml_packets = list(pywb.packetsloader.load_packets_from_paths(
+        packets_yaml))
+    # each unique request is between two delimiters
+    assert(len(pywb_packets) == len(set(yaml_packets)) * 3)
+    assert(sorted(pywb_packets[1::3]) == sorted(set(yaml_packets)))
+
+
 def test_start_experiment():
     counter = {
         "request" : 0,
@@ -0,0 +1,143 @@
+import os
+import threading
+
+from pywb import cluster
+from pywb import timeseries
+
+import common
+
+
+def test_coordinate_agents():
+    packet_file = os.path.join(common._DATA_DIR, "packets.pkt")
+    coordinator = cluster.Coordinator(
+        ("127.0.0.1", 0), 2,
+        ["wb", "-c", "5", "-n", "10", "-R", "1k", "-F", packet_file,
+         "localhost"], timeout=10)
+    agent_lines = []
+    with common.FakeWb() as fake_wb:
+        agents = [cluster.Agent(coordinator.address, fake_wb, workers)
+                  for workers in (1, 2)]
+        threads = [threading.Thread(target=agent.run,
+                                    args=([agent_lines.append], ))
+                   for agent in agents]
+        for thread in threads:
+            thread.start()
+        lines = []
+        assert(coordinator.run([lines.append]) == 0)
+        for thread in threads:
+            thread.join()
+
+    # -c, -R and the packets are split among agents,
+    # and then among the workers of an agent
+    workers = [line.split()[1:] for line in agent_lines
+               if line.startswith("worker")]
+    assert(len(workers) == 3)
+    for option, total in [("-c", 5), ("-Q", 6), ("-R", 1000)]:
+        index = workers[0].index(option) + 1
+        assert(sum(int(worker[index]) for worker in workers) == total)
+    # -n is the passes over each shard, like a single wb over all packets
+    assert([worker[worker.index("-n") + 1] for worker in workers]
+           == ["10"] * 3)
+    # the progress of each second is merged
+    assert(coordinator.timeline == {1: (30, 60), 2: (60, 60)})
+    assert(lines[0] == " 1: Completed     30 requests, rate is 60 #/sec.\n")
+    result = coordinator.result
+    assert(result.concurrency == 5)
+    # 10 passes over 6 packets
+    assert(result.complete_requests == 60)
+    assert(result.samples == 60)
+    assert(result.percentiles[100] == result.connection_times["total"]["max"])
+    # the histograms of agents are merged
+    assert(coordinator.histogram.total_count == 60)
+    assert(coordinator.histogram.value_at_percentile(100)
+           == result.percentiles[100])
+    assert("Complete requests:      60\n" in lines)
+
+
+def test_cluster_token():
+    coordinator = cluster.Coordinator(
+        ("127.0.0.1", 0), 1, ["wb", "-n", "2", "localhost"], timeout=10,
+        token="secret")
+    assert(coordinator.address[0] == "127.0.0.1")
+    agent_lines = []
+    with common.FakeWb() as fake_wb:
+        # the agent with a different token is dropped
+        intruder = cluster.Agent(coordinator.address, fake_wb, token="guess")
+        agent = cluster.Agent(coordinator.address, fake_wb, token="secret")
+        intruder_thread = threading.Thread(target=intruder.run)
+        intruder_thread.start()
+        intruder_thread.join(0.5)
+        thread = threading.Thread(target=agent.run,
+                                  args=([agent_lines.append], ))
+        thread.start()
+        assert(coordinator.run([]) == 0)
+        thread.join()
+        intruder_thread.join()
+    assert(intruder.result is None)
+    assert(coordinator.result.complete_requests == 2)
+    assert([line for line in agent_lines if line.startswith("worker")])
+
+
+def test_coordinate_agents_with_metrics():
+    # --metrics-port and --metrics-jsonl add -5
+    coordinator = cluster.Coordinator(
+        ("127.0.0.1", 0), 1, ["wb", "-5", "-n", "4", "localhost"],
+        timeout=10)
+    series = timeseries.TimeSeries()
+    with common.FakeWb() as fake_wb:
+        agent = cluster.Agent(coordinator.address, fake_wb)
+        thread = threading.Thread(target=agent.run)
+        thread.start()
+        assert(coordinator.run([series]) == 0)
+        thread.join()
+    series.close()
+    # the agents print the simple progress, which is merged
+    assert(coordinator.timeline == {1: (2, 4), 2: (4, 4)})
+    assert([(point["interval"], point["completed"])
+            for point in series.points] == [(1, 2), (2, 4)])
+
+
+def test_agent_arguments():
+    cluster._check_agent_arguments(
+        ["-c", "5", "-k", "-H", "Host: a", "-Q", "3", "localhost"])
+    for arguments in (["-o", "responses.txt", "localhost"],
+                      ["-g", "samples.tsv", "localhost"],
+                      ["-F", "/etc/passwd", "localhost"],
+                      ["-p", "post.txt", "localhost"],
+                      ["-kq", "localhost"],
+                      ["-c", "5"],
+                      ["localhost", "-c", "5"]):
+        try:
+            cluster._check_agent_arguments(arguments)
+            assert(False)
+        except ValueError:
+            pass
+    # the coordinator refuses them before agents register
+    try:
+        cluster.Coordinator(("127.0.0.1", 0), 1,
+                            ["wb", "-p", "post.txt", "localhost"])
+        assert(False)
+    except ValueError:
+        pass
+
+
+def test_agent_authenticates_coordinator():
+    coordinator = cluster.Coordinator(
+        ("127.0.0.1", 0), 1, ["wb", "-n", "2", "localhost"], timeout=1,
+        token="guess")
+    errors = []
+    def run_agent():
+        try:
+            cluster.Agent(coordinator.address, "wb", token="secret").run()
+        except IOError as error:
+            errors.append(error)
+    thread = threading.Thread(target=run_agent)
+    thread.start()
+    try:
+        coordinator.run([])
+        assert(False)
+    except IOError:
+        # no agent is authenticated in time
+        pass
+    thread.join()
+    assert(str(errors[0]) == "the coordinator isn't authenticated")
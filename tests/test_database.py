@@ -1,3 +1,6 @@
+import os
+import sqlite3
+import tempfile
 import collections
 
 from ftw_compatible_tool import database
@@ -18,7 +21,8 @@ def test_database_create():
                     "input", "output",
                     "request", "raw_request",
                     "raw_response", "raw_log",
-                    "testing_result", "duration_time")
+                    "testing_result", "duration_time",
+                    "request_hash")
     assert(len(expect_titles) == len(r.title()))
     for title in expect_titles:
         assert(title in r.title())
@@ -85,3 +89,65 @@ def test_sql():
     assert(data["testing_result"] == None)
 
 
+def test_shared_request():
+    ctx = context.Context(broker.Broker())
+    db = database.Sqlite3DB(ctx)
+    for traffic_id, request in [
+            ("id_1", "request_a"), ("id_2", "request_b"),
+            ("id_3", "request_a")]:
+        db.query(sql.SQL_INSERT_REQUEST, traffic_id, traffic_id,
+                 "meta_data", "file_path", "input_data", "output_data",
+                 request)
+
+    # the raw data of a request is shared by its traffics
+    db.query(sql.SQL_INSERT_RAW_TRAFFIC,
+             "raw_request", "raw_response", 0.1, "id_3")
+    db.query(sql.SQL_INSERT_LOG, "raw_log", "id_3")
+    result = db.query(sql.SQL_QUERY_RESULT)
+    rows = dict((row[0], row) for row in result)
+    for traffic_id in ["id_1", "id_3"]:
+        assert(rows[traffic_id][3:]
+               == ("raw_request", "raw_response", "raw_log"))
+    assert(rows["id_2"][3:] == (None, None, None))
+
+
+def test_migrate_request_hash():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        # the schema before the requests were hashed
+        connector = sqlite3.connect(path)
+        connector.executescript('''
+            CREATE TABLE Traffic (
+                traffic_id TEXT PRIMARY KEY,
+                test_title TEXT NOT NULL,
+                meta TEXT,
+                file TEXT,
+                input TEXT,
+                output TEXT,
+                request BLOB,
+                raw_request BLOB,
+                raw_response BLOB,
+                raw_log TEXT,
+                testing_result TEXT,
+                duration_time REAL
+            );
+            CREATE INDEX idx_title on Traffic(test_title);
+            INSERT INTO Traffic (traffic_id, test_title, request)
+                VALUES ("id_1", "id_1", "request_a");
+        ''')
+        connector.close()
+
+        ctx = context.Context(broker.Broker())
+        db = database.Sqlite3DB(ctx, path)
+        db.query(sql.SQL_INSERT_REQUEST, "id_2", "id_2", "meta_data",
+                 "file_path", "input_data", "output_data", "request_a")
+        # the old request is hashed, so it shares the raw data
+        db.query(sql.SQL_INSERT_RAW_TRAFFIC,
+                 "raw_request", "raw_response", 0.1, "id_2")
+        rows = dict((row[0], row) for row in db.query(sql.SQL_QUERY_RESULT))
+        assert(rows["id_1"][3:5] == ("raw_request", "raw_response"))
+        # a migrated database isn't migrated again
+        database.Sqlite3DB(context.Context(broker.Broker()), path)
+    finally:
+        os.remove(path)
@@ -0,0 +1,49 @@
+import os
+
+from pywb import fanout
+
+import common
+
+
+def test_split_count():
+    assert(fanout.split_count(10, 3) == [3, 3, 4])
+    assert(fanout.split_count(4, 4) == [1, 1, 1, 1])
+
+
+def test_fan_out():
+    packet_file = os.path.join(common._DATA_DIR, "packets.pkt")
+    with common.FakeWb() as fake_wb:
+        lines = []
+        fan_out = fanout.FanOut(
+            [fake_wb, "-k", "-c", "4", "-n", "6", "-F", packet_file,
+             "localhost"], 2)
+        assert(fan_out.run([lines.append]) == 0)
+
+    # concurrency and packets are split, -n is the passes over each shard
+    assert(lines.count("worker -c 2 -n 6 -Q 3 -R None\n") == 2)
+    result = fan_out.result
+    assert(result.concurrency == 4)
+    assert(result.complete_requests == 36)
+    assert(result.requests_per_second == 37.0)
+    assert(result.failures["receive"] == 2)
+    assert(result.status_codes == {403: 2})
+    # latencies are computed from the samples of all workers
+    assert(result.samples == 36)
+    assert(result.connection_times["total"]["mean"] == 87)
+    assert(result.connection_times["total"]["max"] == 172)
+    assert(result.percentiles[50] == 82)
+    assert(result.percentiles[100] == 172)
+    assert(fan_out.histogram.total_count == 36)
+    assert(fan_out.histogram.value_at_percentile(100) == 172)
+    # the merged summary follows the output of workers
+    summary = lines[lines.index("Server Software:        fake\n"):]
+    assert(summary[-1] == " 100%    172 (longest request)\n")
+    assert("Requests per second:    37.00 [#/sec] (mean)\n" in summary)
+
+
+def test_fan_out_needs_concurrency():
+    try:
+        fanout.FanOut(["wb", "-n", "6", "localhost"], 2).run([])
+        assert(False)
+    except ValueError:
+        pass
@@ -0,0 +1,90 @@
+import os
+import shutil
+import tempfile
+
+from pywb import ftwcache
+from pywb import ftwhelper
+from pywb import packetsloader
+from pywb import pywbutil
+
+import common
+
+
+_REGRESSION_TEST_DIR = os.path.join(
+    common._HOME_DIR, "util", "regression-test", "bot_detection")
+
+
+def test_warm_cache_skips_parsing():
+    cache_dir = tempfile.mkdtemp()
+    try:
+        expected = list(packetsloader.load_packets_from_paths(
+            _REGRESSION_TEST_DIR))
+        cold = list(packetsloader.load_packets_from_paths(
+            _REGRESSION_TEST_DIR, cache=ftwcache.ParseCache(cache_dir)))
+        assert(expected == cold)
+        assert(len(os.listdir(cache_dir)) == 7)
+
+        load_yaml = ftwhelper._load_yaml_file_as_pairs
+        def fail(file_):
+            raise AssertionError(file_ + " is parsed")
+        ftwhelper._load_yaml_file_as_pairs = fail
+        try:
+            warm = list(packetsloader.load_packets_from_paths(
+                _REGRESSION_TEST_DIR, cache=ftwcache.ParseCache(cache_dir)))
+        finally:
+            ftwhelper._load_yaml_file_as_pairs = load_yaml
+        assert(expected == warm)
+        assert([p.ORIGINAL_FILE for p in expected]
+               == [p.ORIGINAL_FILE for p in warm])
+
+        stages = list(ftwhelper.get(
+            _REGRESSION_TEST_DIR, ftwhelper.FTW_TYPE.STAGE,
+            cache=ftwcache.ParseCache(cache_dir)))
+        assert(stages == list(ftwhelper.get(
+            _REGRESSION_TEST_DIR, ftwhelper.FTW_TYPE.STAGE)))
+    finally:
+        shutil.rmtree(cache_dir)
+
+
+def test_cache_invalidation_and_eviction():
+    work_dir = tempfile.mkdtemp()
+    try:
+        yaml_file = os.path.join(work_dir, "packets.yaml")
+        shutil.copy(os.path.join(common._DATA_DIR, "packets.yaml"), yaml_file)
+        cache = ftwcache.ParseCache(os.path.join(work_dir, "cache"))
+        packets = list(packetsloader.load_packets_from_paths(
+            yaml_file, cache=cache))
+        assert(cache.lookup(yaml_file).packets == packets)
+
+        # touched but unchanged
+        os.utime(yaml_file, (0, 0))
+        assert(cache.lookup(yaml_file).packets == packets)
+        # the new mtime is saved, so the file isn't hashed again
+        file_digest = pywbutil.file_digest
+        def fail(file_):
+            raise AssertionError(file_ + " is hashed")
+        pywbutil.file_digest = fail
+        try:
+            assert(cache.lookup(yaml_file).packets == packets)
+        finally:
+            pywbutil.file_digest = file_digest
+
+        # changed
+        with open(yaml_file, "a") as fd:
+            fd.write("\n# changed\n")
+        assert(cache.lookup(yaml_file) is None)
+
+        # the least recently used entry is evicted
+        other_file = os.path.join(work_dir, "other.yaml")
+        shutil.copy(yaml_file, other_file)
+        cache.store(yaml_file, [], packets)
+        entry_size = os.path.getsize(cache._entry_path(yaml_file))
+        os.utime(cache._entry_path(yaml_file), (0, 0))
+        cache.max_size = entry_size * 3 // 2
+        cache.store(other_file, [], packets)
+        assert(cache.lookup(yaml_file) is None)
+        assert(cache.lookup(other_file).packets == packets)
+        cache.clear()
+        assert(cache.lookup(other_file) is None)
+    finally:
+        shutil.rmtree(work_dir)
@@ -0,0 +1,37 @@
+import os
+
+from pywb import ftwhelper
+from pywb import packetsloader
+
+import common
+
+
+_REGRESSION_TEST_DIR = os.path.join(
+    common._HOME_DIR, "util", "regression-test", "bot_detection")
+
+
+def test_parallel_loading_keeps_order():
+    reports = []
+    def report(file_count, elapsed_time):
+        reports.append(file_count)
+    serial = list(packetsloader.load_packets_from_paths(
+        _REGRESSION_TEST_DIR))
+    parallel = list(packetsloader.load_packets_from_paths(
+        _REGRESSION_TEST_DIR, processes=2, report=report))
+    assert(serial)
+    assert(serial == parallel)
+    assert([p.ORIGINAL_FILE for p in serial]
+           == [p.ORIGINAL_FILE for p in parallel])
+    assert(reports == [7])
+
+
+def test_parallel_loading_of_mixed_sources():
+    yaml_string = open(os.path.join(common._DATA_DIR, "packets.yaml")).read()
+    sources = [_REGRESSION_TEST_DIR, yaml_string,
+               os.path.join(common._DATA_DIR, "packets.yaml")]
+    serial = list(ftwhelper.get(sources, ftwhelper.FTW_TYPE.STAGE))
+    parallel = list(ftwhelper.get(
+        sources, ftwhelper.FTW_TYPE.STAGE, processes=2))
+    assert(serial == parallel)
+    assert([list(s["input"]["headers"]) for s in serial]
+           == [list(s["input"]["headers"]) for s in parallel])
@@ -0,0 +1,108 @@
+import os
+import json
+import random
+import tempfile
+
+from pywb import histogram
+
+
+def test_record():
+    histogram_ = histogram.Histogram()
+    for value in range(1, 101):
+        histogram_.record(value)
+    # the values below 256 are exact
+    assert(histogram_.value_at_percentile(50) == 50)
+    assert(histogram_.value_at_percentile(99) == 99)
+    assert(histogram_.value_at_percentile(100) == 100)
+    assert(histogram_.percentiles()[90] == 90)
+    assert(histogram_.mean == 50.5)
+    assert(histogram_.min == 1 and histogram_.max == 100)
+    assert(histogram.Histogram().value_at_percentile(50) is None)
+
+
+def test_precision():
+    histogram_ = histogram.Histogram()
+    values = [random.randint(1, 10 ** 9) for _ in range(10000)]
+    for value in values:
+        histogram_.record(value)
+    values.sort()
+    for percentage in (50, 90, 99):
+        exact = values[len(values) * percentage // 100 - 1]
+        value = histogram_.value_at_percentile(percentage)
+        assert(abs(value - exact) <= exact / 128.0)
+    # the number of buckets only grows with the logarithm of the values
+    assert(len(histogram_.to_dict()["buckets"]) <= 30 * 128)
+
+
+def test_merge():
+    shards = [histogram.Histogram() for _ in range(4)]
+    whole = histogram.Histogram()
+    for value in range(100000):
+        shards[value % 4].record(value * 7)
+        whole.record(value * 7)
+    # the shards are merged after a round trip of JSON
+    merged = histogram.merge(
+        histogram.Histogram.from_dict(json.loads(shard.to_json()))
+        for shard in shards)
+    assert(merged.to_dict() == whole.to_dict())
+    assert(merged.percentiles() == whole.percentiles())
+    try:
+        merged.merge(histogram.Histogram(time_unit="ms"))
+        assert(False)
+    except ValueError:
+        pass
+
+
+def test_from_gnuplot():
+    fd, gnuplot_file = tempfile.mkstemp(suffix=".tsv")
+    with os.fdopen(fd, "w") as fd:
+        fd.write("starttime\tseconds\tctime\tdtime\tttime\twait\n")
+        for i in range(10):
+            fd.write("Mon Jan  1 00:00:00 2018\t1514764800\t1\t%d\t%d\t0\n"
+                     % (i * 10, 1 + i * 10))
+    try:
+        histogram_ = histogram.from_gnuplot(gnuplot_file, time_unit="ms")
+    finally:
+        os.remove(gnuplot_file)
+    assert(histogram_.total_count == 10)
+    assert(histogram_.time_unit == "ms")
+    assert(histogram_.value_at_percentile(100) == 91)
+    assert(histogram.from_gnuplot(gnuplot_file).total_count == 0)
+
+
+def test_connection_times():
+    fd, gnuplot_file = tempfile.mkstemp(suffix=".tsv")
+    with os.fdopen(fd, "w") as fd:
+        fd.write("starttime\tseconds\tctime\tdtime\tttime\twait\n")
+        # the requests of the first second are slow
+        for second, total in [(1514764800, 500)] * 4 \
+                + [(1514764801, 10)] * 4:
+            fd.write("Mon Jan  1 00:00:00 2018\t%d\t1\t%d\t%d\t2\n"
+                     % (second, total - 1, total))
+    try:
+        connection_times = histogram.connection_times_from_gnuplot(
+            gnuplot_file)
+        warm = histogram.connection_times_from_gnuplot(
+            gnuplot_file, warmup=1)
+        # the warmup is over before the first sample in the stats window
+        windowed = histogram.connection_times_from_gnuplot(
+            gnuplot_file, warmup=1, start=1514764798.5)
+    finally:
+        os.remove(gnuplot_file)
+    assert(connection_times.total.total_count == 8)
+    assert(warm.total.total_count == 4)
+    assert(warm.total.max == 10)
+    assert(windowed.total.total_count == 8)
+    # the rows are described as wb reports them
+    rows = connection_times.describe()
+    assert(rows["connect"] == {"min": 1, "mean": 1, "sd": 0.0,
+                               "median": 1, "max": 1})
+    assert(rows["total"]["mean"] == 255)
+    # the sd is computed from the middles of the buckets, 261.9 exactly
+    assert(rows["total"]["sd"] == 262.2)
+    assert(rows["waiting"]["max"] == 2)
+    # they're merged after a round trip of JSON
+    merged = histogram.ConnectionTimes.from_dict(
+        json.loads(json.dumps(connection_times.to_dict()))).merge(warm)
+    assert(merged.total.total_count == 12)
+    assert(histogram.ConnectionTimes().describe() == {})
@@ -0,0 +1,71 @@
+import os
+import base64
+
+import ftw
+
+from pywb import ftwhelper
+from pywb import httpbuilder
+
+import common
+
+
+_REGRESSION_TEST_DIR = os.path.join(
+    common._HOME_DIR, "util", "regression-test")
+
+
+def _build_by_http_ua(input_):
+    http_ua = ftw.http.HttpUA()
+    http_ua.request_object = input_
+    http_ua.build_request()
+    return str(http_ua.request)
+
+
+def test_conformance_with_http_ua():
+    count = 0
+    for stage in ftwhelper.get(
+            _REGRESSION_TEST_DIR, ftwhelper.FTW_TYPE.STAGE):
+        expected = _build_by_http_ua(stage.ORIGINAL_DATA.input)
+        assert(httpbuilder.build_request(stage.ORIGINAL_DATA.input)
+               == expected)
+        assert(httpbuilder.build_request_from_dict(stage["input"])
+               == expected)
+        count += 1
+    assert(count > 10000)
+
+
+def test_build_request_from_dict():
+    assert(httpbuilder.build_request_from_dict({})
+           == "GET / HTTP/1.1\r\n\r\n")
+    input_dict = {
+        "method": "POST",
+        "uri": "/post",
+        "data": ["a=1 2", "b=3"],
+    }
+    request = httpbuilder.build_request_from_dict(input_dict)
+    assert(request.startswith("POST /post HTTP/1.1\r\n"))
+    assert("Content-Length: 16\r\n" in request)
+    assert(request.endswith("\r\n\r\na=1+2%0D%0Ab%3D3"))
+    assert(request == _build_by_http_ua(ftw.ruleset.Input(
+        method="POST", uri="/post", headers={},
+        data=["a=1 2", "b=3"])))
+    # the input dict itself isn't changed if it has no headers
+    assert("headers" not in input_dict)
+    # nor are its headers
+    input_dict["headers"] = {"Host": "localhost"}
+    request = httpbuilder.build_request_from_dict(input_dict)
+    assert("Content-Type: application/x-www-form-urlencoded\r\n" in request)
+    assert(input_dict["headers"] == {"Host": "localhost"})
+
+    raw_request = "GET /raw HTTP/1.0\\r\\n\\r\\n"
+    assert(httpbuilder.build_request_from_dict({"raw_request": raw_request})
+           == "GET /raw HTTP/1.0\r\n\r\n")
+    assert(httpbuilder.build_request_from_dict({
+        "encoded_request": base64.b64encode(raw_request)})
+           == "GET /raw HTTP/1.0\r\n\r\n")
+    try:
+        httpbuilder.build_request_from_dict({
+            "raw_request": raw_request,
+            "encoded_request": base64.b64encode(raw_request)})
+        assert(False)
+    except ftw.errors.TestError:
+        pass
@@ -0,0 +1,88 @@
+import os
+import time
+import threading
+
+from pywb import main
+from pywb import outputpump
+
+import common
+
+
+def _write_lines(lines, tail=""):
+    """ Write lines into a pipe by a thread, return the read end """
+    read_fd, write_fd = os.pipe()
+
+    def write():
+        with os.fdopen(write_fd, "wb") as fd:
+            for line in lines:
+                fd.write(line)
+            fd.write(tail)
+    thread = threading.Thread(target=write)
+    thread.daemon = True
+    thread.start()
+    return read_fd
+
+
+def test_pump_lines():
+    lines = ["line %d %s\r\n" % (i, "x" * (i % 50)) for i in range(10000)]
+    received = []
+    read_fd = _write_lines(lines, "no newline")
+    stats = outputpump.OutputPump(
+        read_fd, [received.append], chunk_size=97).run()
+    os.close(read_fd)
+    # lines broken by chunks are joined
+    assert(received == lines + ["no newline"])
+    assert(stats["lines"] == len(lines) + 1)
+    assert(stats["bytes"] == len("".join(lines)) + len("no newline"))
+    assert(stats["dropped_bytes"] == 0)
+
+    # a filter returns None to stop the following filters
+    received = []
+    read_fd = _write_lines(lines)
+    outputpump.OutputPump(read_fd, [
+        lambda line: line if line.startswith("line 1") else None,
+        received.append]).run()
+    os.close(read_fd)
+    assert(received == [line for line in lines if line.startswith("line 1")])
+
+
+def test_pump_slow_filters():
+    lines = ["line %d\n" % (i, ) for i in range(2000)]
+
+    def slow_filter(line):
+        time.sleep(0.0005)
+        return line
+
+    # the reader is blocked by the full queue, no line is lost
+    received = []
+    read_fd = _write_lines(lines)
+    stats = outputpump.OutputPump(
+        read_fd, [slow_filter, received.append],
+        chunk_size=64, queue_size=2).run()
+    os.close(read_fd)
+    assert(received == lines)
+    assert(stats["blocked_time"] > 0)
+    assert(stats["max_queue_depth"] <= 2)
+
+    # the dropped chunks and the lines broken by them are skipped
+    received = []
+    read_fd = _write_lines(lines)
+    stats = outputpump.OutputPump(
+        read_fd, [slow_filter, received.append],
+        chunk_size=64, queue_size=2, drop=True).run()
+    os.close(read_fd)
+    assert(stats["dropped_bytes"] > 0)
+    assert(stats["blocked_time"] == 0)
+    assert(set(received) <= set(lines))
+    assert(received == sorted(received, key=lines.index))
+
+
+def test_execute_wb_pump_stats():
+    received = []
+    pump_stats = {}
+    # any command can be the subprocess, its stderr is pumped too
+    assert(main.execute_wb(
+        ["sh", "-c", "echo out; echo err >&2; exit 3"],
+        [received.append], pump_stats) == 3)
+    assert(sorted(received) == ["err\n", "out\n"])
+    assert(pump_stats["lines"] == 2)
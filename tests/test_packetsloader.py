@@ -0,0 +1,152 @@
+import os
+import gzip
+import base64
+import shutil
+import tempfile
+
+from pywb import packetsloader
+from pywb import packetsdumper
+from pywb import packetsindex
+
+import common
+
+
+class TemporaryPacketFile(object):
+    def __init__(self, content, suffix=".pkt"):
+        self._content = content
+        self._suffix = suffix
+    def __enter__(self):
+        self._dir = tempfile.mkdtemp()
+        self.path = os.path.join(self._dir, "packets" + self._suffix)
+        with open(self.path, "wb") as fd:
+            fd.write(self._content)
+        return self.path
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        shutil.rmtree(self._dir)
+
+
+def test_load_size_prefixed_packets():
+    packets = ["GET / HTTP/1.1\r\n\r\n", "GET /a HTTP/1.1\r\n\r\n"]
+    content = "".join(str(len(p)) + "\n" + p for p in packets)
+    with TemporaryPacketFile(content) as path:
+        assert(list(packetsloader.load_packets_from_paths(path)) == packets)
+
+
+def test_load_null_delimited_packets():
+    packets = ["GET / HTTP/1.1\r\n\r\n", "GET /a HTTP/1.1\r\n\r\n"]
+    with TemporaryPacketFile("\0".join(packets)) as path:
+        assert(list(packetsloader.load_packets_from_paths(path)) == packets)
+    with TemporaryPacketFile("\0\0".join(packets) + "\0") as path:
+        assert(list(packetsloader.load_packets_from_paths(path)) == packets)
+
+
+def test_load_mixed_and_empty_packet_files():
+    packets = ["GET /0 HTTP/1.1\r\n\r\n", "2\nAB", "GET /1 HTTP/1.1\r\n\r\n"]
+    content = packets[0] + "\0" + "4\n2\nAB" + packets[2] + "\0"
+    with TemporaryPacketFile(content) as path:
+        assert(list(packetsloader.load_packets_from_paths(path)) == packets)
+    with TemporaryPacketFile("") as path:
+        assert(list(packetsloader.load_packets_from_paths(path)) == [])
+
+
+def test_load_packets_from_data_files():
+    big_packet = os.path.join(common._DATA_DIR, "big_packet.pkt")
+    packets = list(packetsloader.load_packets_from_paths(big_packet))
+    assert(len(packets) == 1)
+    assert(packets[0] == open(big_packet, "rb").read())
+    packets = list(packetsloader.load_packets_from_paths(
+        os.path.join(common._DATA_DIR, "packets.pkt")))
+    assert(len(packets) == 6)
+    assert(all(p.startswith("GET /") for p in packets))
+
+
+def test_packets_index_range_and_shard():
+    packets = ["GET /%d HTTP/1.1\r\n\r\n" % (i, ) for i in range(10)]
+    work_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(work_dir, "packets.pkt")
+        with packetsdumper.PacketsDumper(path, index=True) as dumper:
+            dumper.dump(packets)
+        assert(dumper.packet_count == len(packets))
+        assert(os.path.exists(path + packetsindex.INDEX_SUFFIX))
+        assert(packetsloader.count_packets(path) == len(packets))
+        assert(list(packetsloader.load_packets_from_range(path, 3, 6))
+               == packets[3:6])
+        shards = [list(packetsloader.load_packets_from_shard(path, i, 3))
+                  for i in range(3)]
+        assert(sum(shards, []) == packets)
+        assert([len(shard) for shard in shards] == [3, 3, 4])
+
+        # a stale index is ignored
+        with open(path, "ab") as fd:
+            fd.write("\0GET /10 HTTP/1.1\r\n\r\n")
+        assert(packetsloader.count_packets(path) == len(packets) + 1)
+        assert(packetsloader.build_packets_index(path) == len(packets) + 1)
+        assert(list(packetsloader.load_packets_from_range(path, 10))
+               == ["GET /10 HTTP/1.1\r\n\r\n"])
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_dump_buffered_packets():
+    packets = ["GET /%d HTTP/1.1\r\n\r\n" % (i, ) + "a" * (i * 7)
+               for i in range(20)]
+    work_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(work_dir, "packets.pkt")
+        with packetsdumper.PacketsDumper(
+                path, index=True, buffer_size=64, fsync=True) as dumper:
+            dumper.dump(packets[0])
+            dumper.dump(bytearray(packets[1]))
+            dumper.dump(memoryview(packets[2]))
+            dumper.dump(buffer(packets[3]))
+            dumper.dump(iter(packets[4:10]))
+            dumper.flush()
+            assert(list(packetsloader.load_packets_from_paths(path))
+                   == packets[:10])
+            dumper.dump(["", u"GET /10 HTTP/1.1\r\n\r\n" + "a" * 70]
+                        + packets[11:])
+        assert(dumper.packet_count == len(packets))
+        assert(list(packetsloader.load_packets_from_paths(path)) == packets)
+        assert(list(packetsloader.load_packets_from_range(path, 5, 15))
+               == packets[5:15])
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def test_load_jsonl_packets():
+    records = [
+        '{"method": "GET", "uri": "/a", "headers": {"Host": "localhost"}}',
+        '',
+        '{"raw_request": "GET /raw HTTP/1.1\\\\r\\\\n\\\\r\\\\n"}',
+        '{"encoded_request": "%s"}' % (
+            base64.b64encode("GET /encoded HTTP/1.1\r\n\r\n"), ),
+        '{"method": "POST", "uri": "/p", "headers": {}, "data": "a=1"}',
+        # the headers are sent in their order
+        '{"uri": "/o", "headers": {"Host": "h", "X-B": "b", "Accept": "*",'
+        ' "X-A": "a", "User-Agent": "u"}}',
+    ]
+    packets = [
+        "GET /a HTTP/1.1\r\nHost: localhost\r\n\r\n",
+        "GET /raw HTTP/1.1\r\n\r\n",
+        "GET /encoded HTTP/1.1\r\n\r\n",
+        "POST /p HTTP/1.1\r\nContent-Length: 3\r\n"
+        "Content-Type: application/x-www-form-urlencoded\r\n\r\na=1",
+        "GET /o HTTP/1.1\r\nHost: h\r\nX-B: b\r\nAccept: *\r\n"
+        "X-A: a\r\nUser-Agent: u\r\n\r\n",
+    ]
+    content = "\n".join(records) + "\n"
+    with TemporaryPacketFile(content, ".jsonl") as path:
+        assert(list(packetsloader.load_packets_from_paths(path)) == packets)
+        assert(packetsloader.get_packet_files([path]) == [(".jsonl", path)])
+    with TemporaryPacketFile("", ".jsonl.gz") as path:
+        with gzip.open(path, "wb") as fd:
+            fd.write(content)
+        assert(packetsloader.get_packet_files([path]) == [(".jsonl.gz", path)])
+        assert(list(packetsloader.load_packets_from_paths(path)) == packets)
+    with TemporaryPacketFile(content + "{]\n", ".jsonl") as path:
+        try:
+            list(packetsloader.load_packets_from_paths(path))
+            assert(False)
+        except ValueError as e:
+            assert(":7 " in str(e))
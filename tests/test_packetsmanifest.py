@@ -0,0 +1,66 @@
+import os
+import shutil
+import tempfile
+
+from pywb import packetsloader
+from pywb import packetsmanifest
+
+import common
+
+
+def _copy_data(work_dir, name, new_name=None):
+    path = os.path.join(work_dir, new_name or name)
+    shutil.copy(os.path.join(common._DATA_DIR, name), path)
+    return path
+
+
+def test_incremental_packet_file():
+    work_dir = tempfile.mkdtemp()
+    try:
+        source_dir = os.path.join(work_dir, "sources")
+        os.mkdir(source_dir)
+        yaml_file = _copy_data(source_dir, "packets.yaml", "a.yaml")
+        _copy_data(source_dir, "packets.pkt", "b.pkt")
+        other_yaml_file = _copy_data(source_dir, "packets.yaml", "c.yaml")
+        # the generated file is in the sources, but it isn't a source
+        packet_file = os.path.join(source_dir, "generated.pkt")
+
+        def check():
+            count = packetsmanifest.update_packet_file(
+                packet_file, [source_dir])
+            expected = list(packetsloader.load_packets_from_paths(
+                [path for _, path in packetsloader.get_packet_files(
+                    [source_dir]) if path != packet_file]))
+            assert(count == len(expected))
+            assert(list(packetsloader.load_packets_from_paths(packet_file))
+                   == expected)
+            return os.stat(packet_file)
+
+        stat = check()
+        assert(os.path.exists(packet_file + packetsmanifest.MANIFEST_SUFFIX))
+
+        # reused without writing
+        os.utime(other_yaml_file, (0, 0))
+        assert(check().st_mtime == stat.st_mtime)
+        assert(check().st_ino == stat.st_ino)
+
+        # a changed source is loaded again,
+        # the packets of the others are copied
+        with open(yaml_file, "r") as fd:
+            content = fd.read()
+        with open(yaml_file, "w") as fd:
+            fd.write(content.replace("/index.html", "/changed.html"))
+        check()
+        assert("/changed.html" in open(packet_file, "rb").read())
+
+        # added and removed sources
+        _copy_data(source_dir, "packets.pkt", "d.pkt")
+        os.remove(other_yaml_file)
+        check()
+
+        # a stale manifest is ignored
+        with open(packet_file, "ab") as fd:
+            fd.write("garbage")
+        check()
+    finally:
+        shutil.rmtree(work_dir)
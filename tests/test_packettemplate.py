@@ -0,0 +1,86 @@
+import os
+import re
+import shutil
+import tempfile
+
+from pywb import main
+from pywb import packetsloader
+from pywb import packettemplate
+
+import common
+
+
+def test_render_placeholders():
+    template = packettemplate.PacketTemplate(
+        "GET /{{seq}}?t={{random:8}}&u={{choice:a|b}}&{{unknown}} HTTP/1.1\n"
+        "Host: {{choice:localhost}}\n"
+        "X-Percent: 100%\n"
+        "\n", seed=1)
+    packets = list(template.generate(3, start=5))
+    for seq, packet in enumerate(packets, 5):
+        assert(re.match(
+            r"GET /%d\?t=[0-9a-f]{8}&u=[ab]&\{\{unknown\}\} HTTP/1.1\r\n"
+            r"Host: localhost\r\nX-Percent: 100%%\r\n\r\n$" % (seq, ),
+            packet))
+    assert(len(set(packets)) == 3)
+    # reproducible by the seed
+    text = "GET /{{random:16}} HTTP/1.1\r\n\r\n"
+    assert(list(packettemplate.PacketTemplate(text, seed=1).generate(10))
+           == list(packettemplate.PacketTemplate(text, seed=1).generate(10)))
+
+
+def test_content_length():
+    # fixed up if the body has placeholders
+    template = packettemplate.PacketTemplate(
+        "POST /{{seq}} HTTP/1.1\r\n"
+        "Content-Length: 0\r\n"
+        "\r\n"
+        "a={{filler:1-100}}&b={{seq}}")
+    for packet in template.generate(100):
+        head, body = packet.split("\r\n\r\n", 1)
+        assert("Content-Length: %d\r\n" % (len(body), ) in head + "\r\n")
+        assert(re.match(r"a=a{1,100}&b=\d+$", body))
+    # kept if the body is constant
+    template = packettemplate.PacketTemplate(
+        "POST / HTTP/1.1\r\nContent-Length: 1\r\n\r\n{{filler:3}}")
+    assert(template.render(0)
+           == "POST / HTTP/1.1\r\nContent-Length: 1\r\n\r\naaa")
+
+    for text in ["{{filler:x}}", "{{filler:3-1}}", "{{random:1-2}}"]:
+        try:
+            packettemplate.PacketTemplate(text)
+            assert(False)
+        except ValueError:
+            pass
+
+
+def test_dump_template_packets():
+    work_dir = tempfile.mkdtemp()
+    try:
+        choices_file = os.path.join(work_dir, "paths.txt")
+        with open(choices_file, "w") as fd:
+            fd.write("/a\n\n/b\n")
+        template_file = os.path.join(work_dir, "request.tpl")
+        with open(template_file, "w") as fd:
+            # relative to the directory of the template
+            fd.write("GET {{choice@paths.txt}}?{{seq}} HTTP/1.1\n\n")
+        packet_file = os.path.join(common._DATA_DIR, "packets.pkt")
+        enhance = main._PacketFileEnhance(
+            os.path.join(work_dir, "generated.pkt"))
+        enhance.load([packet_file])
+        main._TemplateEnhance(enhance).load([template_file, "1000"])
+        main._SeedEnhance(enhance).load(["7"])
+        options = enhance.dump()
+        assert(options[2:] == ["-Q", "1006"])
+        packets = list(packetsloader.load_packets_from_paths(options[1]))
+        assert(packets[:6]
+               == list(packetsloader.load_packets_from_paths(packet_file)))
+        for seq, packet in enumerate(packets[6:]):
+            assert(re.match(
+                r"GET /[ab]\?%d HTTP/1.1\r\n\r\n$" % (seq, ), packet))
+        # reproducible by --seed
+        assert(options == enhance.dump())
+        assert(packets
+               == list(packetsloader.load_packets_from_paths(options[1])))
+    finally:
+        shutil.rmtree(work_dir)
@@ -0,0 +1,101 @@
+import os
+import struct
+import shutil
+import tempfile
+
+from pywb import pcapreader
+from pywb import packetsloader
+
+import common
+
+
+_CLIENT = ("\x0a\x00\x00\x01", 40000)
+_SERVER = ("\x0a\x00\x00\x02", 80)
+
+
+def _tcp(source, destination, seq, payload="", flags=0x18):
+    return struct.pack(
+        ">HHIIBBHHH", source[1], destination[1], seq, 0,
+        5 << 4, flags, 65535, 0, 0) + payload
+
+
+def _ipv4(source, destination, seq, payload="", flags=0x18):
+    tcp = _tcp(source, destination, seq, payload, flags)
+    return struct.pack(
+        ">BBHHHBBH4s4s", 0x45, 0, 20 + len(tcp), 0, 0, 64, 6, 0,
+        source[0], destination[0]) + tcp
+
+
+def _ethernet(*args, **kwargs):
+    # with the padding of a short frame
+    return "\x00" * 12 + "\x08\x00" + _ipv4(*args, **kwargs) + "\x00" * 6
+
+
+def _ipv6(source, destination, seq, payload="", flags=0x18):
+    tcp = _tcp(source, destination, seq, payload, flags)
+    return struct.pack(
+        ">IHBB16s16s", 6 << 28, len(tcp), 6, 64,
+        source[0] * 4, destination[0] * 4) + tcp
+
+
+def _write_pcap(path, frames, linktype=1, byte_order="<", nanosecond=False):
+    magic = 0xa1b23c4d if nanosecond else 0xa1b2c3d4
+    with open(path, "wb") as fd:
+        fd.write(struct.pack(
+            byte_order + "IHHiIII", magic, 2, 4, 0, 0, 65535, linktype))
+        for i, frame in enumerate(frames):
+            fd.write(struct.pack(
+                byte_order + "IIII", i, 0, len(frame), len(frame)))
+            fd.write(frame)
+
+
+def test_read_http_requests():
+    work_dir = tempfile.mkdtemp()
+    try:
+        get = "GET /a HTTP/1.1\r\nHost: x\r\n\r\n"
+        post = "POST /b HTTP/1.1\r\nContent-Length: 5\r\n\r\nhello"
+        chunked = "POST /c HTTP/1.1\r\nTransfer-Encoding: chunked\r\n\r\n" \
+            "3\r\nabc\r\n0\r\n\r\n"
+        stream = get + post + chunked
+        response = "HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n"
+        isn = 0xfffffff0  # the sequence numbers wrap around
+        frames = [
+            _ethernet(_CLIENT, _SERVER, isn, flags=0x02),
+            _ethernet(_SERVER, _CLIENT, 1000, flags=0x12),
+            # out of order, retransmitted and overlapped segments
+            _ethernet(_CLIENT, _SERVER, (isn + 1 + 20) & 0xffffffff,
+                      stream[20:60]),
+            _ethernet(_CLIENT, _SERVER, isn + 1, stream[:30]),
+            _ethernet(_SERVER, _CLIENT, 1001, response),
+            _ethernet(_CLIENT, _SERVER, isn + 1, stream[:10]),
+            _ethernet(_CLIENT, _SERVER, (isn + 1 + 60) & 0xffffffff,
+                      stream[60:], flags=0x19),
+            # not HTTP
+            _ethernet(("\x0a\x00\x00\x03", 40001), _SERVER, 1,
+                      "\x16\x03\x01\x02\x00\x01\x00\x01\xfc\x03\x03"),
+        ]
+        path = os.path.join(work_dir, "capture.pcap")
+        _write_pcap(path, frames)
+        assert(list(pcapreader.read_http_requests(path))
+               == [get, post, chunked])
+        assert(list(packetsloader.load_packets_from_paths(work_dir))
+               == [get, post, chunked])
+
+        # big endian, nanosecond, raw IPv6, the capture starts
+        # in the middle of the connection and the last request is incomplete
+        frames = [
+            _ipv6(_CLIENT, _SERVER, 5, get[:7]),
+            _ipv6(_CLIENT, _SERVER, 12, get[7:] + post[:-1]),
+        ]
+        _write_pcap(path, frames, 101, ">", True)
+        assert(list(pcapreader.read_http_requests(path)) == [get])
+
+        with open(path, "wb") as fd:
+            fd.write("\x0a\x0d\x0d\x0a" + "\x00" * 20)
+        try:
+            list(pcapreader.read_http_requests(path))
+            assert(False)
+        except ValueError:
+            pass
+    finally:
+        shutil.rmtree(work_dir)
@@ -0,0 +1,80 @@
+import os
+import BaseHTTPServer
+
+from pywb import pyengine
+
+import common
+
+
+class _KeepAliveHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = "hello"
+        self.send_response(403 if self.path == "/index.html" else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_parse_target():
+    assert(pyengine.parse_target("localhost") == ("localhost", 80, "/"))
+    assert(pyengine.parse_target("http://127.0.0.1:8080/a?b=1")
+           == ("127.0.0.1", 8080, "/a?b=1"))
+    try:
+        pyengine.parse_target("https://localhost/")
+        assert(False)
+    except ValueError:
+        pass
+
+
+def test_keepalive():
+    lines = []
+    with common.HTTPServerInstance(_KeepAliveHandler):
+        runner = pyengine.Runner(
+            ["pyengine", "-k", "-c", "1", "-n", "20",
+             "http://127.0.0.1:%d/" % (common._PORT, )])
+        assert(runner.run([lines.append]) == 0)
+    result = runner.result
+    assert(result.complete_requests == 20)
+    assert(result.failed_requests == 0)
+    assert(result.keepalive_requests == 20)
+    assert(result.document_length == 5)
+    assert(result.html_transferred == 100)
+    assert(result.samples == 20)
+    assert(runner.histogram.total_count == 20)
+    # the summary is in the format of wb
+    assert("Complete requests:      20\n" in lines)
+    assert(lines[-1].startswith(" 100%"))
+
+
+def test_packets():
+    packet_file = os.path.join(common._DATA_DIR, "packets.pkt")
+    lines = []
+    with common.HTTPServerInstance(_KeepAliveHandler):
+        runner = pyengine.Runner(
+            ["pyengine", "-c", "2", "-n", "2", "-F", packet_file,
+             "127.0.0.1:%d" % (common._PORT, )], 2)
+        assert(runner.run([lines.append]) == 0)
+    result = runner.result
+    # -n is the passes over the 6 packets
+    assert(result.complete_requests == 12)
+    assert(result.keepalive_requests == 0)
+    assert(result.document_length is None)
+    assert(result.status_codes == {403: 4})
+    assert(len(runner.packet_stats) == 6)
+    assert([stats[0] for stats in runner.packet_stats] == [2] * 6)
+    assert([stats[2] for stats in runner.packet_stats]
+           == [0, 2, 0, 0, 2, 0])
+    assert("Document Length:        Variable\n" in lines)
+
+
+def test_refuse_options():
+    try:
+        pyengine.Runner(["pyengine", "-p", "post.txt", "localhost"])
+        assert(False)
+    except ValueError:
+        pass
@@ -5,8 +5,10 @@ import os
 import base64
 import random
 import re
+import tempfile
 
 from pywb import main
+from pywb import packetsloader
 
 import common
 
@@ -154,3 +156,78 @@ def test_response_codes_log():
         counter["request"] = 100;
             
 
+
+
+def test_dump_packets_in_memory():
+    packet_file = os.path.join(os.path.dirname(
+        __file__), "data", "packets.pkt")
+    enhance = main._PacketFileEnhance(".default.pkt")
+    enhance.in_memory = True
+    enhance.load([packet_file])
+    options = enhance.dump()
+    assert(options[0] == "-F" and options[1].startswith("/proc/self/fd/"))
+    assert(options[2:] == ["-Q", "6"])
+    assert(list(packetsloader.LOADERS[".pkt"](options[1]))
+           == list(packetsloader.load_packets_from_paths(packet_file)))
+    enhance.close()
+    assert(not os.path.exists(options[1]))
+
+
+def test_execute_wb_direct_output():
+    output_file = tempfile.TemporaryFile()
+    stdout_fd = os.dup(1)
+    try:
+        # wb inherits stdout
+        os.dup2(output_file.fileno(), 1)
+        # and its stderr is redirected to stdout
+        assert(main.execute_wb(
+            ["sh", "-c", "echo printed by wb; echo progress >&2; exit 3"],
+            None) == 3)
+    finally:
+        os.dup2(stdout_fd, 1)
+        os.close(stdout_fd)
+    output_file.seek(0)
+    assert(output_file.read() == "printed by wb\nprogress\n")
+
+
+def test_cover_stats_window():
+    arguments = ["wb", "-R", "20k", "-t", "10", "localhost"]
+    main._cover_stats_window(arguments)
+    assert(arguments[arguments.index("-W") + 1] == "220000")
+    # -n is the passes over the packets
+    packet_file = os.path.join(common._DATA_DIR, "packets.pkt")
+    arguments = ["wb", "-n", "10000", "-F", packet_file, "localhost"]
+    main._cover_stats_window(arguments)
+    assert(arguments[arguments.index("-W") + 1] == "60000")
+    # the default window is kept
+    arguments = ["wb", "-R", "10", "localhost"]
+    main._cover_stats_window(arguments)
+    assert(arguments[arguments.index("-W") + 1] == "50000")
+    try:
+        main._cover_stats_window(["wb", "-t", "10", "localhost"])
+        assert(False)
+    except ValueError:
+        pass
+
+
+def test_has_target():
+    assert(main._has_target(["wb", "-c", "10", "localhost"]))
+    assert(main._has_target(["wb", "-k", "localhost"]))
+    assert(not main._has_target(["wb", "-c", "10"]))
+    assert(not main._has_target(["wb", "-H", "localhost"]))
+
+
+def test_send_packets_in_memory():
+    counter = {
+        "request" : 0
+    }
+    class HTTPHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            counter["request"] += 1
+    with common.HTTPServerInstance(HTTPHandler):
+        packet_file = os.path.join(os.path.dirname(
+            __file__), "data", "packets.pkt")
+        main.execute(["-v", "4", "-n", "6", "--in-memory", "-F", packet_file,
+                      "localhost:" + str(common._PORT)])
+        assert(counter["request"] == 6)
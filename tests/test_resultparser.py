@@ -0,0 +1,103 @@
+import json
+
+from pywb import resultparser
+
+import common
+
+
+_OUTPUT = """WARNING: Response code not 2xx (502)
+ 1: Completed      6 requests, rate is 1877 #/sec.
+Finished 6 requests
+
+Server Software:        nginx/1.11.5
+Server Hostname:        localhost
+Server Port:            18080
+
+Document Path:          /
+Document Length:        Variable
+
+Concurrency Level:      4
+Time taken for tests:   0.003 seconds
+Complete requests:      6
+\033[0;31mFailed requests:        3
+   (Connect: 1, Receive: 0, Length: 2, Exceptions: 0)
+\033[0mNon-2xx responses:      6
+502 responses: 4
+403 responses: 2
+Total transferred:      4266 bytes
+HTML transferred:       3222 bytes
+\033[1;33mRequests per second:    1852.42 [#/sec] (mean)
+\033[0mTime per request:       2.160 [ms] (mean)
+Time per request:       0.540 [ms] (mean, across all concurrent requests)
+Transfer rate:          1286.20 [Kbytes/sec] received
+                        12.50 kb/s sent
+                        1298.70 kb/s total
+Total samples of stats: 6
+Connection Times (us)
+              min  mean[+/-sd] median   max
+Connect:       52   68  12.8     74      82
+Processing:   366  436  49.6    442     510
+Waiting:      229  312  63.4    323     406
+Total:        448  504  50.3    494     589
+
+Percentage of the requests served within a certain time (us)
+  50%    494
+  90%    589
+  99%    589
+ 100%    589 (longest request)
+"""
+
+
+def test_parse_summary():
+    result = resultparser.parse(_OUTPUT)
+    assert(result.server_software == "nginx/1.11.5")
+    assert(result.server_port == 18080)
+    assert(result.document_length is None)
+    assert(result.concurrency == 4)
+    assert(result.complete_requests == 6)
+    assert(result.failed_requests == 3)
+    assert(result.failures == {
+        "connect": 1, "receive": 0, "length": 2, "exceptions": 0})
+    assert(result.non_2xx_responses == 6)
+    assert(result.status_codes == {502: 4, 403: 2})
+    assert(result.requests_per_second == 1852.42)
+    assert(result.time_per_request == 2.16)
+    assert(result.time_per_request_all == 0.54)
+    assert(result.transfer_rate_received == 1286.2)
+    assert(result.transfer_rate_sent == 12.5)
+    assert(result.transfer_rate_total == 1298.7)
+    assert(result.samples == 6)
+    assert(result.time_unit == "us")
+    assert(result.connection_times["total"] == {
+        "min": 448, "mean": 504, "sd": 50.3, "median": 494, "max": 589})
+    assert(result.connection_times["connect"]["sd"] == 12.8)
+    assert(list(result.percentiles.items())
+           == [(50, 494), (90, 589), (99, 589), (100, 589)])
+    assert(result.get_time(result.percentiles[90]) == 0.589)
+
+    data = json.loads(result.to_json())
+    assert(data["requests_per_second"] == 1852.42)
+    assert(data["status_codes"] == {"403": 2, "502": 4})
+    assert(data["percentiles"]["99"] == 589)
+
+
+def test_parse_simple_table():
+    output = _OUTPUT.replace(
+        "              min  mean[+/-sd] median   max\n",
+        "              min   avg   max\n").replace(
+        "Total:        448  504  50.3    494     589\n",
+        "Total:        448   504    589\n")
+    result = resultparser.parse(output)
+    assert(result.connection_times["total"] == {
+        "min": 448, "mean": 504, "max": 589})
+
+
+def test_parser_passes_lines():
+    parser = resultparser.ResultParser()
+    lines = _OUTPUT.splitlines(True)
+    assert([parser(line) for line in lines] == lines)
+    assert(parser.result.complete_requests == 6)
+    # the lines before the summary aren't parsed
+    parser = resultparser.ResultParser()
+    parser("Requests per second:    1 [#/sec] (mean)\n")
+    assert(parser.result.requests_per_second is None)
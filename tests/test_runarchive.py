@@ -0,0 +1,81 @@
+import os
+import subprocess
+import tempfile
+
+from pywb import runarchive
+from pywb import histogram
+from pywb import resultparser
+
+import common
+
+
+def _fake_result(requests_per_second, p99=1000):
+    result = resultparser.WbResult()
+    result.requests_per_second = requests_per_second
+    result.complete_requests = 1000
+    result.failed_requests = 10
+    result.time_unit = "us"
+    result.percentiles[99] = p99
+    return result
+
+
+def test_benchmark_name():
+    assert(runarchive.benchmark_name(
+        ["/usr/bin/wb", "-F", "/proc/self/fd/3", "-Q", "2", "-c", "20",
+         "-g", "/tmp/pywb-1.tsv", "localhost"]) == "-Q 2 -c 20 localhost")
+    packet_file = os.path.join(common._DATA_DIR, "packets.pkt")
+    assert(runarchive.corpus_hash([packet_file])
+           == runarchive.corpus_hash([packet_file]))
+    assert(runarchive.corpus_hash([]) is None)
+
+
+def test_compare():
+    fd, database = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        archive = runarchive.RunArchive(database)
+        for i, rps in enumerate([1000, 1010, 990, 1005, 995]):
+            archive.add("-c 20 localhost", _fake_result(rps, 1000 + i),
+                        "build-%d" % (i, ), corpus_hash="abc")
+        # another corpus isn't the baseline
+        archive.add("-c 20 localhost", _fake_result(10), corpus_hash="def")
+        latency = histogram.Histogram()
+        for value in range(2000, 3000):
+            latency.record(value)
+        run_id = archive.add("-c 20 localhost", _fake_result(900),
+                             "build-5", corpus_hash="abc",
+                             histogram_=latency)
+        archive.close()
+
+        archive = runarchive.RunArchive(database)
+        run = archive.get()
+        assert(run.run_id == run_id)
+        assert(run.label == "build-5")
+        assert(run.error_rate == 0.01)
+        # the p99 comes from the histogram, 2989us within its precision
+        assert(run.latency_p99_ms == 2.991)
+        assert(run.histogram["total_count"] == 1000)
+        assert(len(archive.baseline(run)) == 5)
+        throughput, latency = archive.compare(run)
+        assert(throughput.status == "regression")
+        assert(abs(throughput.change + 0.1) < 0.001)
+        assert(latency.status == "regression")
+        # a change within the noise isn't a regression
+        assert([item.status for item in archive.compare(archive.get(4))]
+               == ["unchanged", "unchanged"])
+        # a significant change under min_change isn't a regression
+        assert([item.status for item in archive.compare(
+            run, min_change=0.5)] == ["unchanged", "regression"])
+        assert(archive.compare(archive.get(2))[0].status == "insufficient")
+        assert([run.run_id for run in archive.runs(limit=2)] == [7, 6])
+        archive.close()
+
+        # the CLI exits with 1 if the latest run regresses
+        run_archive = os.path.join(common._HOME_DIR, "tools",
+                                   "run_archive.py")
+        assert(subprocess.call(["python3", run_archive, "-d", database,
+                                "compare"]) == 1)
+        assert(subprocess.call(["python3", run_archive, "-d", database,
+                                "compare", "-r", "2"]) == 0)
+    finally:
+        os.remove(database)
@@ -0,0 +1,59 @@
+import os
+import stat
+import sys
+import tempfile
+
+from pywb import runner
+
+import common
+
+
+def test_run():
+    packets = ["GET /%d HTTP/1.1\r\nHost: localhost\r\n\r\n" % (i, )
+               for i in range(3)]
+    lines = []
+    with common.FakeWb() as fake_wb:
+        result = runner.run(
+            "localhost:8080/", packets=iter(packets), concurrency=2,
+            requests=4, rate="1k", filters=[lines.append], wb_path=fake_wb)
+    assert(result.return_code == 0)
+    assert(result.concurrency == 2)
+    # -n is the passes over the 3 packets
+    assert(result.complete_requests == 12)
+    assert("worker -c 2 -n 4 -Q 3 -R 1k\n" in lines)
+    # wb reads the packets from the inherited memory file
+    size = sum(len(str(len(packet))) + 1 + len(packet) for packet in packets)
+    assert("packets %d bytes\n" % (size, ) in lines)
+
+
+def test_wait_all():
+    with common.FakeWb() as fake_wb:
+        runs = [runner.start("localhost:8080/", concurrency=1,
+                             requests=requests, wb_path=fake_wb)
+                for requests in range(1, 21)]
+        results = runner.wait_all(runs)
+    assert([result.complete_requests for result in results]
+           == list(range(1, 21)))
+    assert(all(result.return_code == 0 for result in results))
+
+
+def test_descriptors_of_other_runs_are_closed():
+    fd, list_fds = tempfile.mkstemp(suffix=".py")
+    with os.fdopen(fd, "w") as script:
+        script.write("#!%s\nimport os\n"
+                     "print(' '.join(os.listdir('/proc/self/fd')))\n"
+                     % (sys.executable, ))
+    os.chmod(list_fds, stat.S_IRWXU)
+    packets = ["GET / HTTP/1.1\r\nHost: localhost\r\n\r\n"]
+    try:
+        with common.FakeWb() as fake_wb:
+            other = runner.start("localhost:8080/", packets=iter(packets),
+                                 wb_path=fake_wb)
+            lines = []
+            runner.run("localhost:8080/", packets=iter(packets),
+                       filters=[lines.append], wb_path=list_fds)
+            other.wait()
+    finally:
+        os.remove(list_fds)
+    # the packets are stdin, 3 is the directory listed
+    assert(sorted(lines[0].split()) == ["0", "1", "2", "3"])
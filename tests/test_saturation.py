@@ -0,0 +1,62 @@
+import json
+
+from pywb import main
+from pywb import saturation
+from pywb import resultparser
+
+import common
+
+
+def _fake_result(requests_per_second, failed=0, p99=1000):
+    result = resultparser.WbResult()
+    result.requests_per_second = requests_per_second
+    result.complete_requests = 1000
+    result.failed_requests = failed
+    result.time_unit = "us"
+    result.percentiles[99] = p99
+    return result
+
+
+def test_ramp_levels():
+    assert(saturation.ramp_levels(1, 64, "x2") == [1, 2, 4, 8, 16, 32, 64])
+    assert(saturation.ramp_levels(10, 35, "10") == [10, 20, 30, 35])
+    assert(saturation.ramp_levels(1, 4, "x1.2") == [1, 2, 3, 4])
+
+
+def test_find_knee():
+    # the throughput saturates at 4000 requests/sec
+    throughput = {1: 1000, 2: 2000, 4: 3900, 8: 4000, 16: 4050, 32: 4000}
+    probed = []
+
+    def probe(level):
+        probed.append(level)
+        return _fake_result(throughput[level], p99=level * 100)
+    lines = []
+    finder = saturation.SaturationFinder(
+        probe, saturation.ramp_levels(1, 32, "x2"))
+    knee = finder.run(lines.append)
+    assert(finder.stop_reason == "plateau")
+    assert(probed == [1, 2, 4, 8, 16])
+    assert(knee.level == 4)
+    assert(knee.latency == 0.4)
+    assert(lines[-1] == "Knee(plateau) Concurrency 4: 3900.00 "
+           "requests/sec, p99 0.400 ms, 0.00% failed\n")
+    data = json.loads(finder.to_json())
+    assert(data["knee"]["level"] == 4)
+    assert([step["level"] for step in data["curve"]] == probed)
+
+    # the failed level stops the ramp and isn't the knee
+    finder = saturation.SaturationFinder(
+        lambda level: _fake_result(level * 1000, failed=level // 4 * 50),
+        [1, 2, 4, 8])
+    assert(finder.run().level == 2)
+    assert(finder.stop_reason == "errors")
+    assert(len(finder.steps) == 3)
+
+
+def test_probe():
+    with common.FakeWb() as fake_wb:
+        result = main._probe([fake_wb, "-n", "4", "localhost"], "-c", 3)
+    assert(result.return_code == 0)
+    assert(result.concurrency == 3)
+    assert(result.complete_requests == 4)
@@ -0,0 +1,97 @@
+import json
+
+from pywb import main
+from pywb import slosearch
+from pywb import histogram
+from pywb import resultparser
+
+import common
+
+
+def _fake_result(requests_per_second, failed=0):
+    result = resultparser.WbResult()
+    result.requests_per_second = requests_per_second
+    result.complete_requests = 1000
+    result.failed_requests = failed
+    result.time_unit = "us"
+    return result
+
+
+def _latency(total):
+    histogram_ = histogram.Histogram()
+    histogram_.record(total)
+    return histogram_
+
+
+def test_trial_latency():
+    histogram_ = histogram.Histogram()
+    for value in range(1000, 2000):
+        histogram_.record(value)
+    trial = slosearch.Trial(100, _fake_result(100), histogram_)
+    assert(trial.latency == 1.991)
+    # the latency of the summary is kept without a histogram
+    result = _fake_result(100)
+    result.percentiles[99] = 3000
+    assert(slosearch.Trial(100, result).latency == 3.0)
+
+
+def test_search():
+    # the target meets the SLO up to 4500 requests/sec
+    probed = []
+
+    def probe(rate):
+        probed.append(rate)
+        latency = 1000 if rate <= 4500 else 100000
+        return _fake_result(rate), _latency(latency)
+    lines = []
+    search = slosearch.SloSearch(probe, 10, 0.01, 1000, 100000, trials=2)
+    best = search.run(lines.append)
+    assert(probed[::2] == [1000, 2000, 4000, 8000, 6000, 5000, 4500, 4750,
+                           4625])
+    assert(best.rate == 4500)
+    assert(search.limit.rate == 4625)
+    assert(lines[-1] == "The maximum rate under the SLO is in "
+           "[4500, 4625)\n")
+    data = json.loads(search.to_json())
+    assert(data["best"]["rate"] == 4500)
+    assert(len(data["points"]) == 9)
+
+    # the rate whose failed requests exceed the limit misses the SLO
+    search = slosearch.SloSearch(
+        lambda rate: (_fake_result(rate, failed=20), _latency(1000)),
+        10, 0.01, 100, 1600, trials=1)
+    assert(search.run() is None)
+    assert([point.rate for point in search.points]
+           == [100, 50, 25, 12, 6, 3, 1])
+    assert(search.limit.rate == 1)
+
+
+def test_confidence_bounds():
+    latencies = iter([1000, 2000, 3000])
+    search = slosearch.SloSearch(
+        lambda rate: (_fake_result(rate), _latency(next(latencies))),
+        10, 0.01, 100, 100, trials=3)
+    best = search.run()
+    assert(best.rate == 100)
+    assert(best.latency == 2.0)
+    assert(abs(best.latency_margin - 2.484) < 0.001)
+    assert(search.limit is None)
+
+
+def test_search_slo():
+    slo_enhance = main._SloEnhance()
+    slo_enhance.load(["1", "2", "10", "40"])
+    slo_enhance.trials = 1
+    slo_enhance.warmup = 0
+    lines = []
+    with common.FakeWb() as fake_wb:
+        search = main._search_slo(
+            [fake_wb, "-c", "1", "-n", "100", "localhost"], slo_enhance, 1,
+            [lines.append])
+    # the histogram of -g gives the p99 of 983us(981us within its
+    # precision), and 1% of requests fail
+    assert([point.rate for point in search.points] == [10, 20, 40])
+    assert(search.best.rate == 40)
+    assert(search.best.latency == 0.983)
+    assert(lines[-1] == "The maximum rate under the SLO is in "
+           "[40, unknown)\n")
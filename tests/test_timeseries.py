@@ -0,0 +1,108 @@
+import os
+import json
+import urllib2
+import tempfile
+
+from pywb import timeseries
+
+
+_EXTENDED_LINES = [
+    "1    1000       200        3     /1500    /500   /20.5    /0\n",
+    "2    900        180        50         3     /2500    /800   /30.0    "
+    "/4(1/2/0/0/0/1)\n",
+]
+
+
+def test_parse_progress():
+    point = timeseries.parse_progress(
+        " 3: Completed   3000 requests, rate is 1000 #/sec.\n")
+    assert(point["interval"] == 3)
+    assert(point["completed"] == 3000)
+    assert(point["requests_per_second"] == 1000)
+    assert(point["latency_mean_ms"] is None)
+
+    point = timeseries.parse_progress(_EXTENDED_LINES[0])
+    assert(point["requests_per_second"] == 1000)
+    assert(point["received_kbps"] == 200)
+    assert(point["sent_kbps"] is None)
+    assert(point["latency_max_ms"] == 1.5)
+    assert(point["latency_sd_ms"] == 0.0205)
+    assert(point["failed"] == 0)
+    assert(point["failures"] is None)
+
+    point = timeseries.parse_progress(_EXTENDED_LINES[1], "ms")
+    assert(point["sent_kbps"] == 50)
+    assert(point["latency_mean_ms"] == 800)
+    assert(point["failed"] == 4)
+    assert(point["failures"]["receive"] == 2)
+    assert(point["failures"]["non_2xx"] == 1)
+
+    assert(timeseries.parse_progress("Complete requests:      100\n")
+           is None)
+
+    # no request is completed in the interval
+    point = timeseries.parse_progress(
+        "3    0          0          9223372036854775807/0       /0     "
+        "/0.0     /0\n")
+    assert(point["requests_per_second"] == 0)
+    assert(point["latency_min_ms"] is None)
+    assert(point["latency_mean_ms"] is None)
+
+
+def test_time_series():
+    fd, jsonl_file = tempfile.mkstemp(suffix=".jsonl")
+    os.close(fd)
+    try:
+        series = timeseries.TimeSeries(capacity=1, jsonl_file=jsonl_file)
+        for line in _EXTENDED_LINES + ["Server Software: fake\n"]:
+            assert(series(line) == line)
+        series.close()
+        # the ring buffer keeps the last interval
+        assert([point["interval"] for point in series.points] == [2])
+        assert(series.failed_requests == 4)
+        with open(jsonl_file) as fd:
+            points = [json.loads(line) for line in fd]
+        assert([point["interval"] for point in points] == [1, 2])
+    finally:
+        os.remove(jsonl_file)
+
+
+def test_time_series_workers():
+    series = timeseries.TimeSeries(workers=2)
+    for line in [_EXTENDED_LINES[0],
+                 "1    3000       600        1000  /2000    /1000  /0.0     "
+                 "/2(0/0/0/0/0/2)\n",
+                 _EXTENDED_LINES[1]]:
+        series(line)
+    points = series.points
+    assert([point["interval"] for point in points] == [1])
+    assert(points[0]["requests_per_second"] == 4000)
+    assert(points[0]["latency_min_ms"] == 0.003)
+    assert(points[0]["latency_max_ms"] == 2.0)
+    assert(points[0]["latency_mean_ms"] == 0.875)
+    assert(points[0]["failed"] == 2)
+    assert(points[0]["failures"]["non_2xx"] == 2)
+    # the interval that a worker hasn't reported is recorded at close
+    series.close()
+    assert([point["interval"] for point in series.points] == [1, 2])
+    assert(series.failed_requests == 6)
+
+
+def test_metrics_server():
+    series = timeseries.TimeSeries()
+    for line in _EXTENDED_LINES:
+        series(line)
+    server = timeseries.MetricsServer(series, 0)
+    try:
+        url = "http://%s:%d" % server.address
+        metrics = urllib2.urlopen(url + "/metrics").read().splitlines()
+        assert("# TYPE pywb_requests_per_second gauge" in metrics)
+        assert("pywb_requests_per_second 900" in metrics)
+        assert('pywb_latency_ms{stat="mean"} 0.8' in metrics)
+        assert("pywb_failed_requests_total 4" in metrics)
+        assert('pywb_failures_total{reason="receive"} 2' in metrics)
+        assert("pywb_completed_requests" not in "".join(metrics))
+        lines = urllib2.urlopen(url + "/series").read().splitlines()
+        assert([json.loads(line)["interval"] for line in lines] == [1, 2])
+    finally:
+        server.close()
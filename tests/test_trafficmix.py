@@ -0,0 +1,77 @@
+import os
+import random
+import shutil
+import tempfile
+import collections
+
+from pywb import main
+from pywb import packetsloader
+from pywb import trafficmix
+
+import common
+
+
+def test_alias_sampler():
+    weights = [95, 0, 4, 1]
+    sampler = trafficmix.AliasSampler(weights, random.Random(1))
+    count = 200000
+    counter = collections.Counter(sampler.generate(count))
+    assert(counter[1] == 0)
+    for index, weight in enumerate(weights):
+        assert(abs(counter[index] / float(count) - weight / 100.0) < 0.005)
+    # reproducible by the seed, sample draws the same as generate
+    sampler = trafficmix.AliasSampler(weights, random.Random(2))
+    assert([sampler.sample() for _ in range(1000)]
+           == list(trafficmix.AliasSampler(weights, random.Random(2))
+                   .generate(1000)))
+    for weights in [[], [0, 0], [1, -1]]:
+        try:
+            trafficmix.AliasSampler(weights)
+            assert(False)
+        except ValueError:
+            pass
+
+
+def test_dump_mix_packets():
+    work_dir = tempfile.mkdtemp()
+    try:
+        benign_file = os.path.join(work_dir, "benign.pkt")
+        with open(benign_file, "w") as fd:
+            fd.write("GET /benign HTTP/1.1\r\n\r\n")
+        attack_file = os.path.join(common._DATA_DIR, "packets.yaml")
+        mix_file = os.path.join(work_dir, "mix.yaml")
+        with open(mix_file, "w") as fd:
+            fd.write("benign.pkt: 95\n%s: 5\n" % (attack_file, ))
+        sources = trafficmix.load_mix(mix_file)
+        assert(sources == sorted([(benign_file, 95), (attack_file, 5)]))
+
+        enhance = main._PacketFileEnhance(
+            os.path.join(work_dir, "generated.pkt"))
+        main._MixEnhance(enhance).load([mix_file, "10000"])
+        main._SeedEnhance(enhance).load(["3"])
+        options = enhance.dump()
+        assert(options[2:] == ["-Q", "10000"])
+        packets = list(packetsloader.load_packets_from_paths(options[1]))
+        benign_count = packets.count("GET /benign HTTP/1.1\r\n\r\n")
+        assert(abs(benign_count - 9500) < 150)
+        # the packets of a source are sent in turn
+        attack_packets = list(
+            packetsloader.load_packets_from_paths(attack_file))
+        sent_attack_packets = [
+            packet for packet in packets
+            if packet != "GET /benign HTTP/1.1\r\n\r\n"]
+        assert(sent_attack_packets[:len(attack_packets)] == attack_packets)
+        # reproducible by --seed
+        enhance.dump()
+        assert(packets
+               == list(packetsloader.load_packets_from_paths(options[1])))
+
+        with open(mix_file, "w") as fd:
+            fd.write("benign.pkt: many\n")
+        try:
+            trafficmix.load_mix(mix_file)
+            assert(False)
+        except ValueError:
+            pass
+    finally:
+        shutil.rmtree(work_dir)
@@ -0,0 +1,207 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+""" Micro benchmarks of pywb
+
+Measure the throughput of pywb's packet processing pipeline
+without sending any traffic, so that the scaling of each stage
+can be checked independently from wb.
+
+E.G.
+    pywb_benchmark.py loader -s 1 4 16 64
+    pywb_benchmark.py builder -p ../util/regression-test
+    pywb_benchmark.py dumper -c 1000000
+"""
+
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+
+import ftw
+
+sys.path.append(
+    os.path.realpath(
+        os.path.join(
+            os.path.dirname(
+                os.path.realpath(__file__)
+            ),
+            os.pardir
+        )
+    )
+)
+
+from pywb import ftwhelper
+from pywb import httpbuilder
+from pywb import packetsloader
+from pywb import packetsdumper
+
+
+_MB = 1024 * 1024
+
+_SAMPLE_PACKET = "GET /index.html?id=%d HTTP/1.1\r\n"\
+    "Host: localhost\r\n"\
+    "User-Agent: WAFBench\r\n"\
+    "Accept: */*\r\n"\
+    "\r\n"
+
+
+def _generate_pkt_file(path, size):
+    """ Write a packet file of about size bytes,
+        the packets alternate between the two formats of wb.
+    """
+    written = 0
+    sequence = 0
+    with open(path, "wb") as fd:
+        while written < size:
+            packet = _SAMPLE_PACKET % (sequence, )
+            if sequence % 2:
+                record = str(len(packet)) + "\n" + packet
+            else:
+                record = packet + "\0"
+            fd.write(record)
+            written += len(record)
+            sequence += 1
+    return sequence
+
+
+def _report(label, size, count, elapsed):
+    elapsed = max(elapsed, 1e-9)
+    sys.stdout.write(
+        "%-8s %10.1f MB %10d pkts %8.3f s %10.1f MB/s %12.0f pkts/s\n" % (
+            label, float(size) / _MB, count, elapsed,
+            float(size) / _MB / elapsed, count / elapsed))
+
+
+def benchmark_loader(sizes):
+    """ Load .pkt files of different sizes.
+        The MB/s column keeps flat if loading is linear in file size.
+    """
+    work_dir = tempfile.mkdtemp()
+    try:
+        for size in sizes:
+            path = os.path.join(work_dir, "%dMB.pkt" % (size, ))
+            expect_count = _generate_pkt_file(path, size * _MB)
+            start = time.time()
+            count = 0
+            for _ in packetsloader.load_packets_from_paths(path):
+                count += 1
+            elapsed = time.time() - start
+            if count != expect_count:
+                raise ValueError(
+                    "loaded %d packets but %d were written"
+                    % (count, expect_count))
+            _report("loader", os.path.getsize(path), count, elapsed)
+            os.remove(path)
+    finally:
+        shutil.rmtree(work_dir)
+
+
+def _build_by_http_ua(input_):
+    http_ua = ftw.http.HttpUA()
+    http_ua.request_object = input_
+    http_ua.build_request()
+    return str(http_ua.request)
+
+
+def benchmark_builder(paths, rounds):
+    """ Build the requests of all stages in paths by ftw's HttpUA
+        and by httpbuilder
+    """
+    inputs = [
+        stage.ORIGINAL_DATA.input
+        for stage in ftwhelper.get(paths, ftwhelper.FTW_TYPE.STAGE)]
+    for label, build in [
+            ("http_ua", _build_by_http_ua),
+            ("builder", httpbuilder.build_request)]:
+        size = 0
+        start = time.time()
+        for _ in range(rounds):
+            for input_ in inputs:
+                size += len(build(input_))
+        elapsed = time.time() - start
+        _report(label, size, len(inputs) * rounds, elapsed)
+
+
+def _dump_per_packet(path, packets):
+    """ Two writes and a copy per packet, the baseline of the dumper """
+    with open(path, "wb") as fd:
+        for packet in packets:
+            fd.write(str(len(packet)) + "\n")
+            fd.write(str(packet))
+
+
+def _dump_by_dumper(path, packets):
+    with packetsdumper.PacketsDumper(path) as dumper:
+        dumper.dump(packets)
+
+
+def _dump_blob(path, packets):
+    """ Write the same bytes by one call, the bound of disk bandwidth """
+    blob = "".join(str(len(packet)) + "\n" + packet for packet in packets)
+    start = time.time()
+    with open(path, "wb") as fd:
+        fd.write(blob)
+    return time.time() - start
+
+
+def benchmark_dumper(count):
+    """ Dump a mix of packets of different sizes into a .pkt file
+    """
+    mix = [
+        _SAMPLE_PACKET % (0, ),
+        _SAMPLE_PACKET % (1, ) + "a" * 1000,
+        _SAMPLE_PACKET % (2, ) + "b" * 100,
+        _SAMPLE_PACKET % (3, ) + "c" * 10000,
+    ]
+    packets = [mix[i % len(mix)] for i in xrange(count)]
+    work_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(work_dir, "dump.pkt")
+        for label, dump in [
+                ("per_pkt", _dump_per_packet),
+                ("dumper", _dump_by_dumper)]:
+            start = time.time()
+            dump(path, packets)
+            elapsed = time.time() - start
+            _report(label, os.path.getsize(path), count, elapsed)
+            os.remove(path)
+        elapsed = _dump_blob(path, packets)
+        _report("blob", os.path.getsize(path), count, elapsed)
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="pywb micro benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark")
+    loader_parser = subparsers.add_parser(
+        "loader", help="scaling of loading .pkt files")
+    loader_parser.add_argument(
+        "-s", "--sizes", type=int, nargs="+", default=[1, 4, 16, 64],
+        help="sizes of the generated .pkt files in MB")
+    builder_parser = subparsers.add_parser(
+        "builder", help="throughput of building requests of FTW stages")
+    builder_parser.add_argument(
+        "-p", "--paths", nargs="+", required=True,
+        help="paths of YAML files or directories")
+    builder_parser.add_argument(
+        "-r", "--rounds", type=int, default=5,
+        help="times of building all requests")
+    dumper_parser = subparsers.add_parser(
+        "dumper", help="throughput of dumping packets into a .pkt file")
+    dumper_parser.add_argument(
+        "-c", "--count", type=int, default=1000000,
+        help="number of dumped packets")
+    args = parser.parse_args()
+    if args.benchmark == "loader":
+        benchmark_loader(args.sizes)
+    elif args.benchmark == "builder":
+        benchmark_builder(args.paths, args.rounds)
+    elif args.benchmark == "dumper":
+        benchmark_dumper(args.count)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) Microsoft Corporation. All rights reserved.
+# Licensed under the MIT License.
+
+""" Inspect the archive of benchmark runs
+
+The runs are archived by pywb(--archive) or waf_perf.py(--archive).
+compare checks a run against the latest runs before it of the same
+benchmark and corpus, and exits with 1 if a metric regresses,
+so that it can gate the builds of the WAF.
+
+E.G.
+    run_archive.py -d runs.db list
+    run_archive.py -d runs.db compare
+    run_archive.py -d runs.db compare -r 42 -w 5 -m 0.1
+"""
+
+import os
+import sys
+import time
+import json
+import argparse
+
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), os.pardir, "pywb"))
+import runarchive
+
+
+def _format_value(value):
+    return "%.3f" % (value, ) if value is not None else "-"
+
+
+def list_runs(archive, name, limit):
+    print("%-6s %-19s %-16s %12s %12s %8s  %s" % (
+        "id", "created", "label", "rps", "p99(ms)", "errors", "name"))
+    for run in archive.runs(name, limit):
+        print("%-6d %-19s %-16s %12s %12s %8s  %s" % (
+            run.run_id,
+            time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run.created)),
+            run.label or "-",
+            _format_value(run.requests_per_second),
+            _format_value(run.latency_p99_ms),
+            _format_value(run.error_rate),
+            run.name))
+    return 0
+
+
+def compare_run(archive, run_id, name, window, min_change, as_json):
+    run = archive.get(run_id, name)
+    if run is None:
+        sys.stderr.write("no such run\n")
+        return 2
+    comparisons = archive.compare(run, window, min_change)
+    if as_json:
+        print(json.dumps({
+            "run": run.to_dict(),
+            "baseline": [item.run_id
+                         for item in archive.baseline(run, window)],
+            "comparisons": [item.to_dict() for item in comparisons],
+        }, indent=4))
+    else:
+        print("run %d(%s): %s" % (run.run_id, run.label or "-", run.name))
+        for item in comparisons:
+            if item.status == "insufficient":
+                print("%-20s %12s  insufficient baseline" % (
+                    item.metric, _format_value(item.value)))
+                continue
+            print("%-20s %12s  baseline %s +/- %s  %+.1f%%  %s" % (
+                item.metric, _format_value(item.value),
+                _format_value(item.mean), _format_value(item.margin),
+                (item.change or 0) * 100, item.status))
+    if any(item.status == "regression" for item in comparisons):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='''
+            Inspect the archive of benchmark runs.
+            E.G.
+                run_archive.py -d runs.db list
+                run_archive.py -d runs.db compare -r 42
+            ''')
+    parser.add_argument("-d", "--database", help="archive database", required=True)
+    subparsers = parser.add_subparsers(dest="command")
+    list_parser = subparsers.add_parser("list", help="list the latest runs")
+    list_parser.add_argument("-n", "--name", help="LIKE pattern of benchmark names", default="%")
+    list_parser.add_argument("-l", "--limit", help="number of runs", type=int, default=20)
+    compare_parser = subparsers.add_parser("compare", help="compare a run against its baseline")
+    compare_parser.add_argument("-r", "--run", help="run id, default is the latest run", type=int, default=None)
+    compare_parser.add_argument("-n", "--name", help="LIKE pattern of benchmark names of the latest run", default="%")
+    compare_parser.add_argument("-w", "--window", help="number of baseline runs", type=int, default=10)
+    compare_parser.add_argument("-m", "--min_change", help="minimum ratio of change of a regression", type=float, default=0.05)
+    compare_parser.add_argument("-j", "--json", help="output JSON", action="store_true")
+    args = parser.parse_args()
+    archive = runarchive.RunArchive(args.database)
+    try:
+        if args.command == "list":
+            sys.exit(list_runs(archive, args.name, args.limit))
+        elif args.command == "compare":
+            sys.exit(compare_run(archive, args.run, args.name, args.window,
+                                 args.min_change, args.json))
+        parser.print_help()
+        sys.exit(2)
+    finally:
+        archive.close()
@@ -15,39 +15,33 @@ import csv
 import collections
 import time
 
-command = "wb -c {connection} -s 3600 -t {time_limit} -2 2 -F {packet_file} {server} "
+sys.path.insert(0, os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), os.pardir, "pywb"))
+import resultparser
+import histogram
+import runarchive
+
+# wb stops parsing options at the server, so options must precede it
+command = "wb -c {connection} -s 3600 -t {time_limit} -2 2 {options}-F {packet_file} {server} "
 
 
 def extract_latency(stdout):
+    result = resultparser.parse(stdout.decode("utf-8", "replace"))
     latency = collections.OrderedDict()
 
-    average_rps = re.search(b"Requests per second:\s*(\d+(?:.\d+)?)", stdout)
-    if average_rps:
-        latency["average(ms)"] = 1000 / float(average_rps.group(1))
+    if result.requests_per_second:
+        latency["average(ms)"] = 1000 / float(result.requests_per_second)
     else:
         latency["average(ms)"] = None
 
-    mean_latency = re.search(b"Total:\s*\d+\s*(\d+)", stdout)
-    if mean_latency:
-        latency["mean(ms)"] = float(mean_latency.group(1)) / 1000
-    else:
-        latency["mean(ms)"] = None
-
-    _99_latency = re.search(b"\s*99%\s*(\d+)", stdout)
-    if _99_latency:
-        latency["99th(ms)"] = float(_99_latency.group(1)) / 1000
-    else:
-        latency["99th(ms)"] = None
-
-    _90_latency = re.search(b"\s*90%\s*(\d+)", stdout)
-    if _90_latency:
-        latency["90th(ms)"] = float(_90_latency.group(1)) / 1000
-    else:
-        latency["90th(ms)"] = None
-    
+    latency["mean(ms)"] = result.get_time(
+        result.connection_times.get("total", {}).get("mean"))
+    latency["99th(ms)"] = result.get_time(result.percentiles.get(99))
+    latency["90th(ms)"] = result.get_time(result.percentiles.get(90))
     return latency
 
-def test(path, server, time_limit, connection, output):
+def test(path, server, time_limit, connection, output, histogram_dir=None,
+         archive=None, label=None):
     src_packet_files = []
     packet_files = []
     if os.path.isdir(path):
@@ -75,7 +69,13 @@ def test(path, server, time_limit, connection, output):
         for file in packet_files:
             packet_name = re.search(r"([^/]+).pkt$", file).group(1)
             error = ""
-            _command = command.format(time_limit=time_limit,
+            gnuplot_file = None
+            options = ""
+            if histogram_dir or archive:
+                gnuplot_file = os.path.join(histogram_dir or os.path.dirname(os.path.abspath(output)),
+                                            packet_name + ".tsv")
+                options = "-g " + gnuplot_file + " "
+            _command = command.format(time_limit=time_limit, options=options,
                                packet_file=file, server=server, connection=connection)
             print(_command)
             proc = subprocess.Popen(
@@ -87,11 +87,25 @@ def test(path, server, time_limit, connection, output):
             latency = {}
             try:
                 if proc.wait(timeout=(time_limit * 2)) == 0:
-                    latency = extract_latency(proc.communicate()[0])
+                    stdout = proc.communicate()[0]
+                    latency = extract_latency(stdout)
+                    if gnuplot_file:
+                        latency_histogram = histogram.from_gnuplot(gnuplot_file)
+                    if histogram_dir:
+                        latency_histogram.save(
+                            os.path.join(histogram_dir, packet_name + ".json"))
+                    if archive:
+                        archive.add(
+                            packet_name + " " + runarchive.benchmark_name(_command.split()),
+                            resultparser.parse(stdout.decode("utf-8", "replace")),
+                            label, _command.split()[1:],
+                            runarchive.corpus_hash([file]), latency_histogram)
                 else:
                     error = proc.communicate()[1]
             except subprocess.TimeoutExpired:
                 error = "Process timeout"
+            if gnuplot_file and os.path.exists(gnuplot_file):
+                os.remove(gnuplot_file)
             sys.stderr.write(str(error) + "\n")
             if process_count == 0:
                 titles = ["id", "packet_name"] + list(latency.keys())
@@ -113,5 +127,14 @@ if __name__ == "__main__":
     parser.add_argument("-t", "--time_limit", help="time limit",type=int, default=60)
     parser.add_argument("-o", "--output", help="output file",type=str, default="output.csv")
     parser.add_argument("-c", "--connection", help="connection",type=int, default=1)
+    parser.add_argument("-H", "--histogram_dir", help="directory to save the mergeable latency histogram of each packet file",type=str, default=None)
+    parser.add_argument("-a", "--archive", help="SQLite database to archive the runs, see run_archive.py",type=str, default=None)
+    parser.add_argument("-l", "--label", help="label of the WAF build of the archived runs",type=str, default=None)
     args = parser.parse_args()
-    test(args.path, args.server, args.time_limit, args.connection, args.output)
+    archive = runarchive.RunArchive(args.archive) if args.archive else None
+    try:
+        test(args.path, args.server, args.time_limit, args.connection, args.output, args.histogram_dir,
+             archive, args.label)
+    finally:
+        if archive:
+            archive.close()